@@ -0,0 +1,78 @@
+"""
+Benchmarks switching N Feit (Tuya) bulbs served by local fake devices. Compares the serial loop the Feit plugin used to
+run against the DeviceFanOut and reports how long after the command each responsive bulb switched, the spread between
+the first and the last bulb is what a user sees as bulbs "rippling" on.
+
+Usage: python -m benchmarks.bench_device_fan_out [--bulbs 15] [--latency-ms 40] [--stalled 1]
+"""
+import time
+import argparse
+import tinytuya
+from contextlib import ExitStack
+from pi_assistant.devices import DeviceFanOut
+from test.fakes.tuya_server import FakeTuyaDevice
+
+
+def connect(devices: list, timeout: float) -> dict:
+    return {device.device_id: tinytuya.BulbDevice(device.device_id, "127.0.0.1", device.key, port=device.port,
+                                                  version=3.3, persist=True, connection_timeout=timeout,
+                                                  connection_retry_limit=1, connection_retry_delay=0)
+            for device in devices}
+
+
+def serial(bulbs: dict, on: bool) -> list:
+    start = time.monotonic()
+    elapsed = []
+    for bulb in bulbs.values():
+        response = bulb.turn_on() if on else bulb.turn_off()
+        if not (isinstance(response, dict) and "Error" in response):
+            elapsed.append(time.monotonic() - start)
+    return elapsed
+
+
+def fan_out(executor: DeviceFanOut, bulbs: dict, on: bool) -> list:
+    results = executor.run(bulbs, lambda bulb: bulb.turn_on() if on else bulb.turn_off())
+    return [result.elapsed for result in results if result.ok]
+
+
+def summarize(elapsed: list) -> dict:
+    elapsed = sorted(elapsed)
+    return {"first_ms": elapsed[0] * 1000, "last_ms": elapsed[-1] * 1000,
+            "spread_ms": (elapsed[-1] - elapsed[0]) * 1000}
+
+
+def run(count: int, latency: float, stalled: int, timeout: float, concurrency: int, rounds: int = 5) -> dict:
+    results = {}
+    with ExitStack() as stack:
+        devices = [stack.enter_context(FakeTuyaDevice(device_id=f"bulb_{i}", delay=latency)) for i in range(count)]
+        devices += [stack.enter_context(FakeTuyaDevice(device_id=f"stalled_{i}", delay=timeout * 2))
+                    for i in range(stalled)]
+
+        executor = DeviceFanOut(max_concurrency=concurrency, timeout=timeout)
+        for label, strategy in (("serial", lambda b, on: serial(b, on)),
+                                ("fan out", lambda b, on: fan_out(executor, b, on))):
+            bulbs = connect(devices, timeout)
+            samples = [summarize(strategy(bulbs, i % 2 == 0)) for i in range(rounds)]
+            results[label] = {key: min(sample[key] for sample in samples) for key in samples[0]}
+        executor.close()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Device fan out benchmark")
+    parser.add_argument("--bulbs", type=int, default=15)
+    parser.add_argument("--latency-ms", type=float, default=40.0, help="Simulated response time of each bulb")
+    parser.add_argument("--stalled", type=int, default=0, help="Bulbs which never respond within the timeout")
+    parser.add_argument("--timeout", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    results = run(args.bulbs, args.latency_ms / 1000, args.stalled, args.timeout, args.concurrency)
+    print(f"{args.bulbs} bulbs ({args.stalled} stalled), {args.latency_ms:.0f} ms per bulb")
+    for label, row in results.items():
+        print(f"{label:>8}: first bulb {row['first_ms']:.0f} ms, last bulb {row['last_ms']:.0f} ms, "
+              f"spread {row['spread_ms']:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmarks linking N devices to a room. Compares the previous CLI, which re-read devices.json, scanned every plugin's
+device list and rewrote the whole profile JSON once per device, against selecting every device through the index of the
+DeviceRegistry and linking them to the room in a single ProfileStore transaction.
+
+Usage: python -m benchmarks.bench_link_devices [--devices 500]
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+from pi_assistant.devices import DeviceRegistry
+from pi_assistant.profile.profile_store import ProfileStore
+
+
+def write_devices(directory: str, count: int) -> str:
+    path = os.path.join(directory, "devices.json")
+    devices = {"feit_electric_smart_lights": [{"name": f"Bulb {i}", "bind_to": "feit_electric_smart_lights",
+                                               "metadata": {"id": f"id{i}", "ip": f"10.0.{i // 250}.{i % 250}"}}
+                                              for i in range(count)],
+               "hue_smart_lights": []}
+    with open(path, "w") as file:
+        file.write(json.dumps(devices, indent=4))
+    return path
+
+
+def link_one_at_a_time(devices_path: str, profile_path: str, names: list) -> None:
+    with open(profile_path, "w") as file:
+        file.write(json.dumps({"name": "home", "rooms": {"kitchen": {}}, "groups": {}}, indent=4))
+    for name in names:
+        with open(devices_path, "r") as file:
+            devices = json.loads(file.read())
+        with open(profile_path, "r") as file:
+            profile = json.loads(file.read())
+        for k in devices.keys():
+            for device in devices[k]:
+                if device["name"].lower() == name.lower():
+                    profile["rooms"]["kitchen"][name.lower()] = device
+        with open(profile_path, "w") as file:
+            file.write(json.dumps(profile, indent=4))
+
+
+def link_in_bulk(devices_path: str, directory: str, names: list) -> None:
+    registry = DeviceRegistry(os.path.join(directory, "devices.db"), legacy_path=devices_path)
+    store = ProfileStore(os.path.join(directory, "profiles.db"), legacy_directories=[])
+    store.create_profile("home")
+    store.create_room("home", "kitchen")
+    store.link_devices("home", "kitchen", [device.to_dict() for device in registry.index.select(names)])
+    store.close()
+    registry.close()
+
+
+def run(count: int) -> dict:
+    names = [f"Bulb {i}" for i in range(count)]
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        devices_path = write_devices(directory, count)
+        start = time.perf_counter()
+        link_one_at_a_time(devices_path, os.path.join(directory, "home.json"), names)
+        results["one at a time"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        link_in_bulk(devices_path, directory, names)
+        results["bulk"] = time.perf_counter() - start
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Device linking benchmark")
+    parser.add_argument("--devices", type=int, default=500)
+    args = parser.parse_args()
+
+    results = run(args.devices)
+    print(f"Linking {args.devices} devices to one room")
+    for label, elapsed in results.items():
+        print(f"{label:>14}: {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
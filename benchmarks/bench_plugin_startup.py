@@ -0,0 +1,141 @@
+"""
+Benchmarks PluginManager startup with many plugins. A throwaway plugins package of N synthetic plugins is generated
+where every plugin imports a module which simulates a heavy dependency (tinytuya, requests, ...) and only a fraction of
+the plugins are enabled. Three strategies are compared:
+
+    eager       - import every plugin and configuration module (the behaviour before the plugin manifest)
+    cold        - generate the manifest by parsing the plugin sources then import only the enabled plugins
+    warm        - read the cached manifest then import only the enabled plugins
+
+Usage: python -m benchmarks.bench_plugin_startup [--plugins 200] [--enabled 0.1] [--import-ms 5]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+from pi_assistant.plugins.plugin_manager import PluginManager
+from pi_assistant.plugins.plugin_manifest import PluginManifest
+
+PLUGIN_SOURCE = '''from {package}.{name}.heavy_dependency import client
+from pi_assistant.plugins.plugin import Plugin
+
+
+class {class_name}(Plugin):
+    def enabled(self) -> bool:
+        return bool(self._app_config.get("plugins.{name}.enabled"))
+
+    def bind_to(self) -> str:
+        return "intent_{index}"
+
+    def init(self, config=None) -> None:
+        pass
+
+    def on_intent_received(self, intent: dict, entities: dict) -> None:
+        pass
+
+    def on_plugin_end(self) -> None:
+        pass
+'''
+
+CONFIG_SOURCE = '''from pi_assistant.plugins.plugin_configuration import PluginConfiguration
+
+
+class {class_name}Config(PluginConfiguration):
+    pass
+'''
+
+HEAVY_DEPENDENCY_SOURCE = '''import time
+time.sleep({seconds})
+client = object()
+'''
+
+
+class StaticConfiguration:
+    def __init__(self, values: dict):
+        self._values = values
+
+    def get(self, key: str):
+        return self._values[key]
+
+
+def generate_plugins(root: str, package: str, count: int, import_seconds: float) -> None:
+    os.makedirs(os.path.join(root, package))
+    open(os.path.join(root, package, "__init__.py"), "w").close()
+    for i in range(count):
+        name = f"synthetic_{i}"
+        class_name = f"Synthetic{i}"
+        directory = os.path.join(root, package, name)
+        os.makedirs(directory)
+        open(os.path.join(directory, "__init__.py"), "w").close()
+        with open(os.path.join(directory, "heavy_dependency.py"), "w") as file:
+            file.write(HEAVY_DEPENDENCY_SOURCE.format(seconds=import_seconds))
+        with open(os.path.join(directory, f"{name}_plugin.py"), "w") as file:
+            file.write(PLUGIN_SOURCE.format(package=package, name=name, class_name=f"{class_name}Plugin", index=i))
+        with open(os.path.join(directory, f"{name}_config.py"), "w") as file:
+            file.write(CONFIG_SOURCE.format(class_name=class_name))
+
+
+def build_config(count: int, enabled_ratio: float) -> StaticConfiguration:
+    enabled_every = max(1, round(1 / enabled_ratio)) if enabled_ratio > 0 else count + 1
+    values = {"wit.intents": [f"intent_{i}" for i in range(count)]}
+    for i in range(count):
+        values[f"plugins.synthetic_{i}.enabled"] = i % enabled_every == 0
+        values[f"plugins.synthetic_{i}.physical_device"] = False
+    return StaticConfiguration(values)
+
+
+def unload(package: str) -> None:
+    for module in [m for m in sys.modules if m == package or m.startswith(package + ".")]:
+        del sys.modules[module]
+
+
+def eager(path: str, package: str) -> None:
+    for spec in PluginManifest.build(path, package).specs:
+        spec.load_class()
+        spec.load_config_class()
+
+
+def run(count: int, enabled_ratio: float, import_seconds: float) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        package = "bench_startup_plugins"
+        path = os.path.join(tmp, package)
+        manifest_path = os.path.join(tmp, "manifest.json")
+        generate_plugins(tmp, package, count, import_seconds)
+        config = build_config(count, enabled_ratio)
+        sys.path.insert(0, tmp)
+        try:
+            start = time.perf_counter()
+            eager(path, package)
+            results["eager"] = time.perf_counter() - start
+            unload(package)
+
+            for label in ("cold", "warm"):
+                manager = PluginManager(config=config, plugins_path=path, plugins_package=package,
+                                        manifest_path=manifest_path)
+                start = time.perf_counter()
+                manager.init_plugins()
+                results[label] = time.perf_counter() - start
+                results["initialized"] = len(manager._initialized_plugins)
+                unload(package)
+        finally:
+            sys.path.remove(tmp)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Plugin startup benchmark")
+    parser.add_argument("--plugins", type=int, default=200)
+    parser.add_argument("--enabled", type=float, default=0.1, help="Fraction of plugins which are enabled")
+    parser.add_argument("--import-ms", type=float, default=5.0, help="Simulated import time of each plugin dependency")
+    args = parser.parse_args()
+
+    results = run(args.plugins, args.enabled, args.import_ms / 1000)
+    print(f"{args.plugins} plugins, {results['initialized']} enabled, {args.import_ms:.1f} ms per dependency import")
+    for label in ("eager", "cold", "warm"):
+        print(f"{label:>6}: {results[label] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
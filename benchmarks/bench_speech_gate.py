@@ -0,0 +1,127 @@
+"""
+Benchmarks keyword spotting with and without the SpeechGate in front of Sphinx. Reports the CPU time spent per hour
+of audio and the keyword recall of each configuration.
+
+Fixtures are WAV files (16 bit mono) in a directory alongside a labels.json file mapping each file name to true when
+the recording contains the keyword and false otherwise, for example:
+
+    {"hey_google_1.wav": true, "tv_noise_1.wav": false}
+
+Recall is only meaningful with real recordings. When no fixture directory is given a synthetic set of background noise,
+static and voiced tones is generated so the cost of the gate (and how much audio it rejects) can still be measured.
+
+Usage: python -m benchmarks.bench_speech_gate [fixture directory] [--keyword "hey google"]
+"""
+import os
+import json
+import time
+import wave
+import argparse
+import tempfile
+import numpy as np
+import speech_recognition as sr
+from pi_assistant.audio import SpeechGate
+
+SAMPLE_RATE = 16000
+
+
+def generate_fixtures(directory: str, count: int = 20) -> None:
+    rng = np.random.default_rng(42)
+    labels = {}
+    for i in range(count):
+        seconds = 3.0
+        samples = rng.normal(0, 50, int(SAMPLE_RATE * seconds))
+        kind = ("quiet", "static", "voiced")[i % 3]
+        start, end = SAMPLE_RATE // 2, SAMPLE_RATE * 2
+        if kind == "static":
+            samples[start:end] += rng.normal(0, 5000, end - start)
+        elif kind == "voiced":
+            t = np.arange(end - start) / SAMPLE_RATE
+            samples[start:end] += 6000 * np.sin(2 * np.pi * 160 * t) * np.sin(np.pi * t / t[-1])
+        name = f"{kind}_{i}.wav"
+        with wave.open(os.path.join(directory, name), "wb") as file:
+            file.setnchannels(1)
+            file.setsampwidth(2)
+            file.setframerate(SAMPLE_RATE)
+            file.writeframes(np.clip(samples, -32768, 32767).astype("<i2").tobytes())
+        labels[name] = False
+    with open(os.path.join(directory, "labels.json"), "w") as file:
+        file.write(json.dumps(labels))
+
+
+def load_fixtures(directory: str) -> list:
+    with open(os.path.join(directory, "labels.json"), "r") as file:
+        labels = json.loads(file.read())
+
+    fixtures = []
+    for name, has_keyword in sorted(labels.items()):
+        with sr.AudioFile(os.path.join(directory, name)) as source:
+            audio = sr.Recognizer().record(source)
+        fixtures.append((name, audio, bool(has_keyword)))
+    return fixtures
+
+
+def spot_keyword(recognizer: sr.Recognizer, audio: sr.AudioData, keywords: list) -> bool:
+    try:
+        text = recognizer.recognize_sphinx(audio, keyword_entries=keywords)
+    except sr.UnknownValueError:
+        return False
+    return any(keyword in text for keyword, _ in keywords)
+
+
+def run(fixtures: list, keywords: list, sphinx: bool) -> dict:
+    recognizer = sr.Recognizer()
+    audio_seconds = sum(len(audio.frame_data) / (audio.sample_rate * audio.sample_width) for _, audio, _ in fixtures)
+    # Without a decoder there is nothing to measure when the gate is off so only the cost of the gate is reported
+    variants = [("without gate", None), ("with gate", SpeechGate())] if sphinx else [("gate only", SpeechGate())]
+    results = {}
+    for label, gate in variants:
+        detected = 0
+        decoded = 0
+        start = time.process_time()
+        for _, audio, has_keyword in fixtures:
+            if gate is not None and not gate.is_speech(audio):
+                continue
+            decoded += 1
+            if sphinx and spot_keyword(recognizer, audio, keywords) and has_keyword:
+                detected += 1
+        cpu = time.process_time() - start
+
+        positives = sum(1 for _, _, has_keyword in fixtures if has_keyword)
+        results[label] = {
+            "phrases_decoded": decoded,
+            "phrases_total": len(fixtures),
+            "cpu_seconds_per_audio_hour": cpu / audio_seconds * 3600,
+            "keyword_recall": detected / positives if sphinx and positives else None,
+        }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Speech gate benchmark")
+    parser.add_argument("fixtures", nargs="?", help="Directory of WAV fixtures with a labels.json file")
+    parser.add_argument("--keyword", default="hey google")
+    args = parser.parse_args()
+
+    try:
+        import pocketsphinx  # noqa: F401
+        sphinx = True
+    except ImportError:
+        print("pocketsphinx is not installed only the cost of the gate will be measured.")
+        sphinx = False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = args.fixtures
+        if directory is None:
+            generate_fixtures(tmp)
+            directory = tmp
+        results = run(load_fixtures(directory), [(args.keyword, 1.0)], sphinx)
+
+    for label, row in results.items():
+        recall = "n/a" if row["keyword_recall"] is None else f"{row['keyword_recall']:.2%}"
+        print(f"{label:>13}: decoded {row['phrases_decoded']}/{row['phrases_total']} phrases, "
+              f"{row['cpu_seconds_per_audio_hour']:.1f} CPU seconds per hour of audio, keyword recall {recall}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+End to end benchmark suite which runs entirely offline. Wit.ai, OpenWeatherMap/ipinfo and the Feit (Tuya) bulbs are
+replaced by local fake servers and replies go to a null sink instead of gTTS and the speaker. The suite measures:
+
+    startup.import           importing pi_assistant.main in a fresh interpreter
+    init_plugins             initializing every enabled plugin
+    dispatch.lookup          resolving an intent to its plugins through the dispatch table
+    plugin.<intent>.p50/p95  PluginManager.handle_intent, i.e. the plugin bound to the intent
+    e2e.<intent>.p50/p95     a text command through Wit.ai (fake), dispatch, the plugin and the reply
+
+Every metric is in seconds, lower is better. Results are printed (or written as JSON with --output) and compared
+against a stored baseline, the suite exits with a non zero status when a metric regressed past the tolerance:
+
+Usage: python -m benchmarks.suite [--rounds 30] [--output results.json] [--baseline benchmarks/baseline.json]
+                                  [--tolerance 0.5] [--update-baseline]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import timeit
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+import yaml
+from contextlib import ExitStack
+from test.fakes.wit_server import FakeWitServer
+from test.fakes.tuya_server import FakeTuyaDevice, write_device_cache
+from test.fakes.weather_server import FakeWeatherServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline.json")
+BULBS = 4
+BULB_LATENCY = 0.005
+WIT_LATENCY = 0.002
+
+LIGHTS_ON = {"light_state:light_state": [{"value": "on"}]}
+COMMANDS = {  # utterance -> (intent, entities)
+    "what time is it": ("time", {}),
+    "what is the date": ("date", {}),
+    "nevermind": ("wit$cancel", {}),
+    "what is the weather": ("wit$get_weather", {}),
+    "turn on the lights": ("smart_lights", LIGHTS_ON),
+}
+
+
+def write_sandbox(directory: str, wit_url: str, weather_url: str, bulbs: list) -> None:
+    """
+    Lays out a working directory for the assistant whose configuration points every external service at a fake.
+    """
+    with open(os.path.join(ROOT, "resources", "application.yml"), "r") as file:
+        config = yaml.safe_load(file)
+    config["nlu"]["wit"]["base_url"] = wit_url
+    config["nlu"]["cache"]["enabled"] = False
+    config["tracing"]["enabled"] = False
+    config["control_server"]["enabled"] = False
+    config["plugins"]["weather"].update({"enabled": True, "weather_url": f"{weather_url}/data/2.5/weather",
+                                         "location_url": f"{weather_url}/json", "retries": 0})
+    os.makedirs(os.path.join(directory, "resources", "cache"))
+    with open(os.path.join(directory, "resources", "application.yml"), "w") as file:
+        file.write(yaml.safe_dump(config))
+
+    feit_directory = os.path.join(directory, "pi_assistant", "plugins", "feit_electric_smart_lights")
+    os.makedirs(feit_directory)
+    write_device_cache(os.path.join(feit_directory, "devices.json"), bulbs)
+
+
+def measure_import(directory: str) -> float:
+    code = "import time; s = time.perf_counter(); import pi_assistant.main; print(time.perf_counter() - s)"
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    samples = []
+    for _ in range(3):
+        output = subprocess.run([sys.executable, "-c", code], cwd=directory, env=env, capture_output=True,
+                                text=True, check=True).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return min(samples)
+
+
+def percentiles(name: str, samples: list) -> dict:
+    from pi_assistant.replay import ReplayReport
+    return {f"{name}.p50": ReplayReport.percentile(samples, 50), f"{name}.p95": ReplayReport.percentile(samples, 95)}
+
+
+def run(rounds: int) -> dict:
+    """
+    Runs every benchmark inside a sandboxed working directory.
+    :param rounds: Int the number of samples taken of each per command metric
+    :return: Dictionary of metric name -> seconds
+    """
+    results = {}
+    cwd = os.getcwd()
+    directory = tempfile.mkdtemp(prefix="pi-assistant-bench-")
+    with ExitStack() as stack:
+        bulbs = [stack.enter_context(FakeTuyaDevice(device_id=f"bulb_{i}", delay=BULB_LATENCY)) for i in range(BULBS)]
+        wit = stack.enter_context(FakeWitServer({utterance: {"text": utterance, "entities": entities, "traits": {},
+                                                             "intents": [{"name": intent, "confidence": 0.98}]}
+                                                 for utterance, (intent, entities) in COMMANDS.items()},
+                                                delay=WIT_LATENCY))
+        weather = stack.enter_context(FakeWeatherServer())
+        write_sandbox(directory, wit.url, weather.url, bulbs)
+        results["startup.import"] = measure_import(directory)
+
+        # The shared configuration is read from the working directory the first time pi_assistant is imported
+        os.chdir(directory)
+        try:
+            results.update(run_in_sandbox(rounds))
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def run_in_sandbox(rounds: int) -> dict:
+    from pi_assistant.util import set_reply_sink
+    from pi_assistant.config import Configuration
+    from pi_assistant.replay import NullReplySink
+    from pi_assistant.nlu import WitClient
+    from pi_assistant.pipeline import VoicePipeline
+    from pi_assistant.plugins.plugin_manager import PluginManager
+
+    results = {}
+    config = Configuration.shared()
+    set_reply_sink(NullReplySink())
+
+    samples = []
+    for _ in range(3):
+        manager = PluginManager(config=config)
+        start = time.perf_counter()
+        manager.init_plugins(None, wait_for_all=True)
+        samples.append(time.perf_counter() - start)
+    results["init_plugins"] = min(samples)
+
+    lookups = 10000
+    results["dispatch.lookup"] = min(timeit.repeat(lambda: manager.get_bound_plugin_for("time"),
+                                                   number=lookups, repeat=5)) / lookups
+
+    for utterance, (intent, entities) in COMMANDS.items():
+        response = {"intents": [{"name": intent, "confidence": 0.98}], "entities": entities}
+        samples = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            manager.handle_intent(response)
+            samples.append(time.perf_counter() - start)
+        results.update(percentiles(f"plugin.{intent}", samples))
+
+    wit = WitClient.from_config(config, "fake-token")
+    wit.connect()
+    pipeline = VoicePipeline(config=config, recognizer=None, source=None, plugin_manager=manager,
+                             understand=wit.message, reply=lambda text: None, keywords=[("noomis", 0.5)])
+
+    async def commands() -> None:
+        task = asyncio.create_task(pipeline.run())
+        await asyncio.get_running_loop().run_in_executor(None, pipeline.wait_until_started)
+        for utterance, (intent, _) in COMMANDS.items():
+            samples = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                await pipeline.process_text(utterance)
+                samples.append(time.perf_counter() - start)
+            results.update(percentiles(f"e2e.{intent}", samples))
+        pipeline.stop()
+        await task
+
+    asyncio.run(commands())
+    wit.close()
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_delta: float = 0.001) -> list:
+    """
+    :param results: Dictionary of metric name -> seconds
+    :param baseline: Dictionary of metric name -> seconds
+    :param tolerance: Float how much slower than the baseline (0.5 = 50%) a metric may be
+    :param min_delta: Float seconds a metric must be slower by before it counts, small timings are noisy
+    :return: List of (metric, baseline, result) which regressed
+    """
+    return [(name, baseline[name], value) for name, value in sorted(results.items())
+            if name in baseline and value > baseline[name] * (1 + tolerance) and value - baseline[name] > min_delta]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline benchmark suite")
+    parser.add_argument("--rounds", type=int, default=30, help="Samples taken of each per command metric")
+    parser.add_argument("--output", help="Writes the results as JSON to this path")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed slowdown against the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="Stores the results as the new baseline")
+    args = parser.parse_args()
+
+    results = run(args.rounds)
+    report = {"python": platform.python_version(), "machine": platform.machine(), "metrics": results}
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(json.dumps(report, indent=4, sort_keys=True))
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r") as file:
+            baseline = json.loads(file.read())["metrics"]
+
+    for name, value in sorted(results.items()):
+        change = f"{(value / baseline[name] - 1) * 100:+.0f}%" if baseline.get(name) else "n/a"
+        print(f"{name:<32}{value * 1000:>12.3f} ms   baseline {baseline.get(name, 0) * 1000:>10.3f} ms   {change}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as file:
+            file.write(json.dumps(report, indent=4, sort_keys=True) + "\n")
+        print(f"Stored the results as the baseline: {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, args.tolerance)
+    for name, before, after in regressions:
+        print(f"REGRESSION {name}: {before * 1000:.3f} ms -> {after * 1000:.3f} ms")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
-import os
 import json
 import argparse
 from pi_assistant.log import logger
-from collections import defaultdict
-from pi_assistant.main import start_assistant
-from pi_assistant.profile.Profile import Profile
+from pi_assistant.util import set_reply_sink
+from pi_assistant.main import start_assistant, nlu_cache, understand
+from pi_assistant.plugins.plugin_manager import PluginManager
+from pi_assistant.plugins.plugin_environment import SimulatedEnvironment
+from pi_assistant.replay import Replay, NullReplySink
+from pi_assistant.devices import DeviceRegistry
+from pi_assistant.profile.profile_store import ProfileStore
 
 
 __version__ = "0.0.1"
@@ -18,6 +21,7 @@ def main():
     """
     pos_arg_choice_map = {
         "app:start": run,
+        "app:replay": replay,
         "profile:create": create_profile,
         "profile:update": lambda x: x,  # TODO
         "profile:delete": delete_profile,
@@ -26,12 +30,13 @@ def main():
         "group:create": create_group,
         "group:delete": delete_group,
         "device:link": link_device,
-        "device:unlink": lambda x: x  # TODO
+        "device:unlink": unlink_device,
+        "nlu:invalidate": invalidate_nlu_cache
     }
     parser = argparse.ArgumentParser(description='Pi Assistant - Smart Home Assistant')
     parser.add_argument('command', type=str, help='A required string positional argument'
                                                   ' which designates which service to invoke for the assistant. '
-                                                  'This can be one of: "app", "profile", "room", "group".',
+                                                  'This can be one of: "app", "profile", "room", "group", "device", "nlu".',
                         choices=pos_arg_choice_map.keys())
     parser.add_argument('--profile', type=str, help='The name of the profile the assistant should load and use.'
                                                              ' A profile designates a specific home, set of rooms, and'
@@ -44,6 +49,23 @@ def main():
     parser.add_argument('--room', help='An argument used to specify a room name to add an IoT device to.',
                         required=False)
 
+    parser.add_argument('--plugin', help='An argument used to link every device of a plugin to a room.',
+                        required=False)
+
+    parser.add_argument('--file', help='A file listing the names, ids or glob patterns of devices to link to a room, '
+                                       'or the utterances and NLU responses to replay, one per line.', required=False)
+
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='The number of commands app:replay runs at the same time.', required=False)
+
+    parser.add_argument('--repeat', type=int, default=1, help='The number of times app:replay replays the file.',
+                        required=False)
+
+    parser.add_argument('--device-latency-ms', type=float, default=0.0,
+                        help='How long the simulated devices used by app:replay take to respond.', required=False)
+
+    parser.add_argument('--json', action='store_true', help='Prints the app:replay report as JSON.')
+
     args = parser.parse_args()
 
     # Execute the right action based on the pos argument command input
@@ -57,52 +79,84 @@ def run(args) -> None:
     :return:
     """
     if args.profile:
-        profile = Profile().load_json_file(os.path.join(".", "resources", "profile", args.profile + ".json"))
-        start_assistant(profile)
+        start_assistant(ProfileStore().load(args.profile))
     else:
         # TODO perhaps a default profile should be loaded?
         start_assistant(None)
 
 
+def replay(args) -> None:
+    """
+    Replays a file of utterances or pre-recorded Wit.ai responses (one per line) through the plugins without a
+    microphone and reports the throughput and per intent latency. Replies are discarded instead of spoken and devices
+    are simulated so nothing in the home is switched.
+    :param: args:
+    :return:
+    """
+    if not args.file:
+        raise Exception("The --file argument must be specified with the utterances or NLU responses to replay.")
+
+    commands = Replay.load(args.file) * max(1, args.repeat)
+    set_reply_sink(NullReplySink())
+    # The plugins are given simulated devices and web services so nothing is searched for, called or switched
+    replay_plugin_manager = PluginManager(environment=SimulatedEnvironment(args.device_latency_ms / 1000))
+    replay_plugin_manager.init_plugins(ProfileStore().load(args.profile) if args.profile else None)
+
+    report = Replay(replay_plugin_manager.handle_intent, understand=understand,
+                    concurrency=args.concurrency).run(commands)
+    print(json.dumps(report.to_dict(), indent=4) if args.json else report.format())
+
+
 def link_device(args) -> None:
+    """
+    Links one or many devices to a room in the specified profile. Devices are selected by name, id or glob pattern
+    with --name, from a file with one selector per line with --file or all the devices of a plugin with --plugin. Every
+    selected device is linked in a single transaction.
+    :param args:
+    :return:
+    """
     if not args.profile:
         raise Exception("You must specify the --profile option in order to add a device to a specific room.")
 
-    if not args.name:
-        raise Exception("The --name argument must be specified when linking a device to a room. "
-                        "The name argument should be the name of the device.")
+    if not args.name and not args.file and not args.plugin:
+        raise Exception("The --name, --file or --plugin argument must be specified when linking devices to a room. "
+                        "The name argument should be the name, id or a glob pattern matching the devices.")
 
     if not args.room:
         raise Exception("The --room argument is required when linking a device to a specific room.")
 
-    profile = Profile.load_json_file(os.path.join(".", "resources", "profiles", args.profile + ".json"))
+    selectors = [args.name] if args.name else []
+    if args.file:
+        with open(args.file, 'r') as selector_file:
+            selectors += [line.strip() for line in selector_file if line.strip() and not line.startswith("#")]
 
-    if args.room.lower() not in profile.rooms:
-        raise Exception(f"No room could be found in the profile: {args.profile} with the name: {args.room.lower()}")
-
-    current_devices = profile.rooms[args.room.lower()]
     try:
-        with open(os.path.join('.', 'resources', 'devices.json'), 'r') as device_file:
-            devices = json.loads(device_file.read())
-            device_file.close()
-
-        # Devices are keyed by the plugin name
-        for k in devices.keys():
-            for device in devices[k]:
-                # TODO Should this be case sensitive?
-                if device['name'].lower() == args.name.lower():
-                    if device['name'].lower() in current_devices:
-                        raise Exception(f"The device: {device['name'].lower()} "
-                                        f"already belongs to the room: {args.room.lower()}.")
-                    else:
-                        current_devices[args.name.lower()] = device
-
-        profile.rooms[args.room.lower()] = current_devices
-        logger.info(f"Successfully linked device {args.name} to room {args.room} in profile: {args.profile}.")
-        profile.save()
+        devices = DeviceRegistry.shared().index.select(selectors, args.plugin)
+        linked = ProfileStore().link_devices(args.profile, args.room, [device.to_dict() for device in devices])
+        logger.info(f"Successfully linked {linked} devices to room {args.room} in profile: {args.profile}. "
+                    f"{len(devices) - linked} devices already belonged to the room.")
     except Exception as e:
-        logger.error(f"Error thrown while attempting to link device: {args.name} to room: {args.room}. "
-                     f"Error = {str(e)}")
+        logger.error(f"Error thrown while attempting to link devices to room: {args.room}. Error = {str(e)}")
+
+
+def unlink_device(args) -> None:
+    """
+    Removes a device from a room in the specified profile.
+    :param args:
+    :return:
+    """
+    if not args.profile:
+        raise Exception("You must specify the --profile option in order to remove a device from a specific room.")
+
+    if not args.name:
+        raise Exception("The --name argument must be specified when unlinking a device from a room. "
+                        "The name argument should be the name of the device.")
+
+    if not args.room:
+        raise Exception("The --room argument is required when unlinking a device from a specific room.")
+
+    ProfileStore().unlink_device(args.profile, args.room, args.name)
+    logger.info(f"Successfully unlinked device {args.name} from room {args.room} in profile: {args.profile}.")
 
 
 def create_profile(args) -> None:
@@ -113,9 +167,7 @@ def create_profile(args) -> None:
     """
     if not args.name:
         raise Exception("The --name argument must be specified when creating a new profile.")
-    profile = Profile()
-    profile.name = args.name
-    profile.save()
+    ProfileStore().create_profile(args.name)
     logger.info(f"Successfully created the new profile: {args.name}!")
 
 
@@ -127,7 +179,7 @@ def delete_profile(args):
     """
     if not args.name:
         raise Exception("The --name argument must be specified when deleting an existing profile.")
-    os.unlink(os.path.join(".", "resources", "profiles", args.name + ".json"))
+    ProfileStore().delete_profile(args.name)
 
 
 def create_room(args) -> None:
@@ -141,14 +193,8 @@ def create_room(args) -> None:
 
     if not args.name:
         raise Exception("The --name argument must be specified when creating a new room.")
-    profile = Profile.load_json_file(os.path.join(".", "resources", "profiles", args.profile + ".json"))
 
-    if args.name.lower() in profile.rooms:
-        raise Exception(f"The room name: {args.name} already exists in the profile: {args.profile}. "
-                        f"Please use a new --name.")
-
-    profile.rooms[args.name.lower()] = defaultdict(dict)
-    profile.save()
+    ProfileStore().create_room(args.profile, args.name)
     logger.info(f"Successfully created a new room: {args.name} and added it to the profile: {args.profile}")
 
 
@@ -164,9 +210,7 @@ def delete_room(args) -> None:
     if not args.name:
         raise Exception("The --name argument must be specified when deleting an existing room.")
 
-    profile = Profile.load_json_file(os.path.join(".", "resources", "profiles", args.profile + ".json"))
-    del profile.rooms[args.name.lower()]
-    profile.save()
+    ProfileStore().delete_room(args.profile, args.name)
 
 
 def delete_group(args) -> None:
@@ -181,9 +225,7 @@ def delete_group(args) -> None:
     if not args.name:
         raise Exception("The --name argument must be specified when deleting an existing group.")
 
-    profile = Profile.load_json_file(os.path.join(".", "resources", "profiles", args.profile + ".json"))
-    del profile.groups[args.name.lower()]
-    profile.save()
+    ProfileStore().delete_group(args.profile, args.name)
 
 
 def create_group(args) -> None:
@@ -197,16 +239,19 @@ def create_group(args) -> None:
 
     if not args.name:
         raise Exception("The --name argument must be specified when creating a new group.")
-    profile = Profile.load_json_file(os.path.join(".", "resources", "profiles", args.profile + ".json"))
-
-    if args.name.lower() in profile.groups:
-        raise Exception(f"The group name: {args.name} already exists in the profile: {args.profile}. "
-                        f"Please use a new --name.")
 
-    profile.groups[args.name.lower()] = defaultdict(dict)
-    profile.save()
+    ProfileStore().create_group(args.profile, args.name)
     logger.info(f"Successfully created a new group: {args.name} and added it to the profile: {args.profile}")
 
 
+def invalidate_nlu_cache(args) -> None:
+    """
+    Removes every cached Wit.ai response. Run this after changing the utterances or intents in the Wit.ai app.
+    :param args:
+    :return:
+    """
+    nlu_cache.invalidate()
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,4 @@
+from pi_assistant.audio.speech_gate import SpeechGate
+from pi_assistant.audio.ring_buffer import AudioRingBuffer
+from pi_assistant.audio.phrase_segmenter import PhraseSegmenter
+from pi_assistant.audio.capture import AudioCapture, Phrase
@@ -0,0 +1,131 @@
+import threading
+import speech_recognition as sr
+from typing import Callable
+from pi_assistant.log import logger
+from pi_assistant.config import Configuration
+from pi_assistant.audio.ring_buffer import AudioRingBuffer
+from pi_assistant.audio.phrase_segmenter import PhraseSegmenter
+
+
+class Phrase:
+    """
+    A phrase cut out of the capture ring buffer.
+    """
+    def __init__(self, audio: sr.AudioData, start: int, end: int):
+        self.audio = audio
+        self.start = start  # Absolute byte positions within the captured stream
+        self.end = end
+
+    def duration(self) -> float:
+        return len(self.audio.frame_data) / (self.audio.sample_rate * self.audio.sample_width)
+
+
+class AudioCapture:
+    """
+    Continuously reads the microphone on a dedicated thread into a fixed size ring buffer. The source is opened and
+    calibrated once, phrases are found in the stream by a PhraseSegmenter and cut out of the ring buffer (including
+    pre-roll) so no audio is lost between the keyword and the command and the first word of a command isn't clipped.
+    """
+
+    def __init__(self, source: sr.AudioSource, on_phrase: Callable[[Phrase], None], buffer_seconds: float = 30,
+                 calibration_seconds: float = 1.0, segmenter_options: dict = None,
+                 on_phrase_audio: Callable[[int, int, bytes], None] = None):
+        """
+        :param source: The microphone to read from. It is opened once for the lifetime of the capture.
+        :param on_phrase: Function called (on the capture thread) with every completed Phrase
+        :param buffer_seconds: Float seconds of audio retained in the ring buffer
+        :param calibration_seconds: Float seconds of audio used to measure the ambient noise at startup
+        :param segmenter_options: Dictionary of keyword arguments passed through to the PhraseSegmenter
+        :param on_phrase_audio: Optional function (start, end, audio) called on the capture thread with the audio of the
+        phrase in progress as it is captured, starting with the pre-roll, so phrases can be processed while they are
+        still being spoken. start is the absolute start position of the phrase and end the absolute position of the
+        end of the audio. Audio captured earlier in the phrase can be read back with cut(start, end)
+        """
+        self._source = source
+        self._on_phrase = on_phrase
+        self._buffer_seconds = buffer_seconds
+        self._calibration_seconds = calibration_seconds
+        self._segmenter_options = segmenter_options or {}
+        self._on_phrase_audio = on_phrase_audio
+        self._ring = None
+        self._segmenter = None
+        self._running = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def from_config(config: Configuration, source: sr.AudioSource, on_phrase: Callable[[Phrase], None],
+                    on_phrase_audio: Callable[[int, int, bytes], None] = None):
+        return AudioCapture(source, on_phrase, on_phrase_audio=on_phrase_audio,
+                            buffer_seconds=config.get("audio.capture.buffer_seconds"),
+                            calibration_seconds=config.get("audio.capture.calibration_seconds"),
+                            segmenter_options={
+                                "energy_ratio": config.get("audio.capture.energy_ratio"),
+                                "min_energy": config.get("audio.capture.min_energy"),
+                                "preroll_seconds": config.get("audio.capture.preroll_seconds"),
+                                "pause_seconds": config.get("audio.capture.pause_seconds"),
+                                "max_phrase_seconds": config.get("audio.capture.max_phrase_seconds"),
+                            })
+
+    def start(self) -> None:
+        self._running.set()
+        self._thread = threading.Thread(target=self.__run, name="capture", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2) -> None:
+        self._running.clear()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def cut(self, start: int, end: int = None) -> sr.AudioData:
+        """
+        Cuts a segment of audio out of the ring buffer.
+        :param start: Int absolute start position
+        :param end: Int absolute end position, defaults to the most recently captured audio
+        :return: AudioData
+        """
+        return sr.AudioData(self._ring.read(start, end), self._source.SAMPLE_RATE, self._source.SAMPLE_WIDTH)
+
+    @property
+    def position(self) -> int:
+        return self._ring.position if self._ring is not None else 0
+
+    def __run(self) -> None:
+        with self._source as source:
+            bytes_per_second = source.SAMPLE_RATE * source.SAMPLE_WIDTH
+            self._ring = AudioRingBuffer(int(self._buffer_seconds * bytes_per_second), source.SAMPLE_WIDTH)
+
+            # Calibrate once against the ambient noise of the room rather than before every phrase
+            calibration = bytearray()
+            while self._running.is_set() and len(calibration) < self._calibration_seconds * bytes_per_second:
+                chunk = source.stream.read(source.CHUNK)
+                calibration.extend(chunk)
+                self._ring.write(chunk)
+            ambient_energy = PhraseSegmenter.rms(bytes(calibration))
+            self._segmenter = PhraseSegmenter(source.SAMPLE_RATE, source.SAMPLE_WIDTH, ambient_energy,
+                                              **self._segmenter_options)
+            logger.info(f"Calibrated microphone. Ambient energy = {ambient_energy:.0f}, "
+                        f"speech threshold = {self._segmenter.threshold:.0f}")
+
+            while self._running.is_set():
+                chunk = source.stream.read(source.CHUNK)
+                position = self._ring.write(chunk)
+                in_phrase = self._segmenter.in_phrase
+                bounds = self._segmenter.feed(chunk, position)
+                if self._on_phrase_audio is not None:
+                    self.__stream_phrase_audio(chunk, position, in_phrase, bounds)
+                if bounds is not None:
+                    start, end = bounds
+                    try:
+                        self._on_phrase(Phrase(self.cut(start, end), start, end))
+                    except Exception as e:
+                        logger.error(f"Exception thrown while handling a captured phrase. Error = {str(e)}")
+
+    def __stream_phrase_audio(self, chunk: bytes, position: int, in_phrase: bool, bounds: tuple) -> None:
+        start = bounds[0] if bounds is not None else self._segmenter.phrase_start
+        if start is None:
+            return
+        try:
+            # A phrase which just started is handed its pre-roll along with the chunk which started it
+            self._on_phrase_audio(start, position, chunk if in_phrase else self._ring.read(start, position))
+        except Exception as e:
+            logger.error(f"Exception thrown while streaming the audio of a phrase. Error = {str(e)}")
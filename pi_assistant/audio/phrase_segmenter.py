@@ -0,0 +1,84 @@
+import numpy as np
+
+
+class PhraseSegmenter:
+    """
+    Finds phrases in a continuous stream of audio chunks. A phrase starts with the first chunk louder than the energy
+    threshold (minus a pre-roll so the start of the first word isn't clipped) and ends after a pause of quiet chunks or
+    when it reaches the maximum phrase length. While no phrase is in progress the threshold follows the ambient noise.
+    """
+
+    def __init__(self, sample_rate: int, sample_width: int, ambient_energy: float, energy_ratio: float = 1.5,
+                 min_energy: float = 300, preroll_seconds: float = 0.5, pause_seconds: float = 0.8,
+                 max_phrase_seconds: float = 15, ambient_adaptation: float = 0.05):
+        """
+        :param sample_rate: Int samples per second
+        :param sample_width: Int bytes per sample
+        :param ambient_energy: Float the RMS energy of the room when nobody is speaking
+        :param energy_ratio: Float how many times louder than the ambient noise a chunk must be to count as speech
+        :param min_energy: Float the minimum RMS energy of speech regardless of the ambient noise
+        :param preroll_seconds: Float seconds of audio before the first loud chunk to include in the phrase
+        :param pause_seconds: Float seconds of quiet which end a phrase
+        :param max_phrase_seconds: Float the maximum length of a phrase
+        :param ambient_adaptation: Float how quickly the ambient noise estimate tracks quiet chunks (0-1)
+        """
+        self._bytes_per_second = sample_rate * sample_width
+        self._sample_width = sample_width
+        self._ambient_energy = ambient_energy
+        self._energy_ratio = energy_ratio
+        self._min_energy = min_energy
+        self._preroll = self.__align(preroll_seconds * self._bytes_per_second)
+        self._pause_seconds = pause_seconds
+        self._max_phrase = self.__align(max_phrase_seconds * self._bytes_per_second)
+        self._ambient_adaptation = ambient_adaptation
+        self._phrase_start = None
+        self._quiet_seconds = 0.0
+
+    @staticmethod
+    def rms(chunk: bytes) -> float:
+        samples = np.frombuffer(chunk, dtype="<i2").astype(np.float32)
+        return float(np.sqrt(np.mean(samples * samples))) if len(samples) else 0.0
+
+    @property
+    def threshold(self) -> float:
+        return max(self._min_energy, self._ambient_energy * self._energy_ratio)
+
+    @property
+    def in_phrase(self) -> bool:
+        return self._phrase_start is not None
+
+    @property
+    def phrase_start(self) -> int:
+        """
+        :return: Int the absolute start position of the phrase in progress or None
+        """
+        return self._phrase_start
+
+    def feed(self, chunk: bytes, end_position: int) -> tuple:
+        """
+        Processes the next chunk of audio.
+        :param chunk: Bytes of 16 bit PCM audio
+        :param end_position: Int the absolute position of the end of the chunk in the audio stream
+        :return: Tuple of (start, end) absolute positions when the chunk completes a phrase otherwise None
+        """
+        energy = PhraseSegmenter.rms(chunk)
+        loud = energy > self.threshold
+
+        if self._phrase_start is None:
+            if not loud:
+                self._ambient_energy += self._ambient_adaptation * (energy - self._ambient_energy)
+                return None
+            self._phrase_start = max(0, end_position - len(chunk) - self._preroll)
+            self._quiet_seconds = 0.0
+            return None
+
+        self._quiet_seconds = 0.0 if loud else self._quiet_seconds + len(chunk) / self._bytes_per_second
+        if self._quiet_seconds >= self._pause_seconds or end_position - self._phrase_start >= self._max_phrase:
+            phrase = (self._phrase_start, end_position)
+            self._phrase_start = None
+            return phrase
+        return None
+
+    def __align(self, length: float) -> int:
+        length = int(length)
+        return length - length % self._sample_width
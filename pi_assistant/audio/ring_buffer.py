@@ -0,0 +1,66 @@
+import threading
+
+
+class AudioRingBuffer:
+    """
+    A fixed size circular buffer of raw PCM audio. Positions are absolute byte offsets since capture started so a
+    segment of audio can be addressed (and cut out later) while newer audio keeps being written. Once the buffer is full
+    the oldest audio is overwritten.
+    """
+
+    def __init__(self, capacity: int, sample_width: int = 2):
+        """
+        :param capacity: Int the number of bytes of audio to retain, rounded down to a whole number of samples
+        :param sample_width: Int the number of bytes in a single sample
+        """
+        self._sample_width = sample_width
+        self._capacity = capacity - capacity % sample_width
+        self._buffer = bytearray(self._capacity)
+        self._written = 0
+        self._lock = threading.Lock()
+
+    def write(self, data: bytes) -> int:
+        """
+        Appends audio to the buffer overwriting the oldest audio once full.
+        :param data: Bytes of PCM audio
+        :return: Int the absolute position of the end of the written data
+        """
+        with self._lock:
+            if len(data) >= self._capacity:
+                # Only the newest capacity bytes can be retained
+                self._written += len(data) - self._capacity
+                data = data[-self._capacity:]
+            offset = self._written % self._capacity
+            first = min(len(data), self._capacity - offset)
+            self._buffer[offset:offset + first] = data[:first]
+            self._buffer[:len(data) - first] = data[first:]
+            self._written += len(data)
+            return self._written
+
+    def read(self, start: int, end: int = None) -> bytes:
+        """
+        Returns the audio between two absolute positions. Any part of the range which has already been overwritten is
+        dropped from the start of the result.
+        :param start: Int absolute position of the first byte
+        :param end: Int absolute position after the last byte, defaults to the current position
+        :return: Bytes of PCM audio
+        """
+        with self._lock:
+            end = self._written if end is None else min(end, self._written)
+            start = max(start, self._written - self._capacity, 0)
+            start -= start % self._sample_width
+            if start >= end:
+                return b""
+            first = start % self._capacity
+            length = end - start
+            if first + length <= self._capacity:
+                return bytes(self._buffer[first:first + length])
+            return bytes(self._buffer[first:]) + bytes(self._buffer[:length - (self._capacity - first)])
+
+    @property
+    def position(self) -> int:
+        return self._written
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
@@ -0,0 +1,116 @@
+import threading
+import numpy as np
+import speech_recognition as sr
+from pi_assistant.config import Configuration
+
+
+class SpeechGate:
+    """
+    A cheap voice activity gate which runs in front of Sphinx keyword spotting. The audio is split into short frames
+    and two features are computed for every frame at once with NumPy:
+
+    - energy: the RMS amplitude of the frame
+    - zero crossing rate: the fraction of adjacent samples which change sign
+
+    A frame looks like speech when its energy is well above the background noise floor and its zero crossing rate is in
+    the range of voiced speech (broadband noise like a fan or static crosses zero far more often). Only phrases with
+    enough speech-like frames are passed on to Sphinx so the decoder isn't run on every bit of background noise.
+    """
+
+    def __init__(self, frame_ms: int = 30, energy_ratio: float = 2.5, min_energy: float = 300,
+                 min_zcr: float = 0.01, max_zcr: float = 0.35, min_speech_frames: int = 8, noise_adaptation: float = 0.1):
+        """
+        :param frame_ms: Int the length of a single analysis frame in milliseconds
+        :param energy_ratio: Float how many times louder than the noise floor a frame must be to count as speech
+        :param min_energy: Float the minimum RMS energy of a speech frame regardless of the noise floor
+        :param min_zcr: Float the minimum zero crossing rate of a speech frame
+        :param max_zcr: Float the maximum zero crossing rate of a speech frame
+        :param min_speech_frames: Int the number of speech frames a phrase needs to be passed to the keyword spotter
+        :param noise_adaptation: Float how quickly the noise floor tracks the quietest frames of recent phrases (0-1)
+        """
+        self._frame_ms = frame_ms
+        self._energy_ratio = energy_ratio
+        self._min_energy = min_energy
+        self._min_zcr = min_zcr
+        self._max_zcr = max_zcr
+        self._min_speech_frames = min_speech_frames
+        self._noise_adaptation = noise_adaptation
+        self._noise_floor = None
+        self._lock = threading.Lock()
+        self._passed = 0
+        self._rejected = 0
+
+    @staticmethod
+    def from_config(config: Configuration):
+        return SpeechGate(frame_ms=config.get("audio.speech_gate.frame_ms"),
+                          energy_ratio=config.get("audio.speech_gate.energy_ratio"),
+                          min_energy=config.get("audio.speech_gate.min_energy"),
+                          min_zcr=config.get("audio.speech_gate.min_zcr"),
+                          max_zcr=config.get("audio.speech_gate.max_zcr"),
+                          min_speech_frames=config.get("audio.speech_gate.min_speech_frames"))
+
+    def frame_features(self, raw: bytes, sample_rate: int) -> tuple:
+        """
+        Computes the per frame RMS energy and zero crossing rate of 16 bit mono PCM audio.
+        :param raw: Bytes of little endian signed 16 bit PCM samples
+        :param sample_rate: Int samples per second
+        :return: Tuple of (energy, zero crossing rate) NumPy arrays with one value per frame
+        """
+        frame_length = max(1, int(sample_rate * self._frame_ms / 1000))
+        samples = np.frombuffer(raw, dtype="<i2")
+        frame_count = len(samples) // frame_length
+        if frame_count == 0:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+
+        frames = samples[:frame_count * frame_length].reshape(frame_count, frame_length).astype(np.float32)
+        energy = np.sqrt(np.mean(frames * frames, axis=1))
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (frame_length - 1 or 1)
+        return energy, zcr
+
+    def speech_frames(self, raw: bytes, sample_rate: int) -> int:
+        """
+        Counts the frames which look like speech and updates the noise floor estimate.
+        :return: Int the number of speech-like frames
+        """
+        energy, zcr = self.frame_features(raw, sample_rate)
+        if len(energy) == 0:
+            return 0
+
+        with self._lock:
+            # The quietest frames of a phrase are a good estimate of the background noise
+            quiet = float(np.percentile(energy, 10))
+            if self._noise_floor is None:
+                self._noise_floor = quiet
+            else:
+                self._noise_floor += self._noise_adaptation * (quiet - self._noise_floor)
+            threshold = max(self._min_energy, self._noise_floor * self._energy_ratio)
+
+        speech = (energy > threshold) & (zcr >= self._min_zcr) & (zcr <= self._max_zcr)
+        return int(np.count_nonzero(speech))
+
+    def is_speech(self, audio: sr.AudioData) -> bool:
+        """
+        Determines if a captured phrase is likely to contain speech and should be passed to the keyword spotter.
+        :param audio: AudioData the captured phrase
+        :return: True if the phrase looks like speech and false otherwise
+        """
+        raw = audio.get_raw_data(convert_width=2)
+        passed = self.speech_frames(raw, audio.sample_rate) >= self._min_speech_frames
+        with self._lock:
+            if passed:
+                self._passed += 1
+            else:
+                self._rejected += 1
+        return passed
+
+    @property
+    def noise_floor(self) -> float:
+        return self._noise_floor
+
+    def stats(self) -> dict:
+        return {
+            "passed": self._passed,
+            "rejected": self._rejected,
+            "noise_floor": self._noise_floor,
+        }
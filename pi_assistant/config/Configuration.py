@@ -1,61 +1,194 @@
 import os
 import yaml
+import threading
+from types import MappingProxyType
+from typing import Callable
 from pi_assistant.log import logger
 
 
 class Configuration:
     """
-    Loads and provides an access point to a single source of application configuration
+    Loads and provides an access point to a single source of application configuration.
+
+    application.yml is deep merged with the environment specific application-<environment>.yml and flattened into an
+    immutable index of every dotted key ("plugins.weather.enabled", "plugins.weather", "plugins", ...) so a lookup is a
+    single dictionary access. The YAML files can be watched for changes in which case a new index is built and swapped
+    in atomically and any registered listeners are notified.
     """
+    _shared = None
+    _shared_lock = threading.Lock()
 
-    def __init__(self, environment: str = os.getenv("ENVIRONMENT", "LOCAL")):
+    def __init__(self, environment: str = os.getenv("ENVIRONMENT", "LOCAL"),
+                 directory: str = os.path.join('.', 'resources')):
         self._environment = environment
         # Always load application.yml as the default configuration but if additional env specific
         # configuration is present it should overwrite values specified in application.yml
-        try:
-            print()
-            with open(os.path.join('.', 'resources', 'application.yml'), 'r') as file:
-                self._yaml_config = yaml.safe_load(file)
-        except Exception as e:
-            logger.error(f"Exception thrown while attempting to load application.yaml configuration properties. Error = {str(e)}")
-            self._yaml_config = {}
-
-        # Attempt to load any environment specific configuration
-        path = os.path.join('resources', f'application-{environment.lower()}.yml')
-        if os.path.exists(path):
-            try:
-                with open(path, 'r') as file:
-                    # Merge two configuration files overwriting values from the environment specific config
-                    self._yaml_config.update(yaml.safe_load(file))
-            except Exception as e:
-                logger.error(f"Exception thrown while attempting to load {path} configuration properties. Error = {str(e)}")
-
-        else:
-            logger.debug(f"No environment specific configuration exists for the environment: {environment.lower()}")
-
-    def get(self, key: str) -> str:
+        self._paths = [os.path.join(directory, 'application.yml'),
+                       os.path.join(directory, f'application-{environment.lower()}.yml')]
+        self._snapshot = (None, MappingProxyType({}))
+        self._mtimes = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._watcher = None
+        self.reload()
+
+    @staticmethod
+    def shared():
+        """
+        Returns the configuration shared by the running assistant so every component sees the same (hot reloaded)
+        values.
+        :return: Configuration
+        """
+        if Configuration._shared is None:
+            with Configuration._shared_lock:
+                if Configuration._shared is None:
+                    Configuration._shared = Configuration()
+        return Configuration._shared
+
+    @staticmethod
+    def merge(base: dict, overlay: dict) -> dict:
+        """
+        Deep merges two configuration dictionaries. Nested sections are merged key by key while any other value
+        (including lists) in the overlay replaces the value in the base.
+        :param base: Dictionary the base configuration
+        :param overlay: Dictionary the configuration which takes precedence
+        :return: Dictionary a new merged configuration
+        """
+        merged = dict(base)
+        for key, value in overlay.items():
+            if isinstance(value, dict) and isinstance(merged.get(key), dict):
+                merged[key] = Configuration.merge(merged[key], value)
+            else:
+                merged[key] = value
+        return merged
+
+    @staticmethod
+    def flatten(config: dict) -> MappingProxyType:
+        """
+        Builds an index of every dotted key path in the configuration to its value.
+        :param config: Dictionary the merged configuration
+        :return: Read only mapping of dotted key -> value
+        """
+        index = {}
+        stack = [("", config)]
+        while stack:
+            prefix, section = stack.pop()
+            for key, value in section.items():
+                path = f"{prefix}{key}"
+                index[path] = value
+                if isinstance(value, dict):
+                    stack.append((path + ".", value))
+        return MappingProxyType(index)
+
+    def reload(self) -> bool:
+        """
+        Loads the YAML files from disk and atomically swaps in the new configuration.
+        :return: True if the configuration changed and false otherwise
+        """
+        with self._lock:
+            mtimes = {path: os.path.getmtime(path) for path in self._paths if os.path.exists(path)}
+            yaml_config = None
+            for path in self._paths:
+                if path not in mtimes:
+                    logger.debug(f"No configuration exists at: {path}")
+                    continue
+                try:
+                    with open(path, 'r') as file:
+                        loaded = yaml.safe_load(file) or {}
+                except Exception as e:
+                    logger.error(f"Exception thrown while attempting to load {path} configuration properties. "
+                                 f"Error = {str(e)}")
+                    if self._snapshot[0] is not None:
+                        # Keep serving the last good configuration while a file is being edited
+                        return False
+                    loaded = {}
+                yaml_config = loaded if yaml_config is None else Configuration.merge(yaml_config, loaded)
+
+            self._mtimes = mtimes
+            yaml_config = yaml_config if yaml_config is not None else {}
+            changed = yaml_config != self._snapshot[0]
+            self._snapshot = (yaml_config, Configuration.flatten(yaml_config))
+            listeners = list(self._listeners)
+
+        if changed:
+            for listener in listeners:
+                try:
+                    listener(self)
+                except Exception as e:
+                    logger.error(f"Exception thrown by a configuration change listener. Error = {str(e)}")
+        return changed
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reloads the configuration if any of the YAML files were created, modified or deleted since they were loaded.
+        :return: True if the configuration changed and false otherwise
+        """
+        mtimes = {path: os.path.getmtime(path) for path in self._paths if os.path.exists(path)}
+        if mtimes == self._mtimes:
+            return False
+        logger.info("Configuration files changed on disk. Reloading configuration.")
+        return self.reload()
+
+    def watch(self, interval: float = 2.0) -> None:
+        """
+        Starts a background thread which checks the YAML files for changes every interval seconds.
+        :param interval: Float seconds between checks
+        :return: None
+        """
+        if self._watcher is not None:
+            return
+
+        def poll():
+            while not stop.wait(interval):
+                try:
+                    self.reload_if_changed()
+                except Exception as e:
+                    logger.error(f"Exception thrown while reloading configuration. Error = {str(e)}")
+
+        stop = threading.Event()
+        self._watcher = (threading.Thread(target=poll, name="config-watcher", daemon=True), stop)
+        self._watcher[0].start()
+
+    def stop_watching(self) -> None:
+        if self._watcher is not None:
+            self._watcher[1].set()
+            self._watcher = None
+
+    def on_change(self, listener: Callable) -> None:
+        """
+        Registers a function which is called with this configuration whenever a reload changes it.
+        :param listener: Function (Configuration) -> None
+        :return: None
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def get(self, key: str):
         if key.endswith("."):
             raise KeyError("The key cannot end with a \".\"")
 
-        if self._yaml_config is None or self._yaml_config is {}:
+        yaml_config, index = self._snapshot
+        if yaml_config is None:
             raise Exception(f"Cannot retrieve configuration from null config. Using key: {key}")
 
+        try:
+            return index[key]
+        except KeyError:
+            pass
+
+        # Report the first part of the key which is missing
         parts = key.split(".")
-        data = None
-        for k in parts:
-            if data is None:
-                if k in self._yaml_config:
-                    data = self._yaml_config[k]
-                else:
-                    raise KeyError(f"The key part: {k} from the given key: {key} does not exist in the configuration. Config = {self._yaml_config}")
-            else:
-                if k in data:
-                    data = data[k]
-                else:
-                    raise KeyError(f"The key part: {k} from the given key: {key} does not exist in the configuration. Config = {data}")
-        return data
+        for i in range(len(parts)):
+            if ".".join(parts[:i + 1]) not in index:
+                raise KeyError(f"The key part: {parts[i]} from the given key: {key} does not exist in the configuration.")
 
     def get_environment(self):
         return self._environment
 
+    @property
+    def _yaml_config(self) -> dict:
+        return self._snapshot[0]
 
+    @_yaml_config.setter
+    def _yaml_config(self, value: dict) -> None:
+        self._snapshot = (value, Configuration.flatten(value) if value is not None else MappingProxyType({}))
@@ -0,0 +1,202 @@
+import json
+import time
+import asyncio
+from typing import Callable
+from pi_assistant.log import logger
+from pi_assistant.config import Configuration
+from pi_assistant.tracing import Tracer
+from pi_assistant.pipeline import VoicePipeline
+from pi_assistant.plugins.plugin_manager import PluginManager
+
+REQUEST_TYPES = ("command", "status", "metrics", "reload")
+
+
+class ControlServer:
+    """
+    Lets other programs drive the assistant over a local socket. The protocol is line delimited JSON, each request is a
+    single JSON object on its own line and is answered by a single JSON object on its own line:
+
+        {"type": "command", "text": "turn on the lights", "id": 1}  -> {"id": 1, "ok": true, "intent": ..., ...}
+        {"type": "status"} | {"type": "metrics"} | {"type": "reload"}
+        {"type": "metrics", "format": "prometheus"}  -> {"ok": true, "text": "<Prometheus text format>"}
+
+    Text commands skip the hotword and STT stages and go straight to NLU and dispatch. Any number of clients can be
+    connected at once, the requests of a single client are answered in order.
+    """
+
+    def __init__(self, pipeline: VoicePipeline, plugin_manager: PluginManager, config: Configuration,
+                 host: str = "127.0.0.1", port: int = 65432, max_line_bytes: int = 65536, metrics: dict = None,
+                 tracer: Tracer = None):
+        """
+        :param pipeline: VoicePipeline the running voice pipeline text commands are handed to
+        :param plugin_manager: PluginManager whose plugin states are reported by status requests
+        :param config: Configuration reloaded by reload requests
+        :param host: String the address to listen on
+        :param port: Int the port to listen on, 0 picks a free port
+        :param max_line_bytes: Int the longest request accepted
+        :param metrics: Dictionary of name -> function returning a dictionary of metrics included in metrics responses
+        :param tracer: Tracer whose stage histograms are served in the Prometheus text format
+        """
+        self._pipeline = pipeline
+        self._plugin_manager = plugin_manager
+        self._config = config
+        self._host = host
+        self._port = port
+        self._max_line_bytes = max_line_bytes
+        self._metrics = dict(metrics or {})
+        self._tracer = tracer
+        self._server = None
+        self._started_at = None
+        self._clients = 0
+        self._counters = {"clients_total": 0, "requests": {request_type: 0 for request_type in REQUEST_TYPES},
+                          "errors": 0, "commands_failed": 0, "command_seconds_total": 0.0,
+                          "command_seconds_max": 0.0}
+
+    @staticmethod
+    def from_config(config: Configuration, pipeline: VoicePipeline, plugin_manager: PluginManager,
+                    metrics: dict = None, tracer: Tracer = None):
+        return ControlServer(pipeline=pipeline, plugin_manager=plugin_manager, config=config,
+                             host=config.get("control_server.host"), port=config.get("control_server.port"),
+                             max_line_bytes=config.get("control_server.max_line_bytes"), metrics=metrics,
+                             tracer=tracer)
+
+    @property
+    def port(self) -> int:
+        """
+        :return: Int the port the server is listening on
+        """
+        return self._server.sockets[0].getsockname()[1] if self._server is not None else self._port
+
+    def add_metrics(self, name: str, metrics: Callable[[], dict]) -> None:
+        self._metrics[name] = metrics
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_client, self._host, self._port,
+                                                  limit=self._max_line_bytes)
+        self._started_at = time.monotonic()
+        logger.info(f"Control server listening on {self._host}:{self.port}")
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def handle(self, request: dict) -> dict:
+        """
+        Answers a single request.
+        :param request: Dictionary the decoded request
+        :return: Dictionary the response
+        """
+        request_type = request.get("type")
+        if request_type not in REQUEST_TYPES:
+            raise Exception(f"Unknown request type: {request_type}. Expected one of: {', '.join(REQUEST_TYPES)}")
+        self._counters["requests"][request_type] += 1
+
+        if request_type == "command":
+            return await self.__command(request)
+        if request_type == "status":
+            return self.status()
+        if request_type == "metrics":
+            if request.get("format") == "prometheus":
+                if self._tracer is None:
+                    raise Exception("Tracing is not available.")
+                return {"text": self._tracer.prometheus()}
+            return self.metrics()
+        return {"changed": await asyncio.get_running_loop().run_in_executor(None, self._config.reload)}
+
+    def status(self) -> dict:
+        return {"uptime_seconds": time.monotonic() - self._started_at if self._started_at is not None else 0.0,
+                "listening": self._pipeline.wait_until_started(0), "clients": self._clients,
+                "plugins": self._plugin_manager.states}
+
+    def metrics(self) -> dict:
+        metrics = {"control_server": dict(self._counters, requests=dict(self._counters["requests"]),
+                                          clients=self._clients)}
+        for name, provider in self._metrics.items():
+            try:
+                metrics[name] = provider()
+            except Exception as e:
+                logger.error(f"Failed to collect the metrics: {name}. Error = {str(e)}")
+        return metrics
+
+    async def __command(self, request: dict) -> dict:
+        text = request.get("text")
+        if not isinstance(text, str) or len(text.strip()) == 0:
+            raise Exception("Command requests must include the command as a non empty \"text\" string.")
+
+        start = time.perf_counter()
+        try:
+            return await self._pipeline.process_text(text.strip())
+        except Exception:
+            self._counters["commands_failed"] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self._counters["command_seconds_total"] += elapsed
+            self._counters["command_seconds_max"] = max(self._counters["command_seconds_max"], elapsed)
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._clients += 1
+        self._counters["clients_total"] += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readuntil(b"\n")
+                except asyncio.IncompleteReadError as e:
+                    line = e.partial  # The client closed the connection, possibly after a request without a newline
+                except asyncio.LimitOverrunError:
+                    await ControlServer.__skip_line(reader)
+                    await self.__respond(writer, {"ok": False, "error": f"Requests must be shorter than "
+                                                                        f"{self._max_line_bytes} bytes."})
+                    continue
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                await self.__respond(writer, await self.__answer(line))
+        except ConnectionError:
+            pass
+        finally:
+            self._clients -= 1
+            writer.close()
+
+    @staticmethod
+    async def __skip_line(reader: asyncio.StreamReader) -> None:
+        """
+        Discards the rest of a request which is too long, up to and including its newline, so the tail of the request
+        isn't read as a request of its own.
+        """
+        while True:
+            try:
+                await reader.readuntil(b"\n")
+                return
+            except asyncio.LimitOverrunError as e:
+                await reader.readexactly(e.consumed)
+            except asyncio.IncompleteReadError:
+                return
+
+    async def __answer(self, line: bytes) -> dict:
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise Exception("Requests must be JSON objects.")
+            request_id = request.get("id")
+            response = await self.handle(request)
+            return dict(response, id=request_id, ok=True)
+        except Exception as e:
+            self._counters["errors"] += 1
+            logger.error(f"Failed to answer the control request: {line[:200]!r}. Error = {str(e)}")
+            return {"id": request_id, "ok": False, "error": str(e)}
+
+    @staticmethod
+    async def __respond(writer: asyncio.StreamWriter, response: dict) -> None:
+        writer.write(json.dumps(response).encode("utf-8") + b"\n")
+        await writer.drain()
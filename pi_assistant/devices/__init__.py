@@ -0,0 +1,4 @@
+from pi_assistant.devices.fan_out import DeviceFanOut, DeviceResult, SimulatedFanOut
+from pi_assistant.devices.device_index import DeviceIndex
+from pi_assistant.devices.device_registry import DeviceRegistry
+from pi_assistant.devices.tuya_discovery import TuyaDiscovery
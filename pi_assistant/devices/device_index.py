@@ -0,0 +1,132 @@
+import re
+import fnmatch
+from collections import defaultdict
+from pi_assistant.log import logger
+from pi_assistant.profile.Device import Device
+
+
+class DeviceIndex:
+    """
+    Indexes the devices every plugin exposes by plugin, by their normalized name and by their id so many devices can be
+    resolved at once without scanning every plugin's device list for each one. Devices are selected by name, id, glob
+    pattern (i.e. "kitchen *") or by the plugin which owns them.
+    """
+
+    def __init__(self, devices: dict = None):
+        """
+        :param devices: Dictionary of plugin name -> list of Device
+        """
+        self._by_plugin = {}
+        self._by_name = defaultdict(list)
+        self._by_id = {}
+        for plugin, plugin_devices in (devices or {}).items():
+            self.replace(plugin, plugin_devices)
+
+    @staticmethod
+    def normalize(name: str) -> str:
+        """
+        Normalizes a device name so "Kitchen  Lamp" and "kitchen lamp" are the same device.
+        :param name: String the device name
+        :return: String the normalized name
+        """
+        return re.sub(r"\s+", " ", name.strip().lower())
+
+    @staticmethod
+    def key(device: Device) -> str:
+        """
+        :param device: Device the device
+        :return: String which identifies the device within its plugin, the device's id or else its normalized name
+        """
+        return str(device.id).lower() if device.id is not None else DeviceIndex.normalize(device.name)
+
+    def replace(self, plugin: str, devices: list) -> None:
+        """
+        Replaces every device of a plugin in the index.
+        :param plugin: String the name of the plugin
+        :param devices: List of Device
+        :return: None
+        """
+        for device in self._by_plugin.pop(plugin, {}).values():
+            self.__unindex(device)
+        self._by_plugin[plugin] = {}
+        for device in devices:
+            self.add(plugin, device)
+
+    def add(self, plugin: str, device: Device) -> None:
+        previous = self._by_plugin.setdefault(plugin, {}).get(DeviceIndex.key(device))
+        if previous is not None:
+            self.__unindex(previous)
+        self._by_plugin[plugin][DeviceIndex.key(device)] = device
+        self._by_name[DeviceIndex.normalize(device.name)].append(device)
+        if device.id is not None:
+            self._by_id[str(device.id).lower()] = device
+
+    def remove(self, plugin: str, key: str) -> None:
+        device = self._by_plugin.get(plugin, {}).pop(key, None)
+        if device is not None:
+            self.__unindex(device)
+
+    def __unindex(self, device: Device) -> None:
+        name = DeviceIndex.normalize(device.name)
+        self._by_name[name] = [d for d in self._by_name[name] if d is not device]
+        if len(self._by_name[name]) == 0:
+            del self._by_name[name]
+        if device.id is not None and self._by_id.get(str(device.id).lower()) is device:
+            del self._by_id[str(device.id).lower()]
+
+    def __len__(self) -> int:
+        return sum(len(devices) for devices in self._by_plugin.values())
+
+    def plugins(self) -> list:
+        return list(self._by_plugin)
+
+    def get(self, plugin: str, key: str):
+        return self._by_plugin.get(plugin, {}).get(key)
+
+    def find(self, name_or_id: str) -> list:
+        """
+        :param name_or_id: String a device's name or id
+        :return: List of the matching devices
+        """
+        key = DeviceIndex.normalize(name_or_id)
+        if key in self._by_name:
+            return list(self._by_name[key])
+        return [self._by_id[key]] if key in self._by_id else []
+
+    def match(self, pattern: str) -> list:
+        """
+        :param pattern: String a glob pattern matched against the normalized device names
+        :return: List of the devices whose name matches the pattern
+        """
+        names = fnmatch.filter(self._by_name.keys(), DeviceIndex.normalize(pattern))
+        return [device for name in sorted(names) for device in self._by_name[name]]
+
+    def for_plugin(self, plugin: str) -> list:
+        if plugin not in self._by_plugin:
+            raise Exception(f"No devices could be found for the plugin: {plugin}.")
+        return list(self._by_plugin[plugin].values())
+
+    def select(self, selectors: list = (), plugin: str = None) -> list:
+        """
+        Resolves names, ids and glob patterns (and optionally every device of a plugin) to a list of devices without
+        duplicates.
+        :param selectors: List of device names, ids or glob patterns
+        :param plugin: String the name of a plugin whose devices are all selected
+        :return: List of Device
+        """
+        selected = {}
+        unmatched = []
+        for selector in selectors:
+            devices = self.match(selector) if any(c in selector for c in "*?[") else self.find(selector)
+            if len(devices) == 0:
+                unmatched.append(selector)
+            for device in devices:
+                selected[id(device)] = device
+        if plugin is not None:
+            for device in self.for_plugin(plugin):
+                selected[id(device)] = device
+
+        if len(unmatched) > 0:
+            raise Exception(f"No devices could be found matching: {', '.join(unmatched)}.")
+        logger.debug(f"Selected {len(selected)} devices from {len(self)} known devices.")
+        return list(selected.values())
@@ -0,0 +1,134 @@
+import os
+import json
+import sqlite3
+import threading
+from pi_assistant.log import logger
+from pi_assistant.profile.Device import Device
+from pi_assistant.devices.device_index import DeviceIndex
+
+REGISTRY_PATH = os.path.join(".", "resources", "cache", "devices.db")
+# Devices were previously written in full to this file every time the assistant started
+LEGACY_DEVICES_PATH = os.path.join(".", "resources", "devices.json")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS devices (
+    plugin TEXT NOT NULL,
+    key TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (plugin, key)
+);
+"""
+
+
+class DeviceRegistry:
+    """
+    Holds every device the plugins expose in memory, indexed by plugin, id and name. When a plugin reports its devices
+    only the devices which were added, changed or removed since the last report are written and each report is written
+    in a single transaction so a crash never leaves a partially written registry. The running assistant and the CLI
+    open the same registry instead of each re-deriving the devices from disk.
+    """
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path: str = REGISTRY_PATH, legacy_path: str = LEGACY_DEVICES_PATH):
+        """
+        :param path: String path to the SQLite database the devices are persisted in
+        :param legacy_path: String path to a devices.json file imported when the registry is empty
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+        self._index = DeviceIndex()
+        self._writes = 0
+        self.load()
+        if len(self._index) == 0 and legacy_path is not None and os.path.exists(legacy_path):
+            self.__import(legacy_path)
+
+    @staticmethod
+    def shared():
+        """
+        Returns the registry shared by everything running in this process.
+        :return: DeviceRegistry
+        """
+        if DeviceRegistry._shared is None:
+            with DeviceRegistry._shared_lock:
+                if DeviceRegistry._shared is None:
+                    DeviceRegistry._shared = DeviceRegistry()
+        return DeviceRegistry._shared
+
+    @property
+    def index(self) -> DeviceIndex:
+        return self._index
+
+    @property
+    def writes(self) -> int:
+        """
+        :return: Int the number of device rows written or deleted since the registry was opened
+        """
+        return self._writes
+
+    @property
+    def devices(self) -> dict:
+        """
+        :return: Dictionary of plugin name -> list of Device
+        """
+        with self._lock:
+            return {plugin: self._index.for_plugin(plugin) for plugin in self._index.plugins()}
+
+    def load(self) -> None:
+        """
+        Reloads every device from disk, i.e. to see the devices another process reported.
+        :return: None
+        """
+        with self._lock:
+            devices = {}
+            for plugin, data in self._connection.execute("SELECT plugin, data FROM devices"):
+                devices.setdefault(plugin, []).append(Device.from_dict(json.loads(data)))
+            self._index = DeviceIndex(devices)
+
+    def update(self, plugin: str, devices: list) -> int:
+        """
+        Replaces the devices of a plugin, persisting only the difference from the devices previously reported.
+        :param plugin: String the name of the plugin
+        :param devices: List of Device
+        :return: Int the number of devices which were added, changed or removed
+        """
+        with self._lock:
+            current = {DeviceIndex.key(device): device for device in self._index.for_plugin(plugin)} \
+                if plugin in self._index.plugins() else {}
+            reported = {DeviceIndex.key(device): device for device in devices}
+            changed = [device for key, device in reported.items() if current.get(key) != device]
+            removed = [key for key in current if key not in reported]
+            if len(changed) == 0 and len(removed) == 0:
+                return 0
+
+            with self._connection:
+                self._connection.executemany("INSERT OR REPLACE INTO devices (plugin, key, data) VALUES (?, ?, ?)",
+                                             [(plugin, DeviceIndex.key(device), json.dumps(device.to_dict()))
+                                              for device in changed])
+                self._connection.executemany("DELETE FROM devices WHERE plugin = ? AND key = ?",
+                                             [(plugin, key) for key in removed])
+            for device in changed:
+                self._index.add(plugin, device)
+            for key in removed:
+                self._index.remove(plugin, key)
+            self._writes += len(changed) + len(removed)
+            logger.info(f"Saved {len(changed)} changed and {len(removed)} removed devices for the plugin: {plugin}.")
+            return len(changed) + len(removed)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def __import(self, path: str) -> None:
+        try:
+            with open(path, 'r') as devices_file:
+                devices = json.loads(devices_file.read())
+            for plugin, plugin_devices in devices.items():
+                self.update(plugin, [Device.from_dict(device) for device in plugin_devices])
+        except Exception as e:
+            logger.error(f"Failed to import the devices from: {path}. Error = {str(e)}")
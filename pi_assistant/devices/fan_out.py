@@ -0,0 +1,133 @@
+import math
+import time
+import threading
+from typing import Callable
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from pi_assistant.log import logger
+from pi_assistant.config import Configuration
+from pi_assistant.plugins.plugin_executor import CancellationToken, current_token
+
+
+class DeviceResult:
+    """
+    The outcome of running a command against a single device.
+    """
+
+    def __init__(self, name: str, ok: bool, elapsed: float, value=None, error: str = None):
+        self.name = name
+        self.ok = ok
+        self.elapsed = elapsed  # Seconds from the start of the fan out until the device responded or gave up
+        self.value = value
+        self.error = error
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "ok": self.ok, "elapsed": self.elapsed, "error": self.error}
+
+    def __repr__(self):
+        return f"DeviceResult({self.to_dict()})"
+
+
+class DeviceFanOut:
+    """
+    Runs a command against many devices at once i.e turning every bulb in a room on. Commands run concurrently on a
+    bounded pool of workers and each device has its own deadline so a single unreachable device can't hold up the
+    rest. A device is only ever used by one command at a time so persistent device connections can be reused safely.
+    Devices which haven't been commanded yet are skipped once the calling plugin invocation is cancelled.
+    """
+
+    def __init__(self, max_concurrency: int = 8, timeout: float = 2.0):
+        """
+        :param max_concurrency: Int the maximum number of devices commanded at the same time
+        :param timeout: Float seconds each device has to respond before it is reported as timed out
+        """
+        self._max_concurrency = max_concurrency
+        self._timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="device")
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    @staticmethod
+    def from_config(config: Configuration):
+        return DeviceFanOut(max_concurrency=config.get("devices.fan_out.max_concurrency"),
+                            timeout=config.get("devices.fan_out.timeout_seconds"))
+
+    @property
+    def timeout(self) -> float:
+        return self._timeout
+
+    def run(self, devices: dict, command: Callable) -> list:
+        """
+        Runs a command against every device and waits for each of them to respond or reach its deadline.
+        :param devices: Dictionary of device name -> device object
+        :param command: Function (device) -> value. Raise to report the device as failed
+        :return: List of DeviceResult in the same order as the devices
+        """
+        if len(devices) == 0:
+            return []
+
+        start = time.monotonic()
+        token = current_token()
+        futures = [(name, self._executor.submit(self.__run_command, name, device, command, start, token))
+                   for name, device in devices.items()]
+
+        # Devices queued behind a full pool get the time they spent waiting for a worker on top of their own deadline
+        deadline = start + self._timeout * math.ceil(len(futures) / self._max_concurrency)
+        results = []
+        for name, future in futures:
+            try:
+                results.append(future.result(timeout=max(0.0, deadline - time.monotonic())))
+            except FutureTimeoutError:
+                results.append(DeviceResult(name, False, time.monotonic() - start,
+                                            error=f"Timed out after {self._timeout} seconds"))
+
+        failed = [result for result in results if not result.ok]
+        elapsed = [result.elapsed for result in results]
+        logger.info(f"Commanded {len(results) - len(failed)}/{len(results)} devices in {max(elapsed):.3f}s "
+                    f"(spread {max(elapsed) - min(elapsed):.3f}s)")
+        for result in failed:
+            logger.warning(f"Device: {result.name} failed to respond. Error = {result.error}")
+        return results
+
+    def __run_command(self, name: str, device, command: Callable, start: float,
+                      token: CancellationToken) -> DeviceResult:
+        if token.cancelled:
+            return DeviceResult(name, False, time.monotonic() - start, error="Cancelled")
+        lock = self.__lock_for(name)
+        if not lock.acquire(timeout=self._timeout):
+            return DeviceResult(name, False, time.monotonic() - start,
+                                error="The device is still busy with a previous command")
+        try:
+            value = command(device)
+            return DeviceResult(name, True, time.monotonic() - start, value=value)
+        except Exception as e:
+            return DeviceResult(name, False, time.monotonic() - start, error=str(e))
+        finally:
+            lock.release()
+
+    def __lock_for(self, name: str) -> threading.Lock:
+        with self._locks_lock:
+            if name not in self._locks:
+                self._locks[name] = threading.Lock()
+            return self._locks[name]
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class SimulatedFanOut(DeviceFanOut):
+    """
+    Stands in for the fan out while commands are replayed. Commands never reach a device, each device responds
+    successfully after a fixed latency instead so the concurrency and deadlines of the fan out are still exercised.
+    """
+
+    def __init__(self, latency: float = 0.0, max_concurrency: int = 8, timeout: float = 2.0):
+        """
+        :param latency: Float seconds each simulated device takes to respond
+        :param max_concurrency: Int the maximum number of devices commanded at the same time
+        :param timeout: Float seconds each device has to respond before it is reported as timed out
+        """
+        super().__init__(max_concurrency=max_concurrency, timeout=timeout)
+        self._latency = latency
+
+    def run(self, devices: dict, command: Callable) -> list:
+        return super().run(devices, lambda device: time.sleep(self._latency))
@@ -0,0 +1,223 @@
+import os
+import json
+import tempfile
+import threading
+import tinytuya
+from typing import Callable
+from pi_assistant.log import logger
+from pi_assistant.devices.fan_out import DeviceFanOut
+
+TUYA_PORT = 6668
+
+
+class TuyaDiscovery:
+    """
+    Keeps the addresses of the Tuya devices on the local network up to date without a full network scan on startup.
+
+    Devices are loaded instantly from a cache of a previous scan and revalidated in the background: every device is
+    probed at its cached address and only the devices which no longer answer (i.e their DHCP lease changed after a
+    router reboot) are located again. A device which fails a command can be located again on its own. The cache is
+    rewritten atomically and listeners are notified whenever an address changes.
+    """
+
+    def __init__(self, cache_path: str, probe: Callable = None, locate: Callable = None, scan: Callable = None,
+                 probe_timeout: float = 1.0, max_concurrency: int = 8):
+        """
+        :param cache_path: String path to the JSON cache of devices in the tinytuya.deviceScan() format
+        :param probe: Function (device) -> bool which is true if the device answers at its address
+        :param locate: Function (list of device ids) -> dict of device id -> ip address for the devices it found
+        :param scan: Function () -> dict of ip -> device in the tinytuya.deviceScan() format
+        :param probe_timeout: Float seconds a device has to answer a probe
+        :param max_concurrency: Int the number of devices probed at the same time
+        """
+        self._cache_path = cache_path
+        self._probe = probe or self.probe_device
+        self._locate = locate or TuyaDiscovery.locate_devices
+        self._scan = scan or tinytuya.deviceScan
+        self._probe_timeout = probe_timeout
+        self._fan_out = DeviceFanOut(max_concurrency=max_concurrency, timeout=probe_timeout)
+        self._devices = {}  # Device id -> device data in the tinytuya.deviceScan() format
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._locating = set()
+
+    def load(self) -> bool:
+        """
+        Loads the cached devices.
+        :return: True if a cache was loaded and false otherwise
+        """
+        if not os.path.exists(self._cache_path):
+            return False
+        try:
+            with open(self._cache_path, 'r') as file:
+                devices = json.loads(file.read())
+        except Exception as e:
+            logger.error(f"Failed to read the Tuya device cache: {self._cache_path}. Error = {str(e)}")
+            return False
+
+        with self._lock:
+            self._devices = TuyaDiscovery.__by_id(devices)
+        logger.info(f"Loaded {len(devices)} cached Tuya devices.")
+        return True
+
+    @property
+    def devices(self) -> list:
+        """
+        :return: List of dicts with the name, key, ip, port and id of each device
+        """
+        with self._lock:
+            devices = list(self._devices.values())
+        return [{'name': device['name'], 'key': device['key'], 'ip': device['ip'], 'id': device['gwId'],
+                 'port': device.get('port', TUYA_PORT)} for device in devices]
+
+    def on_change(self, listener: Callable) -> None:
+        """
+        Registers a function which is called with the list of devices whenever a device is added or its address changes.
+        :param listener: Function (list of devices) -> None
+        :return: None
+        """
+        self._listeners.append(listener)
+
+    def refresh_in_background(self) -> threading.Thread:
+        """
+        Revalidates the cached devices or, when there is no cache, scans the network for devices on a background thread.
+        :return: The background thread
+        """
+        target = self.revalidate if len(self._devices) > 0 else self.scan
+        thread = threading.Thread(target=target, name="tuya-discovery", daemon=True)
+        thread.start()
+        return thread
+
+    def scan(self) -> None:
+        """
+        Scans the whole network for devices. This takes a long time and should only be needed the first time.
+        :return: None
+        """
+        logger.info("Scanning for Tuya devices on the local network...")
+        try:
+            devices = TuyaDiscovery.__by_id(self._scan())
+        except Exception as e:
+            logger.error(f"Exception thrown while scanning for Tuya devices. Error = {str(e)}")
+            return
+        with self._lock:
+            self._devices = devices
+        self.__save()
+        self.__notify()
+
+    def revalidate(self) -> list:
+        """
+        Probes every device at its cached address and locates the devices which don't answer.
+        :return: List of ids of the devices whose address changed
+        """
+        with self._lock:
+            devices = dict(self._devices)
+        results = self._fan_out.run(devices, self._probe)
+        unresponsive = [result.name for result in results if not (result.ok and result.value)]
+        logger.info(f"{len(devices) - len(unresponsive)}/{len(devices)} Tuya devices answered at their cached address.")
+        return self.__relocate(unresponsive)
+
+    def rediscover(self, device_id: str) -> threading.Thread:
+        """
+        Locates a single device again on a background thread i.e after it failed to respond to a command. Requests for
+        a device which is already being located are ignored.
+        :param device_id: String the id of the device
+        :return: The background thread or None if the device is already being located
+        """
+        with self._lock:
+            if device_id in self._locating or device_id not in self._devices:
+                return None
+            self._locating.add(device_id)
+
+        def relocate():
+            try:
+                self.__relocate([device_id])
+            finally:
+                with self._lock:
+                    self._locating.discard(device_id)
+
+        thread = threading.Thread(target=relocate, name=f"tuya-rediscover-{device_id}", daemon=True)
+        thread.start()
+        return thread
+
+    def __relocate(self, device_ids: list) -> list:
+        if len(device_ids) == 0:
+            return []
+        try:
+            located = self._locate(device_ids)
+        except Exception as e:
+            logger.error(f"Exception thrown while locating the Tuya devices: {device_ids}. Error = {str(e)}")
+            return []
+
+        changed = []
+        with self._lock:
+            for device_id, ip in located.items():
+                device = self._devices.get(device_id)
+                if device is not None and ip and device['ip'] != ip:
+                    logger.info(f"The Tuya device: {device['name']} moved from {device['ip']} to {ip}")
+                    self._devices[device_id] = dict(device, ip=ip)
+                    changed.append(device_id)
+        missing = [device_id for device_id in device_ids if not located.get(device_id)]
+        if len(missing) > 0:
+            logger.warning(f"Could not locate the Tuya devices: {missing} on the local network.")
+        if len(changed) > 0:
+            self.__save()
+            self.__notify()
+        return changed
+
+    def probe_device(self, device: dict) -> bool:
+        """
+        Checks that a device answers a status query at its address with its key.
+        :param device: Dictionary device data in the tinytuya.deviceScan() format
+        :return: True if the device answered and false otherwise
+        """
+        d = tinytuya.Device(device['gwId'], device['ip'], device['key'], version=float(device.get('version', 3.3)),
+                            port=device.get('port', TUYA_PORT), connection_timeout=self._probe_timeout,
+                            connection_retry_limit=1, connection_retry_delay=0)
+        try:
+            status = d.status()
+        finally:
+            d.close()
+        return isinstance(status, dict) and "Error" not in status
+
+    @staticmethod
+    def locate_devices(device_ids: list) -> dict:
+        """
+        Listens for the broadcasts of specific devices to find their current addresses.
+        :param device_ids: List of device ids
+        :return: Dictionary of device id -> ip address for each device which was found
+        """
+        located = {}
+        for device_id in device_ids:
+            ip = tinytuya.find_device(dev_id=device_id)['ip']
+            if ip is not None:
+                located[device_id] = ip
+        return located
+
+    def __save(self) -> None:
+        with self._lock:
+            # Devices with a non standard port (i.e local stand ins) can share an address
+            devices = {device['ip'] if 'port' not in device else f"{device['ip']}:{device['port']}": device
+                       for device in self._devices.values()}
+        directory = os.path.dirname(self._cache_path) or "."
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as file:
+                file.write(json.dumps(devices))
+            os.replace(tmp_path, self._cache_path)
+        except Exception as e:
+            logger.error(f"Failed to save the Tuya device cache to: {self._cache_path}. Error = {str(e)}")
+
+    def __notify(self) -> None:
+        devices = self.devices
+        for listener in list(self._listeners):
+            try:
+                listener(devices)
+            except Exception as e:
+                logger.error(f"Exception thrown by a Tuya device listener. Error = {str(e)}")
+
+    @staticmethod
+    def __by_id(devices: dict) -> dict:
+        """
+        Device data is nested in a json structure keyed by the ip address: { <ip>: { ... }, <ip2>: { ... } }
+        """
+        return {device['gwId']: dict(device, ip=device.get('ip', ip)) for ip, device in devices.items()}
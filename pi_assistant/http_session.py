@@ -0,0 +1,72 @@
+import time
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from pi_assistant.log import logger
+
+# Status codes which indicate a transient failure that is worth retrying
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+_shared_session = None
+_shared_session_lock = threading.Lock()
+
+
+def build_session(pool_size: int = 4) -> requests.Session:
+    """
+    Creates a requests session which keeps up to pool_size connections per host alive so repeated calls to the same
+    service reuse an established (TLS) connection instead of performing a new handshake each time. Retries are handled
+    by request_with_retries() rather than by the adapter so they can be jittered.
+    :param pool_size: Int the number of connections to keep alive per host
+    :return: requests.Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def shared_session() -> requests.Session:
+    """
+    Returns the session shared by plugins which call out to web services so they reuse one pool of keep-alive
+    connections rather than each opening their own.
+    :return: requests.Session
+    """
+    global _shared_session
+    if _shared_session is None:
+        with _shared_session_lock:
+            if _shared_session is None:
+                _shared_session = build_session(pool_size=8)
+    return _shared_session
+
+
+def request_with_retries(session: requests.Session, method: str, url: str, timeout: tuple, retries: int = 2,
+                         backoff: float = 0.1, max_backoff: float = 2.0, **kwargs) -> requests.Response:
+    """
+    Performs an HTTP request retrying connection errors, timeouts and transient (5xx, 429) responses up to retries
+    times. The delay before each retry grows exponentially and is randomized ("full jitter") so many clients which
+    failed at the same time don't retry in lock step.
+    :param session: requests.Session to send the request with
+    :param method: String the HTTP method
+    :param url: String the URL to request
+    :param timeout: Tuple of (connect timeout, read timeout) in seconds
+    :param retries: Int the number of times to retry after the first attempt
+    :param backoff: Float the base delay in seconds
+    :param max_backoff: Float the maximum delay between two attempts
+    :return: requests.Response the last response received
+    """
+    attempt = 0
+    while True:
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+            if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                return response
+            logger.warning(f"Received status code: {response.status_code} from: {url}. Retrying.")
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt >= retries:
+                raise e
+            logger.warning(f"Request to: {url} failed. Retrying. Error = {str(e)}")
+
+        time.sleep(random.uniform(0, min(max_backoff, backoff * (2 ** attempt))))
+        attempt += 1
@@ -1,40 +1,89 @@
 import os
-import socket
-from wit import Wit
+import asyncio
 import speech_recognition as sr
 from pi_assistant.log import logger
+from pi_assistant.audio import SpeechGate
+from pi_assistant.nlu import NluCache, WitClient
 from pi_assistant.config import Configuration
-from pi_assistant.util import assistant_reply
+from pi_assistant.tracing import Tracer
+from pi_assistant.stt import FallbackSttBackend
+from pi_assistant.pipeline import VoicePipeline
+from pi_assistant.control_server import ControlServer
+from pi_assistant.util import prewarm_replies, set_reply_sink, speak
 from pi_assistant.profile.Profile import Profile
 from pi_assistant.plugins.plugin_manager import PluginManager
 
-config = Configuration()
+config = Configuration.shared()
+tracer = Tracer.shared()
 recognizer = sr.Recognizer()
-source = sr.Microphone()
 plugin_manager = PluginManager(config=config)
+nlu_cache = NluCache(path=config.get("nlu.cache.path"), ttl=config.get("nlu.cache.ttl_seconds"),
+                     max_entries=config.get("nlu.cache.max_entries"),
+                     fingerprint=NluCache.fingerprint_of(config.get("wit.intents")),
+                     filler_words=config.get("nlu.cache.filler_words"))
+wit_client = WitClient.from_config(config, os.getenv("WIT_ACCESS_TOKEN"))
 
 
 def start_assistant(profile: Profile) -> None:
     """
-    Launches a server which initializes each plugin and registers a microphone in the background waiting for keywords
-    so the assistant can reply!
+    Launches a server which initializes each plugin and starts the voice pipeline which listens to the microphone
+    waiting for keywords so the assistant can reply!
     :return: None
     """
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.bind(("127.0.0.1", 65432))
-        s.listen()
-        logger.info(f"Initializing plugins.")
-        plugin_manager.init_plugins(profile)
-        recognizer.listen_in_background(source, callback)
-        logger.info("Listening for input keywords...")
-        assistant_reply("I am ready to help!")
-        conn, addr = s.accept()
-        with conn:
-            while True:
-                data = conn.recv(1024)
-                if not data:
-                    break
-                conn.sendall(data)
+    logger.info(f"Initializing plugins.")
+    wit_client.connect()
+    plugin_manager.init_plugins(profile, wait_for_all=False)
+    prewarm_replies(config.get("tts.cache.prewarm"))
+    speech_gate = SpeechGate.from_config(config) if config.get("audio.speech_gate.enabled") is True else None
+    pipeline = VoicePipeline(config=config, recognizer=recognizer, source=sr.Microphone(),
+                             plugin_manager=plugin_manager, understand=understand, reply=speak,
+                             keywords=get_keywords(config),
+                             speech_gate=speech_gate, stt=FallbackSttBackend.from_config(config, recognizer),
+                             understand_partial=understand_partial)
+    config.on_change(lambda c: on_config_change(c, pipeline))
+    config.watch(config.get("config.watch_interval_seconds"))
+    tracer.start_exporting()
+    asyncio.run(serve(pipeline))
+
+
+def on_config_change(c: Configuration, pipeline: VoicePipeline) -> None:
+    """
+    Applies configuration which was changed on disk to the running assistant.
+    :param c: Application Configuration object
+    :param pipeline: VoicePipeline the running voice pipeline
+    :return: None
+    """
+    pipeline.set_keywords(get_keywords(c))
+    plugin_manager.rebuild_dispatch_table()
+    nlu_cache.set_fingerprint(NluCache.fingerprint_of(c.get("wit.intents")))
+    tracer.set_enabled(c.get("tracing.enabled") is True)
+    logger.info(f"Applied configuration changes. Listening for keywords: {get_keywords(c)}")
+
+
+async def serve(pipeline: VoicePipeline) -> None:
+    """
+    Runs the voice pipeline alongside the local control server until the pipeline is stopped.
+    :param pipeline: VoicePipeline the voice pipeline to run
+    :return: None
+    """
+    pipeline_task = asyncio.create_task(pipeline.run())
+    await asyncio.get_running_loop().run_in_executor(None, pipeline.wait_until_started)
+    server = None
+    if config.get("control_server.enabled") is True:
+        server = ControlServer.from_config(config, pipeline, plugin_manager, tracer=tracer,
+                                           metrics={"nlu_cache": nlu_cache.stats, "tracing": tracer.stats,
+                                                    "speculation": pipeline.speculation_stats})
+        await server.start()
+    logger.info("Listening for input keywords...")
+    # Plugin replies are queued onto the reply stage so dispatch doesn't wait for them to finish playing
+    set_reply_sink(pipeline.submit_reply)
+    pipeline.submit_reply("I am ready to help!")
+    try:
+        await pipeline_task
+    finally:
+        set_reply_sink(None)
+        if server is not None:
+            await server.close()
 
 
 def get_keywords(c: Configuration) -> list:
@@ -51,56 +100,32 @@ def get_keywords(c: Configuration) -> list:
     return result
 
 
-# Called from the background thread
-def callback(recognizer: sr.Recognizer, audio: sr.AudioData) -> None:
+def understand(text: str, cache_response: bool = True) -> dict:
     """
-    A callback function registered with the SpeechRecognition Recognizer (for Sphinx). This callback executes each time
-    vocal audio is detected.
-    :param recognizer:
-    :param audio:
-    :return:
+    Sends a transcribed command to Wit.ai for intent and entity analysis. Responses for commands which have been seen
+    before are served from the NLU cache.
+    :param text: String the transcribed command
+    :param cache_response: True if the Wit.ai response should be added to the NLU cache
+    :return: Dictionary the Wit.ai response containing the intents and entities in the command
     """
-    try:
-        kw = config.get("voice_assistant.keywords")
-        keywords = []
-        for k in kw:
-            keywords.append((k['text'], k['sensitivity']))
-        speech_as_text = recognizer.recognize_sphinx(audio, keyword_entries=keywords)
+    use_cache = config.get("nlu.cache.enabled") is True
+    if use_cache:
+        response = nlu_cache.get(text)
+        if response is not None:
+            logger.info(f"Using cached Wit.ai response for: \"{text}\"")
+            return response
 
-        # Look for your "Ok Google" keyword in speech_as_text
-        if "google" in speech_as_text or "hey google":
-            logger.info(f"Found keyword in audio: \"{speech_as_text}\". Listening for primary directive.")
-            if config.get("voice_assistant.reply_on_keyword_detection") is True:
-                assistant_reply("im listening")
-            recognize_main()
+    response = wit_client.message(text)
+    if use_cache and cache_response:
+        nlu_cache.put(text, response)
+    return response
 
-    except sr.UnknownValueError as e:
-        pass
-        # logger.debug(f"The word or phrase was not a recognized keyword. Recognized keywords are: {keywords}")
 
-
-def recognize_main() -> None:
+def understand_partial(text: str) -> dict:
     """
-    Function which is called once keywords specified in the application.yml are detected. This function uses google's
-    speech recognition software to quickly process the users command and sends the command to Wit.ai for intent and
-    entity analysis.
-
-    Finally, this method invokes the plugin handler's handle_intent method to choose the correct plugin to handle the
-    user's request.
-    :return: None
+    Understands a partial transcript of a command which is still being spoken. Cached responses are used but the
+    response is not cached since the user may never finish saying the text.
+    :param text: String the partial transcript
+    :return: Dictionary the Wit.ai response containing the intents and entities in the text
     """
-    logger.info("Listening for primary command...")
-    audio = recognizer.listen(source)
-    try:
-        output = recognizer.recognize_google(audio_data=audio)
-        logger.info(f"Sending command to Wit.ai: \"{output}\"")
-        client = Wit(os.getenv("WIT_ACCESS_TOKEN"))
-        res = client.message(output)
-
-        if len(res['intents']) == 0:
-            assistant_reply("Sorry I am not sure what you meant by that. Can you rephrase it?")
-            return
-
-        plugin_manager.handle_intent(res)
-    except sr.UnknownValueError as e:
-        logger.error(f"There was an error while attempting to transcribe the audio. Message = {str(e)}")
+    return understand(text, cache_response=False)
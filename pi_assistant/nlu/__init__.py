@@ -0,0 +1,2 @@
+from pi_assistant.nlu.nlu_cache import NluCache
+from pi_assistant.nlu.wit_client import WitClient
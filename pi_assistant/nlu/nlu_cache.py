@@ -0,0 +1,169 @@
+import os
+import re
+import json
+import time
+import copy
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from pi_assistant.log import logger
+
+PUNCTUATION = re.compile(r"[^\w\s']|(?<!\w)'|'(?!\w)")
+
+
+class NluCache:
+    """
+    A persistent cache of NLU (Wit.ai) responses keyed by the normalized text of the utterance. Household commands
+    repeat constantly so a cache hit skips the round trip to Wit.ai entirely. Entries expire after a TTL, the least
+    recently used entries are evicted once the cache is full and the cache is written to disk so it survives restarts.
+
+    The cache is tied to a fingerprint of the Wit.ai app (the configured intents). When the intents change the cache on
+    disk is discarded since the stored responses may no longer match what Wit.ai would return.
+    """
+
+    def __init__(self, path: str, ttl: float, max_entries: int, fingerprint: str = "", filler_words: list = None):
+        """
+        :param path: String path to the JSON file the cache is persisted to
+        :param ttl: Float number of seconds an entry is valid for
+        :param max_entries: Int the maximum number of cached utterances
+        :param fingerprint: String identifying the Wit.ai app the responses came from
+        :param filler_words: List of words which don't change the meaning of a command and are ignored i.e "please"
+        """
+        self._path = path
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._fingerprint = fingerprint
+        self._filler_words = frozenset(word.lower() for word in (filler_words or []))
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # normalized text -> (stored at epoch seconds, response)
+        self._hits = 0
+        self._misses = 0
+        self.__load()
+
+    @staticmethod
+    def fingerprint_of(intents: list) -> str:
+        """
+        Computes a fingerprint for a Wit.ai app from its intents.
+        :param intents: List of intent names
+        :return: String hex digest
+        """
+        return hashlib.sha256("\n".join(sorted(intents)).encode("utf-8")).hexdigest()
+
+    def normalize(self, text: str) -> str:
+        """
+        Normalizes an utterance so trivially different transcripts of the same command share a cache entry. The text is
+        lowercased, punctuation is removed and filler words are dropped.
+        :param text: String the transcribed utterance
+        :return: String the normalized utterance
+        """
+        words = PUNCTUATION.sub(" ", text.lower()).split()
+        return " ".join(word for word in words if word not in self._filler_words)
+
+    def get(self, text: str) -> dict:
+        """
+        Returns a copy of the cached response for the utterance or None if it isn't cached or has expired.
+        :param text: String the transcribed utterance
+        :return: Dictionary in the same shape as the Wit.ai response or None
+        """
+        key = self.normalize(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[0] > self._ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return copy.deepcopy(entry[1])
+
+    def put(self, text: str, response: dict) -> None:
+        """
+        Caches the NLU response for an utterance. Responses without any intents are not cached so utterances the
+        Wit.ai app doesn't understand yet are re-evaluated once it has been trained on them.
+        :param text: String the transcribed utterance
+        :param response: Dictionary the Wit.ai response
+        :return: None
+        """
+        if len(response.get('intents', [])) == 0:
+            return
+
+        key = self.normalize(text)
+        with self._lock:
+            self._entries[key] = (time.time(), copy.deepcopy(response))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        self.save()
+
+    def set_fingerprint(self, fingerprint: str) -> None:
+        """
+        Updates the fingerprint of the Wit.ai app invalidating the cache when it differs from the current one.
+        :param fingerprint: String identifying the Wit.ai app
+        :return: None
+        """
+        if fingerprint != self._fingerprint:
+            self._fingerprint = fingerprint
+            self.invalidate()
+
+    def invalidate(self) -> None:
+        """
+        Removes every cached response. This should be used after the intents or utterances in the Wit.ai app change.
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+        self.save()
+        logger.info("Invalidated the NLU cache.")
+
+    def save(self) -> None:
+        """
+        Atomically writes the cache to disk.
+        :return: None
+        """
+        with self._lock:
+            data = {
+                "fingerprint": self._fingerprint,
+                "entries": [[key, stored_at, response] for key, (stored_at, response) in self._entries.items()]
+            }
+        directory = os.path.dirname(self._path) or "."
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as file:
+                file.write(json.dumps(data))
+            os.replace(tmp_path, self._path)
+        except Exception as e:
+            logger.error(f"Failed to save the NLU cache to disk. Path = {self._path}. Error = {str(e)}")
+
+    def __load(self) -> None:
+        if not os.path.exists(self._path):
+            return
+        try:
+            with open(self._path, "r") as file:
+                data = json.loads(file.read())
+        except Exception as e:
+            logger.error(f"Failed to load the NLU cache from disk. Path = {self._path}. Error = {str(e)}")
+            return
+
+        if data.get("fingerprint") != self._fingerprint:
+            logger.info("The Wit.ai intents have changed since the NLU cache was written. Discarding cached responses.")
+            return
+
+        now = time.time()
+        for key, stored_at, response in data.get("entries", []):
+            if now - stored_at <= self._ttl:
+                self._entries[key] = (stored_at, response)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+        logger.info(f"Loaded {len(self._entries)} cached NLU responses from {self._path}")
+
+    def stats(self) -> dict:
+        lookups = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+        }
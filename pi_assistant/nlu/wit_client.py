@@ -0,0 +1,72 @@
+import requests
+from pi_assistant.log import logger
+from pi_assistant.config import Configuration
+from pi_assistant.http_session import build_session, request_with_retries
+
+
+class WitClient:
+    """
+    A long lived Wit.ai client. A single instance is shared for the lifetime of the assistant so every command reuses
+    the pooled keep-alive connection to Wit.ai instead of performing a new TLS handshake. Requests have connect and
+    read timeouts and transient failures are retried a bounded number of times with jittered backoff.
+    """
+
+    def __init__(self, access_token: str, base_url: str = "https://api.wit.ai", api_version: str = "20220301",
+                 connect_timeout: float = 2.0, read_timeout: float = 5.0, retries: int = 2, backoff: float = 0.1,
+                 pool_size: int = 2):
+        self._access_token = access_token
+        self._base_url = base_url.rstrip("/")
+        self._api_version = api_version
+        self._timeout = (connect_timeout, read_timeout)
+        self._retries = retries
+        self._backoff = backoff
+        self._session = build_session(pool_size)
+        self._session.headers.update({
+            "Authorization": f"Bearer {access_token}",
+            "Accept": "application/json",
+        })
+
+    @staticmethod
+    def from_config(config: Configuration, access_token: str):
+        """
+        Creates a client using the nlu.wit section of the application configuration.
+        :param config: Application configuration
+        :param access_token: String the Wit.ai app's access token
+        :return: WitClient
+        """
+        return WitClient(access_token=access_token,
+                         base_url=config.get("nlu.wit.base_url"),
+                         api_version=config.get("nlu.wit.api_version"),
+                         connect_timeout=config.get("nlu.wit.connect_timeout"),
+                         read_timeout=config.get("nlu.wit.read_timeout"),
+                         retries=config.get("nlu.wit.retries"),
+                         backoff=config.get("nlu.wit.backoff"),
+                         pool_size=config.get("nlu.wit.pool_size"))
+
+    def connect(self) -> None:
+        """
+        Opens a connection to Wit.ai ahead of the first command so the handshake isn't paid for while the user waits.
+        Failures are logged and otherwise ignored, the connection will be retried on the first command.
+        :return: None
+        """
+        try:
+            self._session.head(self._base_url, timeout=self._timeout)
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Unable to pre-connect to Wit.ai at: {self._base_url}. Error = {str(e)}")
+
+    def message(self, text: str) -> dict:
+        """
+        Sends an utterance to Wit.ai for intent and entity analysis.
+        :param text: String the utterance
+        :return: Dictionary the Wit.ai response containing the intents and entities in the utterance
+        """
+        response = request_with_retries(self._session, "GET", f"{self._base_url}/message", timeout=self._timeout,
+                                        retries=self._retries, backoff=self._backoff,
+                                        params={"v": self._api_version, "q": text})
+        if response.status_code != 200:
+            raise Exception(f"Expected 200 HTTP status code from Wit.ai but received status code of: "
+                            f"{response.status_code}. Response = {response.content}")
+        return response.json()
+
+    def close(self) -> None:
+        self._session.close()
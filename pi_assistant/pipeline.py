@@ -0,0 +1,383 @@
+import re
+import time
+import asyncio
+import threading
+import contextvars
+import speech_recognition as sr
+from typing import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pi_assistant.log import logger
+from pi_assistant.audio import SpeechGate, AudioCapture, Phrase
+from pi_assistant.config import Configuration
+from pi_assistant.tracing import Tracer
+from pi_assistant.stt import SttBackend, SttStream, GoogleSttBackend
+from pi_assistant.speculation import Speculator
+from pi_assistant.plugins.plugin_manager import PluginManager
+
+UNKNOWN_INTENT_REPLY = "Sorry I am not sure what you meant by that. Can you rephrase it?"
+
+
+class VoicePipeline:
+    """
+    The voice assistant expressed as a chain of asyncio stages connected by bounded queues:
+
+        capture -> hotword -> STT -> NLU -> dispatch -> reply
+
+    Each stage handles one item at a time, but all stages run concurrently so a slow Wit.ai call or a long reply never
+    stops the microphone from being read or the next phrase from being checked for the keyword. Blocking libraries
+    (Sphinx, Google STT, Wit.ai, plugins and TTS) are run on a thread pool and the microphone is read continuously by
+    an AudioCapture thread which hands phrases cut from its ring buffer to the pipeline.
+
+    When the speech to text backend streams, the command following the keyword is transcribed while it is still being
+    spoken so only the tail of the speech is left to decode once the user stops talking. With speculation enabled a
+    stable partial transcript is also sent to NLU, and the plugins it resolves to are warmed up, before the final
+    transcript arrives.
+    """
+
+    def __init__(self, config: Configuration, recognizer: sr.Recognizer, source: sr.AudioSource,
+                 plugin_manager: PluginManager, understand: Callable[[str], dict], reply: Callable[[str], None],
+                 keywords: list, speech_gate: SpeechGate = None, tracer: Tracer = None, stt: SttBackend = None,
+                 understand_partial: Callable[[str], dict] = None):
+        """
+        :param config: Application configuration
+        :param recognizer: Recognizer used to listen to the source and transcribe audio
+        :param source: The microphone to capture audio from. When None no capture thread is started and phrases have
+        to be submitted with submit_phrase()
+        :param plugin_manager: Initialized plugin manager which dispatches NLU responses to plugins
+        :param understand: Function transcript -> Wit.ai style response dict containing intents and entities
+        :param reply: Function which speaks text to the user
+        :param keywords: List of (keyword, sensitivity) tuples to listen for
+        :param speech_gate: Optional SpeechGate which filters out phrases unlikely to contain speech before Sphinx runs
+        :param tracer: Tracer which times each stage, defaults to the shared tracer
+        :param stt: SttBackend which transcribes commands, defaults to Google through the recognizer
+        :param understand_partial: Function which understands partial transcripts when speculating without caching
+        their responses, defaults to understand
+        """
+        self._config = config
+        self._recognizer = recognizer
+        self._source = source
+        self._plugin_manager = plugin_manager
+        self._understand = understand
+        self._reply = reply
+        self._speech_gate = speech_gate
+        self._tracer = tracer or Tracer.shared()
+        self._stt = stt or GoogleSttBackend(recognizer)
+        self._streaming = config.get("stt.streaming") is True
+        self._sample_format = (source.SAMPLE_RATE, source.SAMPLE_WIDTH) if source is not None else (16000, 2)
+        self._stream = None  # (phrase start, trace id, SttStream) of the command being spoken
+        self._stream_lock = threading.Lock()
+        self._capture = None
+        # Audio is fed to streams in order on a single thread so neither capture nor the event loop wait on decoding
+        self._stream_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stt-stream")
+        self._speculator = Speculator.from_config(config, understand_partial or understand, plugin_manager.warm_up,
+                                                  self._offload) \
+            if config.get("speculation.enabled") is True else None
+        self._queue_size = config.get("pipeline.queue_size")
+        self._command_timeout = config.get("voice_assistant.command_timeout")
+        self._max_keyword_seconds = config.get("audio.capture.max_keyword_seconds")
+        self._keywords = None
+        self._keyword_pattern = None
+        self.set_keywords(keywords)
+        self._executor = ThreadPoolExecutor(max_workers=config.get("pipeline.workers"), thread_name_prefix="pipeline")
+        self._loop = None
+        self._audio_queue = None
+        self._stt_queue = None
+        self._nlu_queue = None
+        self._dispatch_queue = None
+        self._reply_queue = None
+        self._armed_until = 0.0
+        self._started = threading.Event()
+        self._tasks = []
+
+    async def run(self) -> None:
+        """
+        Starts every stage and runs until stop() is called.
+        :return: None
+        """
+        self._loop = asyncio.get_running_loop()
+        self._audio_queue = asyncio.Queue(self._queue_size)
+        self._stt_queue = asyncio.Queue(self._queue_size)
+        self._nlu_queue = asyncio.Queue(self._queue_size)
+        self._dispatch_queue = asyncio.Queue(self._queue_size)
+        self._reply_queue = asyncio.Queue(self._queue_size)
+
+        if self._source is not None:
+            self._capture = AudioCapture.from_config(self._config, self._source, self.submit_phrase,
+                                                     on_phrase_audio=self._on_phrase_audio if self._streaming else None)
+            self._capture.start()
+
+        self._tasks = [
+            asyncio.create_task(self._hotword_stage(), name="hotword"),
+            asyncio.create_task(self._stt_stage(), name="stt"),
+            asyncio.create_task(self._nlu_stage(), name="nlu"),
+            asyncio.create_task(self._dispatch_stage(), name="dispatch"),
+            asyncio.create_task(self._reply_stage(), name="reply"),
+        ]
+        self._started.set()
+        try:
+            await asyncio.gather(*self._tasks)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            if self._capture is not None:
+                self._capture.stop()
+            with self._stream_lock:
+                stream, self._stream = self._stream, None
+            if stream is not None:
+                self._close_stream(stream)
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._stream_executor.shutdown(wait=False, cancel_futures=True)
+
+    def stop(self) -> None:
+        """
+        Stops every stage. Safe to call from any thread.
+        :return: None
+        """
+        if self._loop is not None:
+            for task in self._tasks:
+                self._loop.call_soon_threadsafe(task.cancel)
+
+    def set_keywords(self, keywords: list) -> None:
+        """
+        Replaces the keywords the pipeline listens for. Safe to call while the pipeline is running.
+        :param keywords: List of (keyword, sensitivity) tuples
+        :return: None
+        """
+        pattern = re.compile(r"^\W*(?:" + "|".join(
+            re.escape(keyword) for keyword, _ in sorted(keywords, key=lambda k: -len(k[0]))) + r")\b\W*", re.I)
+        self._keywords, self._keyword_pattern = list(keywords), pattern
+
+    def wait_until_started(self, timeout: float = None) -> bool:
+        return self._started.wait(timeout)
+
+    def submit_phrase(self, phrase: Phrase) -> None:
+        """
+        Hands a captured phrase to the hotword stage. Safe to call from any thread. When the pipeline is backed up the
+        oldest phrase is dropped rather than blocking the caller so capture is never starved.
+        :param phrase: Phrase the captured phrase
+        :return: None
+        """
+        self._loop.call_soon_threadsafe(VoicePipeline._put_latest, self._audio_queue, phrase)
+
+    def submit_reply(self, text: str) -> None:
+        """
+        Queues text to be spoken by the reply stage. Safe to call from any thread.
+        :param text: String the text to speak
+        :return: None
+        """
+        self._loop.call_soon_threadsafe(VoicePipeline._put_latest, self._reply_queue, text)
+
+    async def process_text(self, transcript: str) -> dict:
+        """
+        Runs a text command through NLU and dispatch, skipping the hotword and STT stages. Commands submitted this way
+        run alongside the voice stages rather than queueing behind them.
+        :param transcript: String the command i.e "turn on the lights"
+        :return: Dictionary with the matched intent (None if no intent matched) and the names of the plugins which ran
+        """
+        with self._tracer.trace() as trace_id:
+            logger.info(f"[{trace_id}] Handling the text command: \"{transcript}\"")
+            with self._tracer.span("nlu"):
+                response = await self._offload(self._understand, transcript)
+            if len(response['intents']) == 0:
+                self.submit_reply(UNKNOWN_INTENT_REPLY)
+                return {"intent": None, "plugins": [], "trace_id": trace_id}
+            intent = max(response['intents'], key=lambda i: i['confidence'])
+            with self._tracer.span("dispatch"):
+                plugins = await self._offload(self._plugin_manager.handle_intent, response)
+            return {"intent": intent['name'], "plugins": [plugin.name() for plugin in plugins or []],
+                    "trace_id": trace_id}
+
+    @staticmethod
+    def _put_latest(queue: asyncio.Queue, item) -> None:
+        if queue.full():
+            logger.warning("Pipeline queue is full dropping the oldest item.")
+            queue.get_nowait()
+        queue.put_nowait(item)
+
+    async def _offload(self, fn: Callable, *args):
+        # The context is copied so the correlation id of the command follows it onto the worker thread
+        return await self._loop.run_in_executor(self._executor, contextvars.copy_context().run, fn, *args)
+
+    def _is_keyword(self, speech_as_text: str) -> bool:
+        return any(keyword in speech_as_text for keyword, _ in self._keywords)
+
+    async def _hotword_stage(self) -> None:
+        while True:
+            phrase = await self._audio_queue.get()
+
+            # The phrase following the keyword is the user's command
+            stream = self._take_stream(phrase)
+            if time.monotonic() < self._armed_until:
+                self._armed_until = 0.0
+                if stream is not None:
+                    await self._stt_queue.put((stream[1], phrase.audio, stream[2]))
+                else:
+                    await self._stt_queue.put((Tracer.new_trace(), phrase.audio, None))
+                continue
+            if stream is not None:
+                # The arm window ran out before the phrase ended so it isn't a command after all
+                self._close_stream(stream)
+
+            try:
+                with self._tracer.span("hotword"):
+                    speech_as_text = await self._offload(self._recognize_keyword, phrase.audio)
+            except sr.UnknownValueError:
+                continue
+            except Exception as e:
+                logger.error(f"Exception thrown while attempting to detect keywords. Error = {str(e)}")
+                continue
+
+            if self._is_keyword(speech_as_text):
+                if phrase.duration() > self._max_keyword_seconds:
+                    # The command was spoken in the same breath as the keyword so it is already in this phrase
+                    logger.info(f"Found keyword in audio: \"{speech_as_text}\" followed by a command.")
+                    await self._stt_queue.put((Tracer.new_trace(), phrase.audio, None))
+                    continue
+
+                logger.info(f"Found keyword in audio: \"{speech_as_text}\". Listening for primary directive.")
+                self._armed_until = time.monotonic() + self._command_timeout
+                if self._config.get("voice_assistant.reply_on_keyword_detection") is True:
+                    await self._reply_queue.put("im listening")
+
+    def _recognize_keyword(self, audio: sr.AudioData) -> str:
+        if self._speech_gate is not None and not self._speech_gate.is_speech(audio):
+            raise sr.UnknownValueError()
+        return self._recognizer.recognize_sphinx(audio, keyword_entries=self._keywords)
+
+    async def _stt_stage(self) -> None:
+        while True:
+            trace_id, audio, stream = await self._stt_queue.get()
+            try:
+                with self._tracer.trace(trace_id), self._tracer.span("stt"):
+                    if stream is not None:
+                        transcript = await self._loop.run_in_executor(
+                            self._stream_executor, contextvars.copy_context().run, self._finish_stream, stream)
+                    else:
+                        transcript = await self._offload(self._transcribe, audio)
+            except sr.UnknownValueError as e:
+                logger.error(f"There was an error while attempting to transcribe the audio. Message = {str(e)}")
+                continue
+            except Exception as e:
+                logger.error(f"Exception thrown while attempting to transcribe the audio. Error = {str(e)}")
+                continue
+            await self._nlu_queue.put((trace_id, transcript))
+
+    def _transcribe(self, audio: sr.AudioData) -> str:
+        # Commands cut from the same phrase as the keyword start with the keyword itself
+        return self._keyword_pattern.sub("", self._stt.transcribe(audio))
+
+    def _finish_stream(self, stream: SttStream) -> str:
+        try:
+            return self._keyword_pattern.sub("", stream.finish())
+        finally:
+            stream.close()
+
+    def _on_phrase_audio(self, start: int, end: int, audio: bytes) -> None:
+        """
+        Streams the audio of the command following the keyword into the speech to text backend while it is being
+        spoken. Called on the capture thread with the audio of every phrase in progress.
+        :param start: Int the absolute start position of the phrase the audio belongs to
+        :param end: Int the absolute position of the end of the audio
+        :param audio: Bytes of audio
+        :return: None
+        """
+        previous = None
+        with self._stream_lock:
+            stream = self._stream
+            if stream is None or stream[0] != start:
+                if time.monotonic() >= self._armed_until or not self._stt.streaming:
+                    return
+                if end - len(audio) > start:
+                    # The command started while the keyword was still being recognized, so the stream is seeded with
+                    # everything captured since the start of the phrase including its pre-roll
+                    audio = self.__captured_audio(start, end)
+                    if audio is None:
+                        return
+                trace_id = Tracer.new_trace()
+                previous, stream = stream, (start, trace_id, self._stt.open_stream(
+                    *self._sample_format, on_partial=lambda text: self._on_partial(trace_id, text)))
+                self._stream = stream
+        if previous is not None:
+            self._close_stream(previous)
+        self._stream_executor.submit(stream[2].feed, audio)
+
+    def __captured_audio(self, start: int, end: int) -> bytes:
+        if self._capture is None:
+            return None
+        try:
+            return self._capture.cut(start, end).frame_data
+        except Exception as e:
+            logger.warning(f"Unable to read the start of the command back from the capture buffer. Error = {str(e)}")
+            return None
+
+    def _close_stream(self, stream: tuple) -> None:
+        # Closed on the stream thread so it happens after the audio already queued for it has been fed
+        try:
+            self._stream_executor.submit(stream[2].close)
+        except RuntimeError:
+            stream[2].close()
+
+    def _on_partial(self, trace_id: str, text: str) -> None:
+        logger.debug(f"[{trace_id}] Partial transcript: \"{text}\"")
+        if self._speculator is not None:
+            self._loop.call_soon_threadsafe(self._speculator.on_partial, trace_id, self._keyword_pattern.sub("", text))
+
+    def speculation_stats(self) -> dict:
+        """
+        :return: Dictionary of speculation counters (hits, misses, wasted work), empty when speculation is disabled
+        """
+        return self._speculator.stats() if self._speculator is not None else {}
+
+    def _take_stream(self, phrase) -> tuple:
+        """
+        Takes the stream which was transcribing the phrase. A stream left over from an earlier phrase is closed, a
+        stream for a phrase which is still being spoken is left alone.
+        :param phrase: Phrase the completed phrase
+        :return: Tuple of (phrase start, trace id, SttStream) or None when the phrase wasn't streamed
+        """
+        with self._stream_lock:
+            stream = self._stream
+            if stream is None or phrase.start is None or stream[0] > phrase.start:
+                return None
+            self._stream = None
+        if stream[0] == phrase.start:
+            return stream
+        self._close_stream(stream)
+        return None
+
+    async def _nlu_stage(self) -> None:
+        while True:
+            trace_id, transcript = await self._nlu_queue.get()
+            response = await self._speculator.resolve(trace_id, transcript) if self._speculator is not None else None
+            try:
+                if response is None:
+                    logger.info(f"[{trace_id}] Sending command to Wit.ai: \"{transcript}\"")
+                    with self._tracer.trace(trace_id), self._tracer.span("nlu"):
+                        response = await self._offload(self._understand, transcript)
+            except Exception as e:
+                logger.error(f"Exception thrown while sending the command: \"{transcript}\" to Wit.ai. Error = {str(e)}")
+                continue
+
+            if len(response['intents']) == 0:
+                await self._reply_queue.put(UNKNOWN_INTENT_REPLY)
+                continue
+            # A cancel ("nevermind") stops the plugins still running right away instead of queueing behind them
+            self._plugin_manager.preempt(response)
+            await self._dispatch_queue.put((trace_id, response))
+
+    async def _dispatch_stage(self) -> None:
+        while True:
+            trace_id, response = await self._dispatch_queue.get()
+            try:
+                with self._tracer.trace(trace_id), self._tracer.span("dispatch"):
+                    await self._offload(self._plugin_manager.handle_intent, response)
+            except Exception as e:
+                logger.error(f"Exception thrown while dispatching the intent: {response['intents']}. Error = {str(e)}")
+
+    async def _reply_stage(self) -> None:
+        while True:
+            text = await self._reply_queue.get()
+            try:
+                await self._offload(self._reply, text)
+            except Exception as e:
+                logger.error(f"Exception thrown while replying with: \"{text}\". Error = {str(e)}")
@@ -1,3 +1,4 @@
+import threading
 import tinytuya
 from pi_assistant.log import logger
 from pi_assistant.plugins.plugin import Plugin
@@ -13,24 +14,64 @@ class FeitElectricSmartLightsPlugin(Plugin):
         return "smart_lights"
 
     def init(self, config: PluginConfiguration = None) -> None:
-        self._lights = []
+        self._lights = {}  # Bulb name -> tinytuya.BulbDevice
+        self._device_ids = {}  # Bulb name -> Tuya device id
+        self._lights_lock = threading.Lock()
         self._config = config
-        logger.info(f"Found {len(config.devices)} Feit bulbs on the network")
-        for device in config.devices:
-            light = tinytuya.BulbDevice(device['id'], device['ip'], device['key'])
-            light.set_version(3.3)
-            self._lights.append(light)
+        self._fan_out = self.environment.fan_out(self._app_config)
+        # Bulbs are reconnected whenever discovery finds one of them at a new address
+        config.discovery.on_change(self.__update_lights)
+        config.discovery.on_change(lambda devices: self.devices_changed())
+        self.__update_lights(config.devices)
+        logger.info(f"Found {len(self._lights)} Feit bulbs on the network")
+        self.environment.discover(config.discovery)
 
-    def on_intent_received(self, intent: dict, entities: dict) -> None:
+    def __update_lights(self, devices: list) -> None:
+        with self._lights_lock:
+            connected = {light.id: light for light in self._lights.values()}
+            lights, device_ids = {}, {}
+            for device in devices:
+                light = connected.get(device['id'])
+                if light is None or light.address != device['ip'] or light.port != device['port']:
+                    if light is not None:
+                        light.close()
+                    # Connections are kept open between commands and a bulb which doesn't respond is given up on
+                    # quickly rather than retried, the fan out reports it as failed without holding up the other bulbs.
+                    light = tinytuya.BulbDevice(device['id'], device['ip'], device['key'], version=3.3, persist=True,
+                                                port=device['port'], connection_timeout=self._fan_out.timeout,
+                                                connection_retry_limit=1, connection_retry_delay=0)
+                name = device['name'] if device['name'] not in lights else f"{device['name']} ({device['id']})"
+                lights[name] = light
+                device_ids[name] = device['id']
+            self._lights, self._device_ids = lights, device_ids
+
+    def on_intent_received(self, intent: dict, entities: dict) -> list:
         light_state_value = entities['light_state:light_state'][0]['value']
 
         # TODO We need a notion of grouping items together so we can put the light_location entity into play here
+        lights, device_ids = self._lights, self._device_ids
         if light_state_value.lower() == "on":
-            for light in self._lights:
-                light.turn_on()
+            results = self._fan_out.run(lights, lambda light: FeitElectricSmartLightsPlugin.__check(light.turn_on()))
         else:
-            for light in self._lights:
-                light.turn_off()
+            results = self._fan_out.run(lights, lambda light: FeitElectricSmartLightsPlugin.__check(light.turn_off()))
+
+        # A bulb which doesn't respond has most likely been given a new address by the router
+        for result in results:
+            if not result.ok and not self.cancellation.cancelled:
+                self.environment.rediscover(self._config.discovery, device_ids[result.name])
+        return results
+
+    def warm_up(self, intent: dict, entities: dict) -> None:
+        # Opens the connection to every bulb which isn't connected yet so the command itself only needs one round trip
+        disconnected = {name: light for name, light in self._lights.items() if light.socket is None}
+        self._fan_out.run(disconnected, lambda light: FeitElectricSmartLightsPlugin.__check(light.status()))
+
+    @staticmethod
+    def __check(response):
+        # tinytuya reports network and device errors in the response instead of raising them
+        if isinstance(response, dict) and "Error" in response:
+            raise ConnectionError(response["Error"])
+        return response
 
     def get_devices(self) -> list:
         devices = []
@@ -40,4 +81,4 @@ class FeitElectricSmartLightsPlugin(Plugin):
         return devices
 
     def on_plugin_end(self) -> None:
-        pass
\ No newline at end of file
+        pass
@@ -2,6 +2,8 @@ from abc import ABC, abstractmethod
 from pi_assistant.config import Configuration
 from pi_assistant.profile.Profile import Profile
 from pi_assistant.plugins.plugin_configuration import PluginConfiguration
+from pi_assistant.plugins.plugin_environment import PluginEnvironment
+from pi_assistant.plugins.plugin_executor import CancellationToken, current_token
 
 
 class Plugin(ABC):
@@ -9,9 +11,11 @@ class Plugin(ABC):
     Class which is inherited by every plugin and provides a unified way to implement IoT
     actions for a given intent.
     """
-    def __init__(self, app_config: Configuration, profile: Profile):
+    def __init__(self, app_config: Configuration, profile: Profile, environment: PluginEnvironment = None):
         self._app_config = app_config
         self._profile = profile
+        self._environment = environment or PluginEnvironment()
+        self._devices_listeners = []
 
     def name(self):
         """
@@ -31,6 +35,51 @@ class Plugin(ABC):
         """
         return []
 
+    def on_devices_changed(self, listener) -> None:
+        """
+        Registers a function which is called whenever the plugin reports that its devices changed after init.
+        :param listener: Function (plugin) -> None
+        :return: None
+        """
+        self._devices_listeners.append(listener)
+
+    def devices_changed(self) -> None:
+        """
+        Reports that the devices returned by get_devices changed i.e a device was found on the network or moved to a
+        new address after the plugin was initialized, so the plugin manager can update the device registry.
+        :return: None
+        """
+        for listener in list(self._devices_listeners):
+            listener(self)
+
+    def timeout(self) -> float:
+        """
+        Declares how many seconds on_intent_received has to finish before it is cancelled. The
+        plugins.<name>.timeout_seconds configuration takes precedence and when neither is set the
+        plugin_manager.timeout_seconds default is used.
+        :return: Float seconds or None to use the configured deadline
+        """
+        return None
+
+    @property
+    def environment(self) -> PluginEnvironment:
+        """
+        The devices, device discovery and web services the plugin uses. Plugins should get these from the environment
+        rather than create them so they can be simulated i.e when commands are replayed.
+        :return: PluginEnvironment
+        """
+        return self._environment
+
+    @property
+    def cancellation(self) -> CancellationToken:
+        """
+        The cancellation token of the invocation currently running on this thread. Long running plugins should check
+        it between steps, wait on it rather than sleep or register a callback with on_cancel to abort blocking I/O. The
+        token is cancelled when the invocation misses its deadline or the user cancels i.e by saying "nevermind".
+        :return: CancellationToken
+        """
+        return current_token()
+
     def enabled(self) -> bool:
         """
         Determines if the plugin is enabled and should be used to respond to Wit.ai (user) intents. If this value
@@ -59,6 +108,17 @@ class Plugin(ABC):
         """
         pass
 
+    def warm_up(self, intent: dict, entities: dict) -> None:
+        """
+        Executes when the intent is likely to be received shortly, while the user is still finishing the command, so
+        the plugin can prepare i.e open connections to the devices it is about to command. The command may still turn
+        out to be something else so this must not act on the intent or reply to the user.
+        :param intent: Dictionary the intent the command is expected to resolve to
+        :param entities: Dictionary the entities of the expected command
+        :return: None
+        """
+        pass
+
     @abstractmethod
     def on_intent_received(self, intent: dict, entities: dict) -> None:
         """
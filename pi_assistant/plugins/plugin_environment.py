@@ -0,0 +1,77 @@
+from pi_assistant.log import logger
+from pi_assistant.config import Configuration
+from pi_assistant.http_session import shared_session
+from pi_assistant.devices import DeviceFanOut, SimulatedFanOut, TuyaDiscovery
+
+
+class PluginEnvironment:
+    """
+    Everything a plugin does outside the assistant: commanding devices, finding them on the network and calling web
+    services. Plugins reach it through self.environment rather than creating these themselves so the plugin manager
+    can hand them a SimulatedEnvironment instead i.e to replay commands without anything in the home being switched.
+    """
+
+    def fan_out(self, config: Configuration) -> DeviceFanOut:
+        """
+        :param config: Application Configuration object
+        :return: DeviceFanOut which commands the plugin's devices
+        """
+        return DeviceFanOut.from_config(config)
+
+    def discover(self, discovery: TuyaDiscovery) -> None:
+        """
+        Revalidates the cached devices or, when there are none, scans the network for devices in the background.
+        :param discovery: TuyaDiscovery the plugin's devices
+        :return: None
+        """
+        discovery.refresh_in_background()
+
+    def rediscover(self, discovery: TuyaDiscovery, device_id: str) -> None:
+        """
+        Locates a device which failed to respond to a command again in the background.
+        :param discovery: TuyaDiscovery the plugin's devices
+        :param device_id: String the id of the device
+        :return: None
+        """
+        discovery.rediscover(device_id)
+
+    def weather_service(self, config: Configuration, api_key: str):
+        """
+        Creates the weather service and starts refreshing the weather report in the background.
+        :param config: Application Configuration object
+        :param api_key: String the OpenWeatherMap API key
+        :return: WeatherService
+        """
+        # Imported here so the weather plugin's dependencies are only loaded when it is enabled
+        from pi_assistant.plugins.weather.weather_service import WeatherService
+        service = WeatherService.from_config(config, shared_session(), api_key)
+        service.start()
+        return service
+
+
+class SimulatedEnvironment(PluginEnvironment):
+    """
+    Stands in for the network while commands are replayed. Devices respond successfully after a fixed latency without
+    being commanded, they are never searched for and the weather is served from a fixed report.
+    """
+
+    def __init__(self, device_latency: float = 0.0):
+        """
+        :param device_latency: Float seconds each simulated device takes to respond
+        """
+        self._device_latency = device_latency
+
+    def fan_out(self, config: Configuration) -> DeviceFanOut:
+        return SimulatedFanOut(latency=self._device_latency,
+                               max_concurrency=config.get("devices.fan_out.max_concurrency"),
+                               timeout=config.get("devices.fan_out.timeout_seconds"))
+
+    def discover(self, discovery: TuyaDiscovery) -> None:
+        logger.info(f"Using {len(discovery.devices)} cached devices without searching the network.")
+
+    def rediscover(self, discovery: TuyaDiscovery, device_id: str) -> None:
+        pass
+
+    def weather_service(self, config: Configuration, api_key: str):
+        from pi_assistant.plugins.weather.weather_service import SimulatedWeatherService
+        return SimulatedWeatherService()
@@ -0,0 +1,242 @@
+import time
+import queue
+import itertools
+import threading
+import contextvars
+from typing import Callable
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from pi_assistant.log import logger
+
+# Cancellation token of the plugin invocation running on the current thread
+_current_token = contextvars.ContextVar("cancellation_token", default=None)
+
+
+class PluginCancelled(Exception):
+    """
+    Raised inside a plugin by CancellationToken.raise_if_cancelled() once its invocation was cancelled.
+    """
+    pass
+
+
+class CancellationToken:
+    """
+    Cooperative cancellation for a single plugin invocation. Threads can't be interrupted so a plugin doing long running
+    work should check the token between steps (or wait on it instead of sleeping) and give up once it is cancelled.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Exception thrown by a cancellation callback. Error = {str(e)}")
+
+    def on_cancel(self, callback: Callable[[], None]) -> None:
+        """
+        Registers a function which is called once the token is cancelled i.e to close a socket a plugin is blocked on.
+        :param callback: Function () -> None
+        :return: None
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise PluginCancelled("The plugin invocation was cancelled.")
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Sleeps for up to timeout seconds, waking up early when the token is cancelled.
+        :param timeout: Float seconds to sleep
+        :return: True if the token was cancelled
+        """
+        return self._event.wait(timeout)
+
+
+def current_token() -> CancellationToken:
+    """
+    :return: The CancellationToken of the plugin invocation running on the current thread or a token which is never
+    cancelled when called outside of a plugin invocation
+    """
+    return _current_token.get() or CancellationToken()
+
+
+class _Invocation:
+    __slots__ = ("fn", "context", "future", "done", "abandoned")
+
+    def __init__(self, fn: Callable, context: contextvars.Context, future: Future):
+        self.fn = fn
+        self.context = context
+        self.future = future
+        self.done = False
+        self.abandoned = False  # True once the invocation missed its deadline while a worker was running it
+
+
+class PluginExecutor:
+    """
+    Runs plugin invocations on a dedicated pool of workers so the voice pipeline never runs plugin code itself. Every
+    invocation has a deadline, an invocation which misses it is cancelled and reported as failed while the caller moves
+    on, and exceptions thrown by a plugin are contained to its own invocation.
+
+    Threads can't be interrupted so a worker stuck in an invocation which missed its deadline (i.e. a plugin blocked on
+    a socket without a timeout) is written off and replaced by a new worker, the stuck worker exits once the invocation
+    finally returns. Each plugin can only have max_in_flight_per_plugin invocations running at once, further invocations
+    fail straight away, so a hung plugin can't tie up an unbounded number of threads.
+    """
+
+    def __init__(self, workers: int = 8, max_in_flight_per_plugin: int = 2):
+        """
+        :param workers: Int the number of invocations which can run at the same time
+        :param max_in_flight_per_plugin: Int the number of invocations of a single plugin which can run (or be stuck
+        past their deadline) at the same time
+        """
+        self._max_in_flight_per_plugin = max_in_flight_per_plugin
+        self._queue = queue.SimpleQueue()
+        self._in_flight = set()
+        self._running = {}  # Plugin name -> number of its invocations which haven't finished
+        self._lock = threading.RLock()  # Reentrant as cancelling a queued invocation runs its done callback
+        self._workers = 0
+        self._worker_ids = itertools.count()
+        self._closed = False
+        for _ in range(workers):
+            self.__start_worker()
+
+    def run(self, name: str, fn: Callable, timeout: float):
+        """
+        Runs fn on a worker and waits for up to timeout seconds for it to finish.
+        :param name: String the name of the plugin, used in log messages
+        :param fn: Function () -> value, current_token() returns the invocation's token while it runs
+        :param timeout: Float seconds the invocation has to finish
+        :return: Tuple of (ok, value or error message)
+        """
+        return self.run_all([(name, fn, timeout)])[0]
+
+    def run_all(self, invocations: list) -> list:
+        """
+        Runs every invocation at the same time, each on its own worker with its own deadline, and waits for all of them
+        to finish or reach their deadline.
+        :param invocations: List of (name, fn, timeout) tuples, see run()
+        :return: List of (ok, value or error message) tuples in the same order as the invocations
+        """
+        start = time.monotonic()
+        submitted = [(name, timeout, *self.__submit(name, fn)) for name, fn, timeout in invocations]
+        return [self.__result(name, timeout, token, invocation, max(0.0, start + timeout - time.monotonic()))
+                for name, timeout, token, invocation in submitted]
+
+    def __submit(self, name: str, fn: Callable) -> tuple:
+        token = CancellationToken()
+        context = contextvars.copy_context()
+        context.run(_current_token.set, token)
+        invocation = _Invocation(fn, context, Future())
+        with self._lock:
+            running = self._running.get(name, 0)
+            if running >= self._max_in_flight_per_plugin:
+                invocation.future.set_exception(Exception(f"{running} earlier invocations of the plugin are still "
+                                                          f"running"))
+                return token, invocation
+            self._running[name] = running + 1
+            self._in_flight.add(token)
+        invocation.future.add_done_callback(lambda f: self.__finished(name, token))
+        self._queue.put(invocation)
+        return token, invocation
+
+    def __result(self, name: str, timeout: float, token: CancellationToken, invocation: _Invocation,
+                 remaining: float) -> tuple:
+        try:
+            return True, invocation.future.result(timeout=remaining)
+        except FutureTimeoutError:
+            token.cancel()
+            self.__abandon(invocation)
+            logger.error(f"The plugin: {name} did not finish within {timeout} seconds and was cancelled.")
+            return False, f"Timed out after {timeout} seconds"
+        except PluginCancelled:
+            logger.info(f"The plugin: {name} was cancelled.")
+            return False, "Cancelled"
+        except Exception as e:
+            logger.error(f"Exception thrown while running the plugin: {name}. Error = {str(e)}")
+            return False, str(e)
+
+    def __abandon(self, invocation: _Invocation) -> None:
+        with self._lock:
+            # An invocation which is still queued is simply dropped, one which is running keeps its worker busy
+            if invocation.done or invocation.future.cancel():
+                return
+            invocation.abandoned = True
+            if not self._closed:
+                self.__start_worker()
+
+    def __start_worker(self) -> None:
+        with self._lock:
+            self._workers += 1
+        threading.Thread(target=self.__work, name=f"plugin-{next(self._worker_ids)}", daemon=True).start()
+
+    def __work(self) -> None:
+        while True:
+            invocation = self._queue.get()
+            if invocation is None:
+                return
+            if not invocation.future.set_running_or_notify_cancel():
+                continue
+            try:
+                invocation.future.set_result(invocation.context.run(invocation.fn))
+            except BaseException as e:
+                invocation.future.set_exception(e)
+            with self._lock:
+                invocation.done = True
+                if invocation.abandoned:
+                    # This worker was replaced when the invocation missed its deadline
+                    self._workers -= 1
+                    return
+
+    def cancel_all(self) -> int:
+        """
+        Cancels every invocation which is still running.
+        :return: Int the number of invocations which were cancelled
+        """
+        with self._lock:
+            tokens = list(self._in_flight)
+        for token in tokens:
+            token.cancel()
+        return len(tokens)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def __finished(self, name: str, token: CancellationToken) -> None:
+        with self._lock:
+            self._in_flight.discard(token)
+            self._running[name] -= 1
+            if self._running[name] == 0:
+                del self._running[name]
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            workers = self._workers
+        while True:
+            try:
+                invocation = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if invocation is not None:
+                invocation.future.cancel()
+        for _ in range(workers):
+            self._queue.put(None)
@@ -1,10 +1,29 @@
 import os
-import json
-import pi_assistant.plugins.plugin
+import threading
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor
 from pi_assistant.log import logger
 from pi_assistant.config import Configuration
-from pi_assistant.util import sanitize_plugin_class_name
+from pi_assistant.tracing import Tracer
+from pi_assistant.util import assistant_reply, collect_replies, merge_replies
 from pi_assistant.profile.Profile import Profile
+from pi_assistant.devices import DeviceRegistry
+from pi_assistant.plugins.plugin_manifest import PluginManifest, PluginSpec
+from pi_assistant.plugins.plugin_executor import PluginExecutor
+from pi_assistant.plugins.plugin_environment import PluginEnvironment
+
+PLUGINS_PATH = os.path.dirname(os.path.abspath(__file__))
+PLUGINS_PACKAGE = "pi_assistant.plugins"
+MANIFEST_PATH = os.path.join(".", "resources", "cache", "plugin_manifest.json")
+
+
+class PluginState:
+    """
+    The readiness of a plugin which has started initializing.
+    """
+    INITIALIZING = "initializing"
+    READY = "ready"
+    FAILED = "failed"
 
 
 class PluginManager:
@@ -12,113 +31,407 @@ class PluginManager:
     Acts as a way to load and provide references to each plugin
     """
 
-    def __init__(self, config: Configuration = Configuration()):
-        self._plugins = []
+    def __init__(self, config: Configuration = Configuration.shared(), plugins_path: str = PLUGINS_PATH,
+                 plugins_package: str = PLUGINS_PACKAGE, manifest_path: str = MANIFEST_PATH,
+                 registry: DeviceRegistry = None, tracer: Tracer = None, environment: PluginEnvironment = None):
+        self._plugins = []  # Specs for every available plugin from the plugin manifest
         self._configs = {}  # The configuration for each respective plugin
         self._initialized_plugins = []
-        self._global_devices = {}
+        self._lazy_plugins = []  # Specs of enabled plugins which are initialized when their intent is first received
+        self._registry = registry  # Opened on first use so plugin managers without devices never touch the disk
         self._config = config
+        self._tracer = tracer or Tracer.shared()
+        self._environment = environment or PluginEnvironment()
+        self._plugins_path = plugins_path
+        self._plugins_package = plugins_package
+        self._manifest_path = manifest_path
+        self._profile = None
+        self._lock = threading.RLock()
+        self._ready = threading.Condition(self._lock)
+        self._states = {}  # Plugin name -> PluginState of every plugin which has started initializing
+        self._deadlines = {}
+        self._known_intents = frozenset()
+        self._dispatch_table = MappingProxyType({})
+        self._executor = PluginExecutor(
+            workers=self.__option("plugin_manager.plugin_workers", 8),
+            max_in_flight_per_plugin=self.__option("plugin_manager.max_in_flight_per_plugin", 2))
+        self.rebuild_dispatch_table()
 
-    def init_plugins(self, profile: Profile):
+    def init_plugins(self, profile: Profile = None, wait_for_all: bool = True):
         """
-        Initializes each plugin class and calls the "init" method of each plugin
+        Initializes each enabled plugin and calls the "init" method of each plugin. Plugins are discovered through the
+        plugin manifest so disabled plugins (and their dependencies) are never imported and plugins configured as lazy
+        are only imported once their intent is first received.
+
+        Plugins are initialized concurrently on a pool of workers, core plugins first. Every plugin must be ready
+        within its startup deadline otherwise it is marked as failed, a failed plugin is logged and left out of the
+        dispatch table rather than aborting startup. Each plugin is added to the dispatch table as soon as it is ready.
+        :param profile: Profile the user's profile
+        :param wait_for_all: When false only wait for the core plugins, the remaining plugins finish initializing in
+        the background
         :return:
         """
-        self._plugins = PluginManager.load_plugins()
-        self._configs = PluginManager.load_config()  # Plugin level configuration i.e. weather_config.py
-        initialized_plugins = []
-        for plugin in self._plugins:
-            try:
-                # This self._config refers to application level config i.e. application.yml
-                p = plugin(self._config, profile)
-
-                # IMPORTANT: Plugin's name() method must return the same string case-sensitive as the module for which
-                # the plugin is enclosed. self._configs is keyed by the module's name NOT the plugin's name() method. If
-                # these mismatch there will be an initialized plugin without any injected configuration
-                if p.enabled():
-                    if p.name() in self._configs:
-                        p.init(config=self._configs[p.name()]())
-
-                        # Some plugins interact with physical devices and the plugin manager needs to know about what
-                        # devices the plugin interacts with. i.e Philips hue can interact with 1...N light bulbs while
-                        # Roomba may simply interact with 1 vacuum cleaner. Users can use the CLI to link devices to
-                        # specific rooms however, the plugin manager needs to maintain a global list of available
-                        # devices to link.
-                        if self._config.get(f"plugins.{p.name()}.physical_device") is True:
-                            logger.info(f"The plugin has defined physical devices it uses: {p.name()}")
-                            devices = p.get_devices()
-                            logger.info(f"Found {len(devices)} IoT devices that the plugin: {p.name()} "
-                                        f"is able to interact with.")
-                            self._global_devices[p.name()] = devices
-
-                    initialized_plugins.append(p)
-                else:
-                    logger.info(f"The plugin: {p.name()} is disabled skipping initialization.")
-            except Exception as e:
-                logger.error(f"Exception thrown while attempting to initialize the plugins. Error = {str(e)}")
-                raise e
-
-        self.__save_devices()
-        self._initialized_plugins = initialized_plugins
-
-    def get_bound_plugin_for(self, intent: str) -> list:
-        """
-        Returns a plugin object which is bound to the respective Wit intent passed in as a parameter
+        self._profile = profile
+        self._plugins = PluginManifest.load(self._plugins_path, self._plugins_package, self._manifest_path).specs
+        eager_plugins = []
+        lazy_plugins = []
+        for spec in self._plugins:
+            if not spec.enabled(self._config):
+                logger.info(f"The plugin: {spec.name} is disabled skipping initialization.")
+                continue
+
+            if spec.intent is not None and self.__option(f"plugins.{spec.name}.lazy", False) is True:
+                logger.info(f"The plugin: {spec.name} will be initialized when the intent: {spec.intent} "
+                            f"is first received.")
+                lazy_plugins.append(spec)
+                continue
+            eager_plugins.append(spec)
+
+        # Core plugins are submitted first so they are never queued behind slow plugins
+        eager_plugins.sort(key=lambda s: not self.__is_core(s))
+        with self._lock:
+            self._initialized_plugins = []
+            self._lazy_plugins = lazy_plugins
+            self._states = {spec.name: PluginState.INITIALIZING for spec in eager_plugins}
+            self.rebuild_dispatch_table()
+
+        if len(eager_plugins) > 0:
+            workers = min(self.__option("plugin_manager.workers", 8), len(eager_plugins))
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="plugin-init")
+            for spec in eager_plugins:
+                self.__start_deadline(spec)
+                executor.submit(self.__run_initialization, spec, profile)
+            executor.shutdown(wait=False)
+
+        waiting_on = [spec.name for spec in eager_plugins if wait_for_all or self.__is_core(spec)]
+        with self._ready:
+            self._ready.wait_for(lambda: all(self._states.get(name) != PluginState.INITIALIZING for name in waiting_on))
+        logger.info(f"Plugins ready: {[n for n, s in self.states.items() if s == PluginState.READY]} "
+                    f"failed: {[n for n, s in self.states.items() if s == PluginState.FAILED]} "
+                    f"initializing: {[n for n, s in self.states.items() if s == PluginState.INITIALIZING]}")
+
+    def wait_until_initialized(self, timeout: float = None) -> bool:
+        """
+        Blocks until every plugin has finished initializing (or failed to).
+        :param timeout: Float the maximum number of seconds to wait
+        :return: True if no plugin is still initializing and false if the timeout elapsed
+        """
+        with self._ready:
+            return self._ready.wait_for(lambda: PluginState.INITIALIZING not in self._states.values(), timeout)
+
+    def __run_initialization(self, spec: PluginSpec, profile: Profile):
+        """
+        Initializes a plugin, records its devices and adds it to the dispatch table. Runs on a worker thread.
+        :param spec: PluginSpec the plugin to initialize
+        :param profile: Profile the user's profile
+        :return: The initialized plugin or None if the plugin is disabled, failed or missed its deadline
+        """
+        try:
+            p = self.__initialize(spec, profile)
+            devices = self.__get_devices(p) if p is not None else None
+        except Exception:
+            self.__set_state(spec, PluginState.FAILED)
+            return None
+
+        with self._ready:
+            deadline = self._deadlines.pop(spec.name, None)
+            if deadline is not None:
+                deadline.cancel()
+            if self._states.get(spec.name) != PluginState.INITIALIZING:
+                logger.warning(f"The plugin: {spec.name} finished initializing after its startup deadline and will "
+                               f"not be used.")
+                return None
+
+            if p is None:
+                # The plugin reported itself as disabled
+                del self._states[spec.name]
+            else:
+                self._initialized_plugins = self._initialized_plugins + [p]
+                self._states[spec.name] = PluginState.READY
+                self.rebuild_dispatch_table()
+                if devices is not None:
+                    self.__save_devices(p.name(), devices)
+                logger.info(f"The plugin: {spec.name} is ready.")
+            self._ready.notify_all()
+        return p
+
+    def __start_deadline(self, spec: PluginSpec) -> None:
+        deadline = threading.Timer(self.__init_timeout(spec), self.__on_deadline, args=(spec,))
+        deadline.daemon = True
+        self._deadlines[spec.name] = deadline
+        deadline.start()
+
+    def __on_deadline(self, spec: PluginSpec) -> None:
+        with self._ready:
+            if self._states.get(spec.name) == PluginState.INITIALIZING:
+                logger.error(f"The plugin: {spec.name} did not finish initializing within "
+                             f"{self.__init_timeout(spec)} seconds.")
+                self.__set_state(spec, PluginState.FAILED)
+
+    def __set_state(self, spec: PluginSpec, state: str) -> None:
+        with self._ready:
+            self._states[spec.name] = state
+            self._ready.notify_all()
+
+    def __initialize(self, spec: PluginSpec, profile: Profile):
+        """
+        Imports, instantiates and initializes a single plugin.
+        :param spec: PluginSpec the plugin to initialize
+        :param profile: Profile the user's profile
+        :return: The initialized plugin or None if the plugin reports itself as disabled
+        """
+        try:
+            # This self._config refers to application level config i.e. application.yml
+            p = spec.load_class()(self._config, profile, self._environment)
+
+            # IMPORTANT: Plugin's name() method must return the same string case-sensitive as the module for which
+            # the plugin is enclosed. self._configs is keyed by the module's name NOT the plugin's name() method. If
+            # these mismatch there will be an initialized plugin without any injected configuration
+            if not p.enabled():
+                logger.info(f"The plugin: {p.name()} is disabled skipping initialization.")
+                return None
+
+            config_class = spec.load_config_class()  # Plugin level configuration i.e. weather_config.py
+            if config_class is not None:
+                self._configs[p.name()] = config_class
+            p.on_devices_changed(self.__on_devices_changed)
+            p.init(config=config_class() if config_class is not None else None)
+            return p
+        except Exception as e:
+            logger.error(f"Exception thrown while attempting to initialize the plugin: {spec.name}. Error = {str(e)}")
+            raise e
+
+    def __get_devices(self, p):
+        """
+        Some plugins interact with physical devices and the plugin manager needs to know about what devices the plugin
+        interacts with. i.e Philips hue can interact with 1...N light bulbs while Roomba may simply interact with 1
+        vacuum cleaner. Users can use the CLI to link devices to specific rooms however, the plugin manager needs to
+        maintain a global list of available devices to link.
+        :return: List of devices or None if the plugin does not use physical devices
+        """
+        if p.name() not in self._configs or self._config.get(f"plugins.{p.name()}.physical_device") is not True:
+            return None
+        logger.info(f"The plugin has defined physical devices it uses: {p.name()}")
+        devices = p.get_devices()
+        logger.info(f"Found {len(devices)} IoT devices that the plugin: {p.name()} is able to interact with.")
+        return devices
+
+    def __on_devices_changed(self, p) -> None:
+        """
+        Updates the device registry when a plugin's devices change after it was initialized i.e. when background
+        discovery finds a device which wasn't cached or a device moved to a new address.
+        :param p: Plugin the plugin whose devices changed
+        :return: None
+        """
+        try:
+            devices = self.__get_devices(p)
+        except Exception as e:
+            logger.error(f"Failed to get the devices of the plugin: {p.name()}. Error = {str(e)}")
+            return
+        if devices is not None:
+            self.__save_devices(p.name(), devices)
+
+    def __is_core(self, spec: PluginSpec) -> bool:
+        return self.__option(f"plugins.{spec.name}.core", False) is True
+
+    def __init_timeout(self, spec: PluginSpec) -> float:
+        return self.__option(f"plugins.{spec.name}.init_timeout_seconds",
+                             self.__option("plugin_manager.init_timeout_seconds", 30))
+
+    def __option(self, key: str, default):
+        try:
+            return self._config.get(key)
+        except KeyError:
+            return default
+
+    def rebuild_dispatch_table(self) -> None:
+        """
+        Builds an immutable index of intent -> tuple of bound plugins from the currently initialized plugins and swaps
+        it in with a single assignment. Readers always see either the old or the new table, never a partially built
+        one, so this is safe to call whenever the set of initialized plugins or the configured intents change.
+        :return: None
+        """
+        known_intents = frozenset(intent.lower() for intent in self._config.get("wit.intents"))
+        table = {}
+        for plugin in self._initialized_plugins:
+            intent = plugin.bind_to().lower()
+            table[intent] = table.get(intent, ()) + (plugin,)
+            logger.debug(f"Plugin: {plugin.__class__} is bound to: {intent}")
+
+        # Lazy plugins sit in the table as their spec until they are initialized by get_bound_plugin_for
+        for spec in self._lazy_plugins:
+            intent = spec.intent.lower()
+            table[intent] = table.get(intent, ()) + (spec,)
+
+        self._known_intents = known_intents
+        self._dispatch_table = MappingProxyType(table)
+
+    def get_bound_plugin_for(self, intent: str) -> tuple:
+        """
+        Returns the plugins which are bound to the respective Wit intent passed in as a parameter
         :param intent: String the wit intent to find a plugin for
-        :return: Plugin object
+        :return: Tuple of plugin objects bound to the intent (empty if no enabled plugin is bound to it)
         """
-        if intent.lower() not in self._config.get("wit.intents"):
-            raise KeyError(f'The intent specified: {intent} is not a known intent: {self._config.get("wit.intents")}')
+        # Read the table once so a concurrent rebuild can't hand back plugins from two different tables
+        dispatch_table, known_intents = self._dispatch_table, self._known_intents
+        if intent.lower() not in known_intents:
+            raise KeyError(f'The intent specified: {intent} is not a known intent: {sorted(known_intents)}')
 
         # We can return more than one plugin which can satisfy an intent. i.e Philips hue, Feit electric, and LifX
         # can all satisfy the smart_lights intent. Additional logic implemented by the plugin manager will use the
         # User's profile to determine which (or a combination) of plugins to satify the intent.
-        bound_plugins = []
-        logger.info(f"Looking for plugin bound to intent: {intent}")
-        for plugin in self._initialized_plugins:
-            logger.info(f"Plugin: {plugin.__class__} is bound to: {plugin.bind_to()}",)
-            if plugin.bind_to() == intent:
-                bound_plugins.append(plugin)
-        return bound_plugins
+        plugins = dispatch_table.get(intent.lower(), ())
+        if any(isinstance(plugin, PluginSpec) for plugin in plugins):
+            return self.__initialize_lazy_plugins(intent.lower())
+        return plugins
 
-    def handle_intent(self, wit_response: dict) -> pi_assistant.plugins.plugin.Plugin:
+    def __initialize_lazy_plugins(self, intent: str) -> tuple:
+        """
+        Initializes the lazy plugins bound to an intent the first time it is received and swaps them into the
+        dispatch table. Each plugin is initialized on its own thread under the same startup deadline as the other
+        plugins, the caller waits for the plugins to be ready or to miss their deadline without holding the lock so
+        commands for other intents are dispatched in the meantime. Concurrent callers wait on the same initialization.
+        :param intent: String the lower case intent
+        :return: Tuple of plugin objects bound to the intent which are ready
         """
-        Handles an intent by locating a plugin which matches the given intent and running the plugin.
+        with self._ready:
+            pending = [spec for spec in self._lazy_plugins if spec.intent.lower() == intent]
+            started = [spec for spec in pending if spec.name not in self._states]
+            for spec in started:
+                self._states[spec.name] = PluginState.INITIALIZING
+                self.__start_deadline(spec)
+        for spec in started:
+            threading.Thread(target=self.__run_lazy_initialization, args=(spec, self._profile),
+                             name=f"plugin-init-{spec.name}", daemon=True).start()
+
+        with self._ready:
+            # The deadline of every plugin marks it as failed once it passes, the timeout only guards against a
+            # deadline which never fires
+            self._ready.wait_for(lambda: all(self._states.get(spec.name) != PluginState.INITIALIZING
+                                             for spec in pending),
+                                 max([self.__init_timeout(spec) for spec in pending], default=0) + 1)
+            return tuple(p for p in self._dispatch_table.get(intent, ()) if not isinstance(p, PluginSpec))
+
+    def __run_lazy_initialization(self, spec: PluginSpec, profile: Profile) -> None:
+        try:
+            self.__run_initialization(spec, profile)
+        finally:
+            with self._ready:
+                self._lazy_plugins = [s for s in self._lazy_plugins if s is not spec]
+                self.rebuild_dispatch_table()
+                self._ready.notify_all()
+
+    def handle_intent(self, wit_response: dict) -> list:
+        """
+        Handles an intent by running every plugin bound to the highest confidence intent along with the plugins bound
+        to any other intent whose confidence is at least plugin_manager.secondary_intent_confidence i.e "turn on the
+        lights and what time is it". Every plugin runs at the same time on the plugin executor with its own deadline, a
+        plugin which fails or misses its deadline is logged and skipped without affecting the others. The replies of
+        the plugins are merged into a single spoken response.
         :param wit_response: Dictionary the response returned from the wit client.
-        :return: None
+        :return: List of plugins which handled the intent
         """
         if len(wit_response['intents']) == 0:
             raise Exception("Uncategorizable utterance did not match any intents.")
 
         logger.info(f"Wit.ai Response: {wit_response}")
-        sorted_intents = sorted(wit_response['intents'], key=lambda i: i['confidence'], reverse=True)
-        for intent in sorted_intents:
-            logger.info(f"Intent: {intent}")
-            plugin = self.get_bound_plugin_for(intent['name'])
-            try:
-                plugin.on_intent_received(intent, wit_response['entities'])
-                plugin.on_plugin_end()
-                return plugin
-            except Exception as e:
-                logger.error(f"Exception thrown while attempting to run the plugin: {plugin.__class__} with intent: {intent}. "
-                             f"Error Message = {str(e)}")
-                raise e
-                return None
+        self.preempt(wit_response)
+        invocations = []
+        for intent in self.__intents_to_handle(wit_response):
+            plugins = self.get_bound_plugin_for(intent['name'])
+            if len(plugins) == 0:
+                self.__warn_unhandled(intent)
+            invocations.extend((plugin, intent) for plugin in plugins)
+
+        results = self._executor.run_all([
+            (plugin.name(), lambda p=plugin, i=intent: self.__run_plugin(p, i, wit_response), self.__plugin_timeout(plugin))
+            for plugin, intent in invocations])
+
+        replies = [reply for ok, value in results if ok for reply in value]
+        if len(replies) > 0:
+            assistant_reply(merge_replies(replies))
+        return [plugin for (plugin, _), (ok, _) in zip(invocations, results) if ok]
+
+    def __intents_to_handle(self, wit_response: dict) -> list:
+        intents = sorted(wit_response['intents'], key=lambda i: i['confidence'], reverse=True)
+        cancel_intents = self.__option("plugin_manager.cancel_intents", ["wit$cancel"])
+        # Cancelling a command never runs anything else the user might have said along with it
+        if intents[0]['name'] in cancel_intents:
+            return intents[:1]
+        threshold = self.__option("plugin_manager.secondary_intent_confidence", 0.8)
+        handled, names = [intents[0]], {intents[0]['name']}
+        for intent in intents[1:]:
+            # An unknown secondary intent is ignored rather than failing the command the user actually asked for
+            if intent['confidence'] >= threshold and intent['name'] not in names | set(cancel_intents) and \
+                    intent['name'].lower() in self._known_intents:
+                handled.append(intent)
+                names.add(intent['name'])
+        return handled
+
+    def __warn_unhandled(self, intent: dict) -> None:
+        initializing = [spec.name for spec in self._plugins if spec.intent is not None and
+                        spec.intent.lower() == intent['name'].lower() and
+                        self._states.get(spec.name) == PluginState.INITIALIZING]
+        if len(initializing) > 0:
+            logger.warning(f"The plugins: {initializing} bound to the intent: {intent['name']} are still initializing")
+        else:
+            logger.warning(f"No enabled plugin is bound to the intent: {intent['name']}")
+
+    def warm_up(self, wit_response: dict) -> int:
+        """
+        Warms up the plugins which would handle a response before it is acted on. Used when speculating on a partial
+        transcript of a command the user is still speaking.
+        :param wit_response: Dictionary the response returned from the wit client.
+        :return: Int the number of plugins which were warmed up
+        """
+        if len(wit_response['intents']) == 0:
+            return 0
+        invocations = [(plugin, intent) for intent in self.__intents_to_handle(wit_response)
+                       if intent['name'].lower() in self._known_intents
+                       for plugin in self.get_bound_plugin_for(intent['name'])]
+        results = self._executor.run_all([
+            (plugin.name(), lambda p=plugin, i=intent: p.warm_up(i, wit_response['entities']),
+             self.__plugin_timeout(plugin)) for plugin, intent in invocations])
+        return sum(1 for ok, _ in results if ok)
+
+    def preempt(self, wit_response: dict) -> int:
+        """
+        Cancels every plugin invocation which is still running when the highest confidence intent is a cancel intent
+        (plugin_manager.cancel_intents) i.e the user said "nevermind".
+        :param wit_response: Dictionary the response returned from the wit client.
+        :return: Int the number of invocations which were cancelled
+        """
+        if len(wit_response['intents']) == 0:
+            return 0
+        intent = max(wit_response['intents'], key=lambda i: i['confidence'])
+        if intent['name'] not in self.__option("plugin_manager.cancel_intents", ["wit$cancel"]):
+            return 0
+        cancelled = self._executor.cancel_all()
+        if cancelled > 0:
+            logger.info(f"Cancelled {cancelled} running plugin invocations.")
+        return cancelled
+
+    def __run_plugin(self, plugin, intent: dict, wit_response: dict) -> list:
+        with collect_replies() as replies, self._tracer.span("plugin", plugin.name()):
+            plugin.on_intent_received(intent, wit_response['entities'])
+        plugin.on_plugin_end()
+        return replies
+
+    def __plugin_timeout(self, plugin) -> float:
+        declared = plugin.timeout()
+        default = declared if isinstance(declared, (int, float)) else \
+            self.__option("plugin_manager.timeout_seconds", 10)
+        return self.__option(f"plugins.{plugin.name()}.timeout_seconds", default)
 
     @staticmethod
     def load_plugins() -> list:
         """
         Loads all the valid plugins defined within the pi_assistant.plugins module. The loaded plugins will be a class object
-        which can be dynamically instantiated to create the actual plugin
+        which can be dynamically instantiated to create the actual plugin. Note that this imports every plugin, the
+        plugin manager itself only imports the plugins which are enabled.
         :return:
         """
-        plugins = []
-        path = os.path.join(".", "pi_assistant", "plugins")
-        plugin_names = list(filter(lambda directory: directory != '__pycache__', next(os.walk(path))[1]))
-        for plugin_name in plugin_names:
-            class_name = sanitize_plugin_class_name(plugin_name)
-            mod = __import__(f'pi_assistant.plugins.{plugin_name}.{plugin_name}_plugin', fromlist=[class_name])
-            plugins.append(getattr(mod, class_name))
+        plugins = [spec.load_class() for spec in PluginManifest.build(PLUGINS_PATH, PLUGINS_PACKAGE).specs]
         logger.info(f"Successfully loaded: {len(plugins)} plugins.")
         return plugins
 
@@ -130,42 +443,48 @@ class PluginManager:
         :return: dictionary of configuration classes keyed by the plugin name
         """
         configs = {}
-        path = os.path.join(".", "pi_assistant", "plugins")
-        module_names = list(filter(lambda directory: directory != '__pycache__', next(os.walk(path))[1]))
-
-        for module in module_names:
-            config_class_name = sanitize_plugin_class_name(module, True)
-            config_file_path = os.path.join(path, module, f"{module}_config.py")
-            if os.path.exists(config_file_path):
-                mod = __import__(f'pi_assistant.plugins.{module}.{module}_config', fromlist=[config_class_name])
-                configs[module] = getattr(mod, config_class_name)
+        for spec in PluginManifest.build(PLUGINS_PATH, PLUGINS_PACKAGE).specs:
+            if spec.config_module is not None:
+                configs[spec.name] = spec.load_config_class()
             else:
-                logger.debug(f"No configuration file found for plugin: {module} in path: {config_file_path}")
+                logger.debug(f"No configuration file found for plugin: {spec.name}")
         logger.info(f"Successfully loaded: {len(configs.keys())} configuration modules.")
         logger.debug(f"Configuration object keys: {configs.keys()}")
         return configs
 
-    def __save_devices(self):
+    def __save_devices(self, plugin: str, devices: list) -> None:
         """
-        Saves all the plugin defined devices to a top level file in the resources directory
-        :return:
+        Reports a plugin's devices to the device registry which persists only the devices that changed.
+        :param plugin: String the name of the plugin
+        :param devices: List of Device
+        :return: None
         """
-        path = os.path.join(".", "resources", "devices.json")
         try:
-            with open(path, 'w') as devices_file:
-                devices_file.write(json.dumps(self._global_devices, indent=4, default=lambda o: o.__dict__))
+            if self._registry is None:
+                self._registry = DeviceRegistry.shared()
+            self._registry.update(plugin, devices)
         except Exception as e:
-            logger.error(f"Failed to save devices.json to path: {path}. Linking devices to rooms/groups will not work"
-                         f"until this is resolved. Error = {str(e)}")
+            logger.error(f"Failed to save the devices of the plugin: {plugin}. Linking devices to rooms/groups will "
+                         f"not work until this is resolved. Error = {str(e)}")
 
     @property
     def plugins(self) -> list:
         return self._plugins
 
+    @property
+    def states(self) -> dict:
+        """
+        :return: Dictionary of plugin name -> PluginState for every plugin which has started initializing
+        """
+        return dict(self._states)
+
     @property
     def configs(self):
         return self._configs
 
     @property
-    def devices(self):
-        return self._global_devices
+    def devices(self) -> dict:
+        """
+        :return: Dictionary of plugin name -> list of Device for every plugin which uses physical devices
+        """
+        return self._registry.devices if self._registry is not None else {}
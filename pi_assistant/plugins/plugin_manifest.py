@@ -0,0 +1,184 @@
+import os
+import gc
+import ast
+import json
+import tempfile
+from pi_assistant.log import logger
+from pi_assistant.util import sanitize_plugin_class_name
+
+
+class PluginSpec:
+    """
+    Describes a plugin without importing it: where its plugin and configuration classes live, which intent it is bound
+    to and which configuration key enables it.
+    """
+
+    def __init__(self, name: str, module: str, class_name: str, intent: str = None, enabled_key: str = None,
+                 config_module: str = None, config_class_name: str = None):
+        self.name = name
+        self.module = module
+        self.class_name = class_name
+        self.intent = intent  # None when bind_to() isn't a string literal and the plugin must be imported to find out
+        self.enabled_key = enabled_key  # None when the plugin doesn't read an enabled flag from the configuration
+        self.config_module = config_module
+        self.config_class_name = config_class_name
+
+    def enabled(self, config) -> bool:
+        """
+        Determines if the plugin is enabled in the application configuration.
+        :param config: Application configuration
+        :return: True if the plugin is enabled and false otherwise
+        """
+        if self.enabled_key is None:
+            return True
+        try:
+            return bool(config.get(self.enabled_key))
+        except KeyError:
+            return False
+
+    def load_class(self):
+        mod = __import__(self.module, fromlist=[self.class_name])
+        return getattr(mod, self.class_name)
+
+    def load_config_class(self):
+        if self.config_module is None:
+            return None
+        mod = __import__(self.config_module, fromlist=[self.config_class_name])
+        return getattr(mod, self.config_class_name)
+
+    def to_dict(self) -> dict:
+        return dict(self.__dict__)
+
+    @staticmethod
+    def from_dict(data: dict):
+        return PluginSpec(**data)
+
+
+class PluginManifest:
+    """
+    The list of available plugins. The manifest is generated by statically analysing (not importing) each plugin
+    package and cached to disk along with the modification time of every source file it was generated from so it is
+    only regenerated when a plugin changes.
+    """
+
+    def __init__(self, specs: list, signature: dict = None):
+        self.specs = specs
+        self.signature = signature or {}
+
+    @staticmethod
+    def signature_of(path: str) -> dict:
+        """
+        Computes the modification time of every plugin source file which contributes to the manifest.
+        :param path: String path to the plugins package directory
+        :return: Dictionary of relative file path -> modification time
+        """
+        signature = {}
+        for plugin_name in PluginManifest.plugin_names(path):
+            for suffix in ("plugin", "config"):
+                file_path = os.path.join(path, plugin_name, f"{plugin_name}_{suffix}.py")
+                if os.path.exists(file_path):
+                    signature[os.path.relpath(file_path, path)] = os.path.getmtime(file_path)
+        return signature
+
+    @staticmethod
+    def plugin_names(path: str) -> list:
+        return sorted(name for name in next(os.walk(path))[1]
+                      if name != '__pycache__' and os.path.exists(os.path.join(path, name, f"{name}_plugin.py")))
+
+    @staticmethod
+    def build(path: str, package: str):
+        """
+        Generates a manifest by parsing the source of every plugin in the plugins package.
+        :param path: String path to the plugins package directory
+        :param package: String the dotted name of the plugins package i.e "pi_assistant.plugins"
+        :return: PluginManifest
+        """
+        specs = []
+        for plugin_name in PluginManifest.plugin_names(path):
+            class_name = sanitize_plugin_class_name(plugin_name)
+            intent, enabled_key = PluginManifest.__inspect(os.path.join(path, plugin_name, f"{plugin_name}_plugin.py"),
+                                                           class_name)
+            config_module, config_class_name = None, None
+            if os.path.exists(os.path.join(path, plugin_name, f"{plugin_name}_config.py")):
+                config_module = f"{package}.{plugin_name}.{plugin_name}_config"
+                config_class_name = sanitize_plugin_class_name(plugin_name, True)
+            specs.append(PluginSpec(name=plugin_name, module=f"{package}.{plugin_name}.{plugin_name}_plugin",
+                                    class_name=class_name, intent=intent, enabled_key=enabled_key,
+                                    config_module=config_module, config_class_name=config_class_name))
+        return PluginManifest(specs, PluginManifest.signature_of(path))
+
+    @staticmethod
+    def load(path: str, package: str, cache_path: str):
+        """
+        Loads the cached manifest regenerating (and re-caching) it when any plugin source file has changed.
+        :param path: String path to the plugins package directory
+        :param package: String the dotted name of the plugins package
+        :param cache_path: String path to the cached manifest JSON file
+        :return: PluginManifest
+        """
+        signature = PluginManifest.signature_of(path)
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r') as file:
+                    data = json.loads(file.read())
+                if data.get("package") == package and data.get("signature") == signature:
+                    return PluginManifest([PluginSpec.from_dict(spec) for spec in data["plugins"]], signature)
+            except Exception as e:
+                logger.warning(f"Failed to read the cached plugin manifest: {cache_path}. Error = {str(e)}")
+
+        logger.info("Plugins changed since the manifest was cached. Regenerating the plugin manifest.")
+        manifest = PluginManifest.build(path, package)
+        manifest.save(cache_path, package)
+        return manifest
+
+    def save(self, cache_path: str, package: str) -> None:
+        data = {"package": package, "signature": self.signature, "plugins": [spec.to_dict() for spec in self.specs]}
+        directory = os.path.dirname(cache_path) or "."
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as file:
+                file.write(json.dumps(data, indent=4))
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            logger.error(f"Failed to save the plugin manifest to: {cache_path}. Error = {str(e)}")
+
+    @staticmethod
+    def __inspect(file_path: str, class_name: str) -> tuple:
+        """
+        Finds the intent a plugin binds to and the configuration key which enables it from the plugin's source. Both
+        must be string literals i.e `return "smart_lights"` and `self._app_config.get("plugins.x.enabled")`.
+        :return: Tuple of (intent, enabled key) either of which may be None
+        """
+        with open(file_path, 'r') as file:
+            source = file.read()
+
+        # Converting the parse tree isn't re-entrant on older Python 3.11 releases (CPython gh-106905). A finalizer run by
+        # the garbage collector mid conversion which itself parses code (i.e. an import hook) fails the parse with a
+        # SystemError so collection is paused while parsing.
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            tree = ast.parse(source, filename=file_path)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+        intent, enabled_key = None, None
+        for node in tree.body:
+            if not isinstance(node, ast.ClassDef) or node.name != class_name:
+                continue
+            for method in node.body:
+                if not isinstance(method, ast.FunctionDef):
+                    continue
+                if method.name == "bind_to":
+                    returns = [n for n in ast.walk(method) if isinstance(n, ast.Return)]
+                    if len(returns) == 1 and isinstance(returns[0].value, ast.Constant) \
+                            and isinstance(returns[0].value.value, str):
+                        intent = returns[0].value.value
+                elif method.name == "enabled":
+                    for n in ast.walk(method):
+                        if isinstance(n, ast.Call) and isinstance(n.func, ast.Attribute) and n.func.attr == "get" \
+                                and len(n.args) == 1 and isinstance(n.args[0], ast.Constant):
+                            enabled_key = n.args[0].value
+        return intent, enabled_key
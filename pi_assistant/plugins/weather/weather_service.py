@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import tempfile
+import threading
+import requests
+from pi_assistant.log import logger
+from pi_assistant.http_session import request_with_retries
+
+DEFAULT_LOCATION = ("New York", "New York")
+
+
+class WeatherReport:
+    def __init__(self, forecast: str, temperature: float, feels_like: float, fetched_at: float):
+        self.forecast = forecast  # Cloudy, Rainy, Sunny
+        self.temperature = temperature
+        self.feels_like = feels_like
+        self.fetched_at = fetched_at
+
+
+class WeatherService:
+    """
+    Serves the weather report for the user's location from memory. The report is refreshed on a background timer
+    shortly before it expires so answering the user never waits on the network, when a refresh fails the last report
+    keeps being served until a later refresh succeeds. The user's location changes rarely so it is cached on disk and
+    only looked up again once it is older than its own (much longer) TTL.
+    """
+
+    def __init__(self, session: requests.Session, api_key: str, weather_url: str, location_url: str,
+                 location_cache_path: str, report_ttl: float = 900, refresh_ahead: float = 120,
+                 location_ttl: float = 86400, timeout: tuple = (3.0, 5.0), retries: int = 2, backoff: float = 0.5):
+        """
+        :param session: requests.Session the shared HTTP session
+        :param api_key: String the OpenWeatherMap API key
+        :param weather_url: String the OpenWeatherMap current weather endpoint
+        :param location_url: String the ipinfo endpoint which locates the user by their IP address
+        :param location_cache_path: String path to the JSON file the location is cached in
+        :param report_ttl: Float seconds a weather report is considered current
+        :param refresh_ahead: Float seconds before the report expires that it is refreshed
+        :param location_ttl: Float seconds the cached location is trusted for
+        :param timeout: Tuple of (connect timeout, read timeout) in seconds
+        :param retries: Int the number of times a failed request is retried
+        :param backoff: Float the base delay in seconds between retries
+        """
+        self._session = session
+        self._api_key = api_key
+        self._weather_url = weather_url
+        self._location_url = location_url
+        self._location_cache_path = location_cache_path
+        self._report_ttl = report_ttl
+        self._refresh_ahead = min(refresh_ahead, report_ttl / 2)
+        self._location_ttl = location_ttl
+        self._timeout = timeout
+        self._retries = retries
+        self._backoff = backoff
+        self._location = None
+        self._report = None
+        self._timer = None
+        self._lock = threading.Lock()
+        self._stopped = False
+
+    @staticmethod
+    def from_config(config, session: requests.Session, api_key: str):
+        return WeatherService(session=session, api_key=api_key,
+                              weather_url=config.get("plugins.weather.weather_url"),
+                              location_url=config.get("plugins.weather.location_url"),
+                              location_cache_path=config.get("plugins.weather.location_cache.path"),
+                              report_ttl=config.get("plugins.weather.report_ttl_seconds"),
+                              refresh_ahead=config.get("plugins.weather.refresh_ahead_seconds"),
+                              location_ttl=config.get("plugins.weather.location_cache.ttl_seconds"),
+                              timeout=(config.get("plugins.weather.connect_timeout"),
+                                       config.get("plugins.weather.read_timeout")),
+                              retries=config.get("plugins.weather.retries"),
+                              backoff=config.get("plugins.weather.backoff"))
+
+    @property
+    def location(self) -> tuple:
+        return self._location
+
+    def report(self) -> WeatherReport:
+        """
+        :return: The latest WeatherReport or None if the weather has never been fetched successfully
+        """
+        report = self._report
+        if report is not None and time.time() - report.fetched_at > self._report_ttl:
+            logger.warning(f"Serving a weather report which is {time.time() - report.fetched_at:.0f} seconds old.")
+        return report
+
+    def start(self) -> None:
+        """
+        Resolves the user's location, fetches the first weather report and schedules the background refreshes.
+        :return: None
+        """
+        self._location = self.__cached_location() or self.__fetch_location()
+        self.refresh()
+
+    def stop(self) -> None:
+        with self._lock:
+            self._stopped = True
+            if self._timer is not None:
+                self._timer.cancel()
+
+    def refresh(self) -> None:
+        """
+        Fetches a new weather report and schedules the next refresh ahead of its expiry. A failed refresh is retried
+        after refresh_ahead seconds.
+        :return: None
+        """
+        delay = self._refresh_ahead
+        try:
+            self._report = self.__fetch_report(*self._location)
+            delay = self._report_ttl - self._refresh_ahead
+        except Exception as e:
+            logger.error(f"Failed to refresh the weather report. Error = {str(e)}")
+
+        with self._lock:
+            if self._stopped:
+                return
+            self._timer = threading.Timer(delay, self.refresh)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def __fetch_report(self, city: str, region: str) -> WeatherReport:
+        """
+        Fetches the current weather report given a city and region
+        :param: city String the city to fetch the weather report for
+        :param: region String the state to fetch the weather report for
+        :return: WeatherReport
+        """
+        r = request_with_retries(self._session, "GET", self._weather_url, timeout=self._timeout,
+                                 retries=self._retries, backoff=self._backoff,
+                                 params={"q": f"{city},{region}", "APPID": self._api_key})
+        if r.status_code != 200:
+            raise Exception(f"Expected 200 HTTP status code from Weather API but received status code of: "
+                            f"{r.status_code}. Response = {r.content}")
+        weather_response = r.json()
+        logger.debug(f"Weather map response: {weather_response}")
+        return WeatherReport(forecast=weather_response['weather'][0]['main'],
+                             temperature=weather_response['main']['temp'],
+                             feels_like=weather_response['main']['feels_like'],
+                             fetched_at=time.time())
+
+    def __fetch_location(self) -> tuple:
+        """
+        Fetches the city and state the current user resides in and caches it on disk. When the location can't be
+        fetched a stale cached location is used if there is one.
+        :return: Tuple of (city, region)
+        """
+        try:
+            r = request_with_retries(self._session, "GET", self._location_url, timeout=self._timeout,
+                                     retries=self._retries, backoff=self._backoff)
+            if r.status_code == 200:
+                location_response = r.json()
+                logger.debug(f"IP Location info response: {location_response}")
+                location = (location_response['city'], location_response['region'])
+                self.__save_location(location)
+                return location
+            logger.error(f"Expected 200 HTTP status code from Location API but received status code of: "
+                         f"{r.status_code}. Response = {r.content}")
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Something went wrong while attempting to fetch data from: {self._location_url}. "
+                         f"Error = {str(e)}")
+        # TODO maybe make the default city/state configurable
+        return self.__cached_location(ignore_ttl=True) or DEFAULT_LOCATION
+
+    def __cached_location(self, ignore_ttl: bool = False):
+        if not os.path.exists(self._location_cache_path):
+            return None
+        try:
+            with open(self._location_cache_path, 'r') as file:
+                cached = json.loads(file.read())
+            if ignore_ttl or time.time() - cached['fetched_at'] < self._location_ttl:
+                return cached['city'], cached['region']
+        except Exception as e:
+            logger.warning(f"Failed to read the cached location: {self._location_cache_path}. Error = {str(e)}")
+        return None
+
+    def __save_location(self, location: tuple) -> None:
+        directory = os.path.dirname(self._location_cache_path) or "."
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as file:
+                file.write(json.dumps({"city": location[0], "region": location[1], "fetched_at": time.time()}))
+            os.replace(tmp_path, self._location_cache_path)
+        except Exception as e:
+            logger.error(f"Failed to save the location to: {self._location_cache_path}. Error = {str(e)}")
+
+
+class SimulatedWeatherService:
+    """
+    Stands in for the WeatherService while commands are replayed. A fixed report is served without looking up the
+    user's location or calling the weather API.
+    """
+
+    def __init__(self, location: tuple = DEFAULT_LOCATION):
+        self._location = location
+
+    @property
+    def location(self) -> tuple:
+        return self._location
+
+    def report(self) -> WeatherReport:
+        return WeatherReport(forecast="Clear", temperature=293.15, feels_like=293.15, fetched_at=time.time())
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
@@ -2,9 +2,32 @@
 
 class Device:
     """
-    Device - Defines an IoT device which can be controlled via a plugin.
+    Device - Defines an IoT device which can be controlled via a plugin. Registries can hold thousands of devices so
+    the record uses __slots__ rather than a per instance __dict__.
     """
-    def __init__(self, name: str, bind_to: str, metadata: dict = {}):
+    __slots__ = ("name", "bind_to", "metadata")
+
+    def __init__(self, name: str, bind_to: str, metadata: dict = None):
         self.name = name
-        self.metadata = metadata
+        self.metadata = metadata if metadata is not None else {}
         self.bind_to = bind_to
+
+    @property
+    def id(self):
+        """
+        :return: The id the plugin identifies the device by or None if the device has no id
+        """
+        return self.metadata.get('id')
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "bind_to": self.bind_to, "metadata": self.metadata}
+
+    @staticmethod
+    def from_dict(data: dict):
+        return Device(name=data['name'], bind_to=data.get('bind_to'), metadata=data.get('metadata'))
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Device) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"Device(name={self.name!r}, bind_to={self.bind_to!r})"
@@ -1,5 +1,4 @@
 import json
-import os.path
 from collections import defaultdict
 from pi_assistant.log import logger
 
@@ -7,32 +6,74 @@ from pi_assistant.log import logger
 class Profile:
     """
     Profile - An object which encapsulates information about the user's home, rooms within the home, and groups
-    of devices in the home. An existing profile can be loaded from a JSON file or JSON string when the application starts
-    with the --profile argument.
+    of devices in the home. Profiles are kept in the ProfileStore and loaded when the application starts with the
+    --profile argument.
+
+    Rooms and groups map a device's (lower case) name to the device. The reverse index from a device to the rooms it
+    belongs to is kept up to date as devices are linked so every lookup at runtime is a single dictionary access.
     """
-    def __init__(self):
+    def __init__(self, name: str = None):
         super().__init__()
-        self.name = None
-        self.rooms = defaultdict(list)
-        self.groups = defaultdict(list)
+        self.name = name
+        self.rooms = defaultdict(dict)  # Room name -> device name -> device
+        self.groups = defaultdict(dict)  # Group name -> device name -> device
+        self.device_rooms = defaultdict(set)  # Device name -> names of the rooms the device is linked to
 
-    def save(self):
-        path = os.path.join(".", "resources", "profiles", self.name + ".json")
-        try:
-            with open(path, 'w') as file:
-                file.write(json.dumps(self, indent=4, default=lambda o: o.__dict__))
-                file.close()
-        except Exception as e:
-            logger.error(f"Failed to save profile to disk. Path = {path}. Error = {str(e)}")
+    def devices_in_room(self, room: str) -> dict:
+        return self.rooms.get(room.lower(), {})
+
+    def devices_in_group(self, group: str) -> dict:
+        return self.groups.get(group.lower(), {})
+
+    def rooms_for_device(self, device_name: str) -> set:
+        return self.device_rooms.get(device_name.lower(), set())
+
+    def add_room_device(self, room: str, device_name: str, device: dict) -> None:
+        self.rooms[room.lower()][device_name.lower()] = device
+        self.device_rooms[device_name.lower()].add(room.lower())
+
+    def remove_room_device(self, room: str, device_name: str) -> None:
+        self.rooms.get(room.lower(), {}).pop(device_name.lower(), None)
+        rooms = self.device_rooms.get(device_name.lower())
+        if rooms is not None:
+            rooms.discard(room.lower())
+            if len(rooms) == 0:
+                del self.device_rooms[device_name.lower()]
+
+    def remove_room(self, room: str) -> None:
+        for device_name in list(self.rooms.get(room.lower(), {})):
+            self.remove_room_device(room, device_name)
+        self.rooms.pop(room.lower(), None)
+
+    def reindex(self) -> None:
+        """
+        Rebuilds the device to rooms index from the rooms.
+        """
+        self.device_rooms = defaultdict(set)
+        for room, devices in self.rooms.items():
+            for device_name in devices:
+                self.device_rooms[device_name.lower()].add(room)
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "rooms": {room: dict(devices) for room, devices in self.rooms.items()},
+                "groups": {group: dict(devices) for group, devices in self.groups.items()}}
 
     @staticmethod
     def load_json_file(path: str):
+        """
+        Loads a profile saved as JSON by earlier versions of the application.
+        :param path: String path to the JSON profile
+        :return: Profile or None if the profile could not be loaded
+        """
         try:
             p = Profile()
             with open(path, 'r') as json_file:
                 data = json.loads(json_file.read())
-                for k, v in data.items():
-                    setattr(p, k, v)
+            p.name = data.get("name")
+            p.rooms = defaultdict(dict, {room.lower(): dict(devices) for room, devices in data.get("rooms", {}).items()})
+            p.groups = defaultdict(dict, {group.lower(): dict(devices)
+                                          for group, devices in data.get("groups", {}).items()})
+            p.reindex()
             return p
         except Exception as e:
             logger.error(f"Failed to load json profile from the path: {path}. Ensure the path is valid and points to a "
@@ -0,0 +1,281 @@
+import os
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pi_assistant.log import logger
+from pi_assistant.profile.Device import Device
+from pi_assistant.profile.Profile import Profile
+from pi_assistant.devices.device_index import DeviceIndex
+
+PROFILES_DIRECTORY = os.path.join(".", "resources", "profiles")
+# Earlier versions of the CLI wrote profiles to resources/profiles but the assistant read them from resources/profile
+LEGACY_PROFILE_DIRECTORIES = [PROFILES_DIRECTORY, os.path.join(".", "resources", "profile")]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    name TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS rooms (
+    profile TEXT NOT NULL REFERENCES profiles(name) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    PRIMARY KEY (profile, name)
+);
+CREATE TABLE IF NOT EXISTS groups (
+    profile TEXT NOT NULL REFERENCES profiles(name) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    PRIMARY KEY (profile, name)
+);
+CREATE TABLE IF NOT EXISTS room_devices (
+    profile TEXT NOT NULL,
+    room TEXT NOT NULL,
+    device TEXT NOT NULL, -- The link key of the device, see ProfileStore.link_key
+    data TEXT NOT NULL,
+    PRIMARY KEY (profile, room, device),
+    FOREIGN KEY (profile, room) REFERENCES rooms(profile, name) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS room_devices_by_device ON room_devices(profile, device);
+CREATE TABLE IF NOT EXISTS group_devices (
+    profile TEXT NOT NULL,
+    grp TEXT NOT NULL,
+    device TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (profile, grp, device),
+    FOREIGN KEY (profile, grp) REFERENCES groups(profile, name) ON DELETE CASCADE
+);
+"""
+
+
+class ProfileStore:
+    """
+    Stores every profile in a single SQLite database. Each change (creating a room, linking a device, ...) is applied
+    as its own small transaction so editing a profile with hundreds of devices only writes the rows which changed and a
+    crash mid-write can never leave a half written profile behind. The assistant and the CLI can use the database at the
+    same time.
+    """
+
+    def __init__(self, path: str = os.path.join(PROFILES_DIRECTORY, "profiles.db"),
+                 legacy_directories: list = None):
+        """
+        :param path: String path to the SQLite database
+        :param legacy_directories: List of directories JSON profiles are imported from
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._path = path
+        self._legacy_directories = LEGACY_PROFILE_DIRECTORIES if legacy_directories is None else legacy_directories
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA foreign_keys=ON")
+        self._connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Groups several changes into one atomic transaction. Either every change is written or none of them are.
+        """
+        with self._lock:
+            with self._connection:
+                yield self._connection
+
+    def exists(self, profile: str) -> bool:
+        with self._lock:
+            return self._connection.execute("SELECT 1 FROM profiles WHERE name = ?", (profile,)).fetchone() is not None
+
+    def profiles(self) -> list:
+        with self._lock:
+            return [row[0] for row in self._connection.execute("SELECT name FROM profiles ORDER BY name")]
+
+    def create_profile(self, profile: str) -> None:
+        if self.exists(profile):
+            raise Exception(f"The profile: {profile} already exists.")
+        with self.transaction() as db:
+            db.execute("INSERT INTO profiles (name) VALUES (?)", (profile,))
+
+    def delete_profile(self, profile: str) -> None:
+        self.__require_profile(profile)
+        with self.transaction() as db:
+            db.execute("DELETE FROM profiles WHERE name = ?", (profile,))
+
+    def create_room(self, profile: str, room: str) -> None:
+        self.__require_profile(profile)
+        if self.__has(profile, "rooms", room):
+            raise Exception(f"The room name: {room} already exists in the profile: {profile}. Please use a new --name.")
+        with self.transaction() as db:
+            db.execute("INSERT INTO rooms (profile, name) VALUES (?, ?)", (profile, room.lower()))
+
+    def delete_room(self, profile: str, room: str) -> None:
+        self.__require(profile, "rooms", room)
+        with self.transaction() as db:
+            db.execute("DELETE FROM rooms WHERE profile = ? AND name = ?", (profile, room.lower()))
+
+    def create_group(self, profile: str, group: str) -> None:
+        self.__require_profile(profile)
+        if self.__has(profile, "groups", group):
+            raise Exception(f"The group name: {group} already exists in the profile: {profile}. "
+                            f"Please use a new --name.")
+        with self.transaction() as db:
+            db.execute("INSERT INTO groups (profile, name) VALUES (?, ?)", (profile, group.lower()))
+
+    def delete_group(self, profile: str, group: str) -> None:
+        self.__require(profile, "groups", group)
+        with self.transaction() as db:
+            db.execute("DELETE FROM groups WHERE profile = ? AND name = ?", (profile, group.lower()))
+
+    @staticmethod
+    def link_key(device: dict) -> str:
+        """
+        Identifies a linked device the same way the DeviceIndex does so two devices which share a name i.e. a lamp from
+        two different plugins are never mistaken for each other.
+        :param device: Dictionary the device in the Device.to_dict() format or a plain dictionary with a name
+        :return: String the plugin and the device's id (or name) i.e. "feit_electric_smart_lights/ebf6a2..."
+        """
+        d = Device.from_dict(device)
+        if d.bind_to is None:
+            return DeviceIndex.normalize(d.name)
+        return f"{d.bind_to}/{DeviceIndex.key(d)}"
+
+    def link_device(self, profile: str, room: str, device: dict) -> None:
+        """
+        Links a device to a room.
+        :param profile: String the name of the profile
+        :param room: String the name of the room
+        :param device: Dictionary the device, it must have a name
+        :return: None
+        """
+        if self.link_devices(profile, room, [device]) == 0:
+            raise Exception(f"The device: {device['name'].lower()} already belongs to the room: {room.lower()}.")
+
+    def link_devices(self, profile: str, room: str, devices: list) -> int:
+        """
+        Links many devices to a room in a single transaction. Devices which already belong to the room are skipped.
+        Devices in a room are looked up by name so nothing is linked when a different device with the same name already
+        belongs to the room, or is linked alongside it.
+        :param profile: String the name of the profile
+        :param room: String the name of the room
+        :param devices: List of device dictionaries, each must have a name
+        :return: Int the number of devices which were newly linked
+        """
+        self.__require(profile, "rooms", room)
+        with self.transaction() as db:
+            rows = db.execute("SELECT data FROM room_devices WHERE profile = ? AND room = ?",
+                              (profile, room.lower())).fetchall()
+            linked = {}  # Device name -> link key of the devices in the room
+            for device in (json.loads(data) for (data,) in rows):
+                linked[device['name'].lower()] = ProfileStore.link_key(device)
+            links, conflicts = [], []
+            for device in devices:
+                name, key = device['name'].lower(), ProfileStore.link_key(device)
+                if name not in linked:
+                    linked[name] = key
+                    links.append((profile, room.lower(), key, json.dumps(device)))
+                elif linked[name] != key:
+                    conflicts.append(f"{name} ({key})")
+            if len(conflicts) > 0:
+                raise Exception(f"The room: {room.lower()} already has a different device with the same name as: "
+                                f"{', '.join(conflicts)}. Rename the devices or link them to different rooms.")
+            db.executemany("INSERT INTO room_devices (profile, room, device, data) VALUES (?, ?, ?, ?)", links)
+            return len(links)
+
+    def unlink_device(self, profile: str, room: str, device_name: str) -> None:
+        self.__require(profile, "rooms", room)
+        with self.transaction() as db:
+            rows = db.execute("SELECT device, data FROM room_devices WHERE profile = ? AND room = ?",
+                              (profile, room.lower())).fetchall()
+            keys = [key for key, data in rows if json.loads(data)['name'].lower() == device_name.lower()]
+            if len(keys) == 0:
+                raise Exception(f"The device: {device_name.lower()} does not belong to the room: {room.lower()}.")
+            db.executemany("DELETE FROM room_devices WHERE profile = ? AND room = ? AND device = ?",
+                           [(profile, room.lower(), key) for key in keys])
+
+    def add_group_device(self, profile: str, group: str, device: dict) -> None:
+        self.__require(profile, "groups", group)
+        with self.transaction() as db:
+            db.execute("INSERT OR REPLACE INTO group_devices (profile, grp, device, data) VALUES (?, ?, ?, ?)",
+                       (profile, group.lower(), device['name'].lower(), json.dumps(device)))
+
+    def remove_group_device(self, profile: str, group: str, device_name: str) -> None:
+        self.__require(profile, "groups", group)
+        with self.transaction() as db:
+            db.execute("DELETE FROM group_devices WHERE profile = ? AND grp = ? AND device = ?",
+                       (profile, group.lower(), device_name.lower()))
+
+    def load(self, profile: str) -> Profile:
+        """
+        Loads a profile and builds its room, group and device indexes. Profiles saved as JSON by earlier versions of the
+        application are imported the first time they are loaded.
+        :param profile: String the name of the profile
+        :return: Profile
+        """
+        if not self.exists(profile):
+            for directory in self._legacy_directories:
+                path = os.path.join(directory, profile + ".json")
+                if os.path.exists(path):
+                    logger.info(f"Importing the JSON profile: {path}")
+                    legacy = Profile.load_json_file(path)
+                    if legacy is None:
+                        raise Exception(f"The JSON profile: {path} could not be imported as it is corrupt or can't "
+                                        f"be read. Fix or remove the file, or use profile:create to create the "
+                                        f"profile: {profile} again.")
+                    self.save(legacy, name=profile)
+                    break
+        self.__require_profile(profile)
+
+        p = Profile(profile)
+        with self._lock:
+            for (room,) in self._connection.execute("SELECT name FROM rooms WHERE profile = ?", (profile,)):
+                p.rooms[room] = {}
+            for (group,) in self._connection.execute("SELECT name FROM groups WHERE profile = ?", (profile,)):
+                p.groups[group] = {}
+            for room, data in self._connection.execute(
+                    "SELECT room, data FROM room_devices WHERE profile = ?", (profile,)):
+                device = json.loads(data)
+                p.add_room_device(room, device['name'], device)
+            for group, device, data in self._connection.execute(
+                    "SELECT grp, device, data FROM group_devices WHERE profile = ?", (profile,)):
+                p.groups[group][device] = json.loads(data)
+        return p
+
+    def save(self, profile: Profile, name: str = None) -> None:
+        """
+        Replaces a whole profile in one transaction.
+        :param profile: Profile the profile to save
+        :param name: String the name to save the profile under, defaults to the profile's name
+        :return: None
+        """
+        name = name or profile.name
+        with self.transaction() as db:
+            db.execute("DELETE FROM profiles WHERE name = ?", (name,))
+            db.execute("INSERT INTO profiles (name) VALUES (?)", (name,))
+            db.executemany("INSERT INTO rooms (profile, name) VALUES (?, ?)",
+                           [(name, room.lower()) for room in profile.rooms])
+            db.executemany("INSERT INTO groups (profile, name) VALUES (?, ?)",
+                           [(name, group.lower()) for group in profile.groups])
+            db.executemany("INSERT INTO room_devices (profile, room, device, data) VALUES (?, ?, ?, ?)",
+                           [(name, room.lower(), ProfileStore.link_key(device), json.dumps(device))
+                            for room, devices in profile.rooms.items()
+                            for device in ({"name": device_name, **data} for device_name, data in devices.items())])
+            db.executemany("INSERT INTO group_devices (profile, grp, device, data) VALUES (?, ?, ?, ?)",
+                           [(name, group.lower(), device_name.lower(), json.dumps(device))
+                            for group, devices in profile.groups.items() for device_name, device in devices.items()])
+
+    def __has(self, profile: str, table: str, name: str) -> bool:
+        with self._lock:
+            return self._connection.execute(f"SELECT 1 FROM {table} WHERE profile = ? AND name = ?",
+                                            (profile, name.lower())).fetchone() is not None
+
+    def __require_profile(self, profile: str) -> None:
+        if not self.exists(profile):
+            raise Exception(f"No profile could be found with the name: {profile}. You can use profile:create to "
+                            f"create a new profile.")
+
+    def __require(self, profile: str, table: str, name: str) -> None:
+        self.__require_profile(profile)
+        if not self.__has(profile, table, name):
+            raise Exception(f"No {table[:-1]} could be found in the profile: {profile} with the name: {name.lower()}")
@@ -0,0 +1,145 @@
+import json
+import math
+import time
+import threading
+from typing import Callable
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pi_assistant.log import logger
+
+
+class NullReplySink:
+    """
+    Stands in for the speaker while commands are replayed. Replies are counted instead of being synthesized and played.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.replies = 0
+
+    def __call__(self, text: str) -> None:
+        with self._lock:
+            self.replies += 1
+
+
+class ReplayReport:
+    """
+    Throughput and per intent latency of a replay.
+    """
+
+    def __init__(self, latencies: dict, failures: dict, elapsed: float, concurrency: int):
+        """
+        :param latencies: Dictionary of intent name -> list of seconds each command took
+        :param failures: Dictionary of intent name -> number of commands which raised
+        :param elapsed: Float seconds the whole replay took
+        :param concurrency: Int the number of commands which ran at the same time
+        """
+        self.latencies = latencies
+        self.failures = failures
+        self.elapsed = elapsed
+        self.concurrency = concurrency
+
+    @property
+    def commands(self) -> int:
+        return sum(len(latencies) for latencies in self.latencies.values())
+
+    @property
+    def commands_per_second(self) -> float:
+        return self.commands / self.elapsed if self.elapsed > 0 else 0.0
+
+    @staticmethod
+    def percentile(latencies: list, p: float) -> float:
+        """
+        :param latencies: List of latencies
+        :param p: Float the percentile between 0 and 100
+        :return: Float the nearest rank percentile of the latencies
+        """
+        ordered = sorted(latencies)
+        return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+    def to_dict(self) -> dict:
+        return {"commands": self.commands, "elapsed_seconds": self.elapsed, "concurrency": self.concurrency,
+                "commands_per_second": self.commands_per_second,
+                "intents": {intent: {"count": len(latencies), "failures": self.failures.get(intent, 0),
+                                     "p50_ms": ReplayReport.percentile(latencies, 50) * 1000,
+                                     "p95_ms": ReplayReport.percentile(latencies, 95) * 1000,
+                                     "p99_ms": ReplayReport.percentile(latencies, 99) * 1000}
+                            for intent, latencies in sorted(self.latencies.items())}}
+
+    def format(self) -> str:
+        lines = [f"Replayed {self.commands} commands in {self.elapsed:.2f}s with concurrency {self.concurrency}: "
+                 f"{self.commands_per_second:.1f} commands/sec",
+                 f"{'intent':<24}{'count':>8}{'failed':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+        for intent, row in self.to_dict()["intents"].items():
+            lines.append(f"{intent:<24}{row['count']:>8}{row['failures']:>8}{row['p50_ms']:>10.2f}"
+                         f"{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}")
+        return "\n".join(lines)
+
+
+class Replay:
+    """
+    Replays commands through the NLU and dispatch half of the assistant without a microphone. Each command is either an
+    utterance, which is sent to NLU first, or a pre-recorded NLU response which is dispatched directly so a replay can
+    run entirely offline.
+    """
+
+    def __init__(self, handle_intent: Callable[[dict], list], understand: Callable[[str], dict] = None,
+                 concurrency: int = 1):
+        """
+        :param handle_intent: Function which dispatches an NLU response to the plugins i.e PluginManager.handle_intent
+        :param understand: Function utterance -> NLU response, only needed to replay utterances
+        :param concurrency: Int the number of commands replayed at the same time
+        """
+        self._handle_intent = handle_intent
+        self._understand = understand
+        self._concurrency = max(1, concurrency)
+
+    @staticmethod
+    def load(path: str) -> list:
+        """
+        Loads the commands to replay. Each non empty line is either an utterance or a JSON NLU response, lines starting
+        with # are ignored.
+        :param path: String path to the file of commands
+        :return: List of commands, Strings for utterances and Dictionaries for NLU responses
+        """
+        commands = []
+        with open(path, 'r') as file:
+            for line in file:
+                line = line.strip()
+                if len(line) == 0 or line.startswith("#"):
+                    continue
+                commands.append(json.loads(line) if line.startswith("{") else line)
+        return commands
+
+    def run(self, commands: list) -> ReplayReport:
+        """
+        Replays every command and measures how long each one took from NLU until its plugins finished.
+        :param commands: List of utterances and NLU responses
+        :return: ReplayReport
+        """
+        latencies = defaultdict(list)
+        failures = defaultdict(int)
+        lock = threading.Lock()
+
+        def replay(command) -> None:
+            start = time.perf_counter()
+            intent = "unknown"
+            ok = True
+            try:
+                response = command if isinstance(command, dict) else self._understand(command)
+                if len(response['intents']) > 0:
+                    intent = max(response['intents'], key=lambda i: i['confidence'])['name']
+                    self._handle_intent(response)
+            except Exception as e:
+                ok = False
+                logger.error(f"Failed to replay the command: {command}. Error = {str(e)}")
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies[intent].append(elapsed)
+                if not ok:
+                    failures[intent] += 1
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self._concurrency, thread_name_prefix="replay") as executor:
+            list(executor.map(replay, commands))
+        return ReplayReport(dict(latencies), dict(failures), time.perf_counter() - start, self._concurrency)
@@ -0,0 +1,153 @@
+import re
+import asyncio
+from typing import Callable
+from pi_assistant.log import logger
+from pi_assistant.config import Configuration
+
+
+class Speculation:
+    """
+    NLU (and plugin warm up) started for a partial transcript of a command which is still being spoken.
+    """
+
+    def __init__(self, text: str, timer: asyncio.TimerHandle):
+        self.text = text
+        self.timer = timer  # Starts the speculation once the partial transcript has been stable long enough
+        self.task = None  # Resolves to the NLU response once the speculation has started
+        self.warm_up = None  # Warms up the plugins of a confident NLU response in the background
+        self.warmed = False
+        self.discarded = False
+
+
+class Speculator:
+    """
+    Speculatively understands a command before the user has finished saying it. Once a partial transcript has stopped
+    changing for stable_seconds, which typically happens during the pause which ends a phrase, it is sent to NLU. When
+    the top intent is at least min_confidence sure, the plugins bound to it are warmed up as well, i.e by opening
+    connections to the bulbs they are about to switch. When the final transcript arrives the speculation is committed
+    if it was made for the same words and discarded otherwise.
+
+    Every method must be called on the event loop.
+    """
+
+    def __init__(self, understand: Callable[[str], dict], warm_up: Callable[[dict], int], offload: Callable,
+                 stable_seconds: float = 0.3, min_confidence: float = 0.9):
+        """
+        :param understand: Function partial transcript -> Wit.ai style response dict containing intents and entities.
+        Partial transcripts may never be finished so their responses should not be cached
+        :param warm_up: Function which warms up the plugins of a response and returns how many were warmed up
+        i.e PluginManager.warm_up
+        :param offload: Coroutine function (fn, *args) which runs blocking work off the event loop
+        :param stable_seconds: Float seconds a partial transcript must remain unchanged before it is speculated on
+        :param min_confidence: Float the confidence the top intent needs before plugins are warmed up
+        """
+        self._understand = understand
+        self._warm_up = warm_up
+        self._offload = offload
+        self._stable_seconds = stable_seconds
+        self._min_confidence = min_confidence
+        self._speculations = {}  # Trace id -> Speculation
+        self._counters = {"speculations": 0, "hits": 0, "misses": 0, "wasted_nlu_calls": 0, "warm_ups": 0,
+                          "wasted_warm_ups": 0, "low_confidence": 0, "failures": 0}
+
+    @staticmethod
+    def from_config(config: Configuration, understand: Callable[[str], dict], warm_up: Callable[[dict], int],
+                    offload: Callable):
+        return Speculator(understand, warm_up, offload, stable_seconds=config.get("speculation.stable_seconds"),
+                          min_confidence=config.get("speculation.min_confidence"))
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(re.sub(r"[^\w\s']", " ", text.lower()).split())
+
+    def stats(self) -> dict:
+        return dict(self._counters, hit_ratio=self._counters["hits"] / self._counters["speculations"]
+                    if self._counters["speculations"] > 0 else 0.0)
+
+    def on_partial(self, trace_id: str, text: str) -> None:
+        """
+        Handles a new partial transcript of the command being spoken.
+        :param trace_id: String the correlation id of the command
+        :param text: String the partial transcript
+        :return: None
+        """
+        text = Speculator.normalize(text)
+        # Only one command is spoken at a time, speculations left over from earlier commands are abandoned
+        for other in [key for key in self._speculations if key != trace_id]:
+            self.__discard(self._speculations.pop(other))
+
+        speculation = self._speculations.get(trace_id)
+        if speculation is not None:
+            if speculation.text == text:
+                return
+            self.__discard(speculation)
+        if len(text) == 0:
+            self._speculations.pop(trace_id, None)
+            return
+        timer = asyncio.get_running_loop().call_later(self._stable_seconds, self.__start, trace_id)
+        self._speculations[trace_id] = Speculation(text, timer)
+
+    async def resolve(self, trace_id: str, transcript: str) -> dict:
+        """
+        Commits or discards the speculation made for a command now that its final transcript is known.
+        :param trace_id: String the correlation id of the command
+        :param transcript: String the final transcript
+        :return: Dictionary the speculative NLU response when it was made for the final transcript otherwise None
+        """
+        speculation = self._speculations.pop(trace_id, None)
+        if speculation is None:
+            return None
+        if speculation.task is None or speculation.text != Speculator.normalize(transcript):
+            self.__discard(speculation)
+            return None
+
+        try:
+            response = await speculation.task
+        except Exception as e:
+            logger.error(f"[{trace_id}] Speculative NLU failed for: \"{speculation.text}\". Error = {str(e)}")
+            return None
+        self._counters["hits"] += 1
+        logger.info(f"[{trace_id}] Committed the speculative NLU response for: \"{speculation.text}\"")
+        return response
+
+    def __start(self, trace_id: str) -> None:
+        speculation = self._speculations.get(trace_id)
+        if speculation is not None and speculation.task is None:
+            self._counters["speculations"] += 1
+            speculation.task = asyncio.ensure_future(self.__speculate(trace_id, speculation))
+
+    async def __speculate(self, trace_id: str, speculation: Speculation) -> dict:
+        try:
+            response = await self._offload(self._understand, speculation.text)
+        except Exception:
+            self._counters["failures"] += 1
+            raise
+        # The warm up carries on in the background so committing the response never waits on the plugins
+        if len(response['intents']) > 0 and max(i['confidence'] for i in response['intents']) >= self._min_confidence:
+            speculation.warm_up = asyncio.ensure_future(self.__warm_up(trace_id, speculation, response))
+        else:
+            self._counters["low_confidence"] += 1
+        return response
+
+    async def __warm_up(self, trace_id: str, speculation: Speculation, response: dict) -> None:
+        try:
+            warmed = await self._offload(self._warm_up, response)
+        except Exception as e:
+            logger.warning(f"[{trace_id}] Failed to warm up the plugins for: \"{speculation.text}\". Error = {str(e)}")
+            return
+        speculation.warmed = warmed > 0
+        self._counters["warm_ups"] += warmed
+        if speculation.discarded and speculation.warmed:
+            self._counters["wasted_warm_ups"] += 1
+        logger.debug(f"[{trace_id}] Speculated on: \"{speculation.text}\" warmed up plugins: {speculation.warmed}")
+
+    def __discard(self, speculation: Speculation) -> None:
+        speculation.timer.cancel()
+        if speculation.task is None:
+            return
+        self._counters["misses"] += 1
+        self._counters["wasted_nlu_calls"] += 1
+        speculation.discarded = True
+        # A warm up which is still running is counted as wasted once it finishes
+        if speculation.warmed:
+            self._counters["wasted_warm_ups"] += 1
@@ -0,0 +1,5 @@
+from pi_assistant.stt.backend import SttBackend, SttStream, BufferedSttStream
+from pi_assistant.stt.google_backend import GoogleSttBackend
+from pi_assistant.stt.sphinx_backend import SphinxSttBackend
+from pi_assistant.stt.vosk_backend import VoskSttBackend
+from pi_assistant.stt.fallback_backend import FallbackSttBackend
@@ -0,0 +1,131 @@
+import speech_recognition as sr
+from abc import ABC, abstractmethod
+from typing import Callable
+from pi_assistant.log import logger
+
+
+class SttStream(ABC):
+    """
+    A transcription in progress. Audio is fed in as it is captured and the final transcript is available shortly after
+    the last chunk. Streams which recognize speech incrementally report partial transcripts while the user is still
+    speaking.
+    """
+
+    def __init__(self, on_partial: Callable[[str], None] = None):
+        """
+        :param on_partial: Function (text) -> None called every time the partial transcript changes
+        """
+        self._on_partial = on_partial
+        self._partial = ""
+
+    @property
+    def partial(self) -> str:
+        """
+        :return: String the most recent partial transcript
+        """
+        return self._partial
+
+    @abstractmethod
+    def feed(self, chunk: bytes) -> None:
+        """
+        Adds the next chunk of 16 bit mono PCM audio.
+        :param chunk: Bytes of audio
+        :return: None
+        """
+        pass
+
+    @abstractmethod
+    def finish(self) -> str:
+        """
+        Ends the stream.
+        :return: String the final transcript. Raises sr.UnknownValueError when no speech was recognized
+        """
+        pass
+
+    def close(self) -> None:
+        """
+        Releases the resources of the stream i.e the recognizer session. Called once the stream is finished or when it
+        is abandoned without being finished.
+        :return: None
+        """
+        pass
+
+    def _emit_partial(self, text: str) -> None:
+        text = text.strip()
+        if len(text) == 0 or text == self._partial:
+            return
+        self._partial = text
+        if self._on_partial is not None:
+            try:
+                self._on_partial(text)
+            except Exception as e:
+                logger.error(f"Exception thrown while handling a partial transcript. Error = {str(e)}")
+
+
+class BufferedSttStream(SttStream):
+    """
+    Streams audio into a backend which can only transcribe complete phrases. The audio is buffered and transcribed in
+    one go once the stream is finished, no partial transcripts are reported.
+    """
+
+    def __init__(self, backend, sample_rate: int, sample_width: int, on_partial: Callable[[str], None] = None):
+        super().__init__(on_partial)
+        self._backend = backend
+        self._sample_rate = sample_rate
+        self._sample_width = sample_width
+        self._buffer = bytearray()
+
+    def feed(self, chunk: bytes) -> None:
+        self._buffer.extend(chunk)
+
+    def finish(self) -> str:
+        return self._backend.transcribe(sr.AudioData(bytes(self._buffer), self._sample_rate, self._sample_width))
+
+    def close(self) -> None:
+        self._buffer = bytearray()
+
+
+class SttBackend(ABC):
+    """
+    Converts speech to text. Backends which can't be reached (i.e when the internet is down) raise sr.RequestError and
+    audio which doesn't contain any recognizable speech raises sr.UnknownValueError.
+    """
+
+    @abstractmethod
+    def name(self) -> str:
+        pass
+
+    def available(self) -> bool:
+        """
+        Determines if the backend can be used at all i.e its optional dependencies and models are installed.
+        :return: Boolean
+        """
+        return True
+
+    @property
+    def streaming(self) -> bool:
+        """
+        :return: True if the backend transcribes audio while it is still being captured and reports partial
+        transcripts, False if it has to wait for the complete phrase
+        """
+        return False
+
+    @abstractmethod
+    def transcribe(self, audio: sr.AudioData) -> str:
+        """
+        Transcribes a complete phrase.
+        :param audio: AudioData the phrase
+        :return: String the transcript
+        """
+        pass
+
+    def open_stream(self, sample_rate: int, sample_width: int,
+                    on_partial: Callable[[str], None] = None) -> SttStream:
+        """
+        Starts transcribing a phrase which is still being captured.
+        :param sample_rate: Int samples per second of the audio which will be fed to the stream
+        :param sample_width: Int bytes per sample
+        :param on_partial: Function (text) -> None called every time the partial transcript changes
+        :return: SttStream
+        """
+        return BufferedSttStream(self, sample_rate, sample_width, on_partial)
@@ -0,0 +1,94 @@
+import time
+import threading
+import speech_recognition as sr
+from typing import Callable
+from pi_assistant.log import logger
+from pi_assistant.config import Configuration
+from pi_assistant.stt.backend import SttBackend, SttStream, BufferedSttStream
+from pi_assistant.stt.google_backend import GoogleSttBackend
+from pi_assistant.stt.sphinx_backend import SphinxSttBackend
+from pi_assistant.stt.vosk_backend import VoskSttBackend
+
+BACKENDS = ("google", "sphinx", "vosk")
+
+
+class FallbackSttBackend(SttBackend):
+    """
+    Tries a list of backends in order of preference. A backend which can't be reached (sr.RequestError, i.e the
+    internet is down) is skipped for a while so later commands go straight to the next backend instead of waiting for
+    the unreachable one to time out again.
+    """
+
+    def __init__(self, backends: list, retry_seconds: float = 30):
+        """
+        :param backends: List of SttBackend in order of preference
+        :param retry_seconds: Float seconds an unreachable backend is skipped before it is tried again
+        """
+        if len(backends) == 0:
+            raise Exception("At least one speech to text backend is required.")
+        self._backends = backends
+        self._retry_seconds = retry_seconds
+        self._down_until = {}  # Backend name -> monotonic time it is tried again
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def from_config(config: Configuration, recognizer: sr.Recognizer):
+        """
+        Creates the backends listed in stt.backends skipping any which aren't installed.
+        :param config: Application configuration
+        :param recognizer: Recognizer used by the Google and Sphinx backends
+        :return: FallbackSttBackend
+        """
+        backends = []
+        for name in config.get("stt.backends"):
+            if name not in BACKENDS:
+                raise Exception(f"Unknown speech to text backend: {name}. Expected one of: {', '.join(BACKENDS)}")
+            if name == "google":
+                backend = GoogleSttBackend(recognizer, language=config.get("stt.google.language"))
+            elif name == "sphinx":
+                backend = SphinxSttBackend(recognizer, language=config.get("stt.sphinx.language"))
+            else:
+                backend = VoskSttBackend(config.get("stt.vosk.model_path"))
+            if backend.available():
+                backends.append(backend)
+            else:
+                logger.warning(f"The speech to text backend: {name} is not available and will not be used.")
+        logger.info(f"Speech to text backends: {[backend.name() for backend in backends]}")
+        return FallbackSttBackend(backends, retry_seconds=config.get("stt.retry_seconds"))
+
+    def name(self) -> str:
+        return "fallback(" + ", ".join(backend.name() for backend in self._backends) + ")"
+
+    @property
+    def streaming(self) -> bool:
+        return self.__reachable()[0].streaming
+
+    def transcribe(self, audio: sr.AudioData) -> str:
+        error = None
+        for backend in self.__reachable():
+            try:
+                return backend.transcribe(audio)
+            except sr.RequestError as e:
+                error = e
+                self.__mark_unreachable(backend, e)
+        raise error
+
+    def open_stream(self, sample_rate: int, sample_width: int,
+                    on_partial: Callable[[str], None] = None) -> SttStream:
+        backend = self.__reachable()[0]
+        if backend.streaming:
+            return backend.open_stream(sample_rate, sample_width, on_partial)
+        # Buffered through the fallback chain so the phrase is still transcribed if the backend is unreachable
+        return BufferedSttStream(self, sample_rate, sample_width, on_partial)
+
+    def __reachable(self) -> list:
+        now = time.monotonic()
+        reachable = [backend for backend in self._backends if self._down_until.get(backend.name(), 0) <= now]
+        # When every backend is unreachable they are all tried again rather than giving up without trying
+        return reachable or self._backends
+
+    def __mark_unreachable(self, backend: SttBackend, error: Exception) -> None:
+        with self._lock:
+            self._down_until[backend.name()] = time.monotonic() + self._retry_seconds
+        logger.warning(f"The speech to text backend: {backend.name()} could not be reached, skipping it for "
+                       f"{self._retry_seconds} seconds. Error = {str(error)}")
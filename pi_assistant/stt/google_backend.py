@@ -0,0 +1,24 @@
+import speech_recognition as sr
+from pi_assistant.stt.backend import SttBackend
+
+
+class GoogleSttBackend(SttBackend):
+    """
+    Google's web speech API. Accurate but each phrase costs a network round trip once the user stops speaking.
+    """
+
+    def __init__(self, recognizer: sr.Recognizer, language: str = None):
+        """
+        :param recognizer: Recognizer used to make the request
+        :param language: String the language of the speech i.e "en-US" or None for Google's default
+        """
+        self._recognizer = recognizer
+        self._language = language
+
+    def name(self) -> str:
+        return "google"
+
+    def transcribe(self, audio: sr.AudioData) -> str:
+        if self._language is None:
+            return self._recognizer.recognize_google(audio_data=audio)
+        return self._recognizer.recognize_google(audio_data=audio, language=self._language)
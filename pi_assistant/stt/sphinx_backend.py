@@ -0,0 +1,26 @@
+import speech_recognition as sr
+from pi_assistant.stt.backend import SttBackend
+
+
+class SphinxSttBackend(SttBackend):
+    """
+    CMU PocketSphinx running on the device. It is already installed for keyword spotting, so it is always available
+    as an offline fallback. It is less accurate than the other backends.
+    """
+
+    def __init__(self, recognizer: sr.Recognizer, language: str = "en-US"):
+        self._recognizer = recognizer
+        self._language = language
+
+    def name(self) -> str:
+        return "sphinx"
+
+    def available(self) -> bool:
+        try:
+            import pocketsphinx  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def transcribe(self, audio: sr.AudioData) -> str:
+        return self._recognizer.recognize_sphinx(audio, language=self._language)
@@ -0,0 +1,101 @@
+import os
+import json
+import threading
+import speech_recognition as sr
+from typing import Callable
+from pi_assistant.log import logger
+from pi_assistant.stt.backend import SttBackend, SttStream
+
+try:
+    import vosk
+except ImportError:
+    vosk = None
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+
+
+class VoskStream(SttStream):
+    """
+    Incrementally recognizes audio with Kaldi as it is fed so only the tail of a phrase is left to decode once the
+    user stops speaking.
+    """
+
+    def __init__(self, model, sample_rate: int, on_partial: Callable[[str], None] = None):
+        super().__init__(on_partial)
+        self._recognizer = vosk.KaldiRecognizer(model, sample_rate)
+        self._segments = []
+
+    def feed(self, chunk: bytes) -> None:
+        if self._recognizer.AcceptWaveform(chunk):
+            self._segments.append(json.loads(self._recognizer.Result()).get("text", ""))
+            self._emit_partial(" ".join(self._segments))
+        else:
+            partial = json.loads(self._recognizer.PartialResult()).get("partial", "")
+            self._emit_partial(" ".join(self._segments + [partial]))
+
+    def finish(self) -> str:
+        self._segments.append(json.loads(self._recognizer.FinalResult()).get("text", ""))
+        transcript = " ".join(segment for segment in self._segments if segment)
+        if len(transcript) == 0:
+            raise sr.UnknownValueError()
+        return transcript
+
+    def close(self) -> None:
+        # Dropping the last reference frees the Kaldi decoder
+        self._recognizer = None
+
+
+class VoskSttBackend(SttBackend):
+    """
+    Vosk (Kaldi) offline speech recognition. Runs entirely on the device and streams, partial transcripts are reported
+    while the user is still speaking. Requires the optional vosk package and a model downloaded from
+    https://alphacephei.com/vosk/models
+    """
+
+    def __init__(self, model_path: str):
+        """
+        :param model_path: String path to the directory of an unpacked Vosk model
+        """
+        self._model_path = model_path
+        self._model = None
+        self._lock = threading.Lock()
+
+    def name(self) -> str:
+        return "vosk"
+
+    def available(self) -> bool:
+        if vosk is None:
+            logger.warning("The vosk package is not installed. Install it with: pip install vosk")
+            return False
+        if not os.path.isdir(self._model_path):
+            logger.warning(f"No Vosk model found at: {self._model_path}")
+            return False
+        return True
+
+    @property
+    def streaming(self) -> bool:
+        return True
+
+    def transcribe(self, audio: sr.AudioData) -> str:
+        stream = self.open_stream(SAMPLE_RATE, SAMPLE_WIDTH)
+        try:
+            stream.feed(audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=SAMPLE_WIDTH))
+            return stream.finish()
+        finally:
+            stream.close()
+
+    def open_stream(self, sample_rate: int, sample_width: int,
+                    on_partial: Callable[[str], None] = None) -> SttStream:
+        if sample_width != SAMPLE_WIDTH:
+            raise Exception(f"Vosk only accepts 16 bit audio, got {sample_width * 8} bit audio.")
+        return VoskStream(self.__load_model(), sample_rate, on_partial)
+
+    def __load_model(self):
+        # Loading a model takes a few seconds so it happens once, on first use
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    vosk.SetLogLevel(-1)
+                    self._model = vosk.Model(self._model_path)
+        return self._model
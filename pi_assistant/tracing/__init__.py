@@ -0,0 +1,2 @@
+from pi_assistant.tracing.histogram import Histogram
+from pi_assistant.tracing.tracer import Tracer
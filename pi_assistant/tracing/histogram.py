@@ -0,0 +1,60 @@
+import bisect
+import threading
+
+
+class Histogram:
+    """
+    Counts observations into fixed buckets, like a Prometheus histogram. Observing a value is a binary search and an
+    increment so histograms can be updated on every command without keeping the individual samples.
+    """
+
+    def __init__(self, buckets: list):
+        """
+        :param buckets: List of the upper bounds of each bucket, an implicit +Inf bucket is always added
+        """
+        self._bounds = sorted(float(bound) for bound in buckets)
+        self._counts = [0] * (len(self._bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def bounds(self) -> list:
+        return list(self._bounds)
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> dict:
+        """
+        :return: Dictionary with the cumulative count of each bucket (keyed by its upper bound), the sum and the count
+        """
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative = []
+        running = 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return {"buckets": list(zip(self._bounds + [float("inf")], cumulative)), "sum": total, "count": running}
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimates a quantile by interpolating within the bucket it falls in.
+        :param q: Float the quantile between 0 and 1
+        :return: Float the estimated value or 0.0 when nothing was observed
+        """
+        snapshot = self.snapshot()
+        if snapshot["count"] == 0:
+            return 0.0
+        rank = q * snapshot["count"]
+        lower_bound, lower_count = 0.0, 0
+        for bound, count in snapshot["buckets"]:
+            if count >= rank:
+                if bound == float("inf"):
+                    return lower_bound
+                return lower_bound + (bound - lower_bound) * (rank - lower_count) / max(1, count - lower_count)
+            lower_bound, lower_count = bound, count
+        return lower_bound
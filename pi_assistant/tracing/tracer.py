@@ -0,0 +1,193 @@
+import os
+import time
+import uuid
+import tempfile
+import threading
+import contextvars
+from contextlib import contextmanager, nullcontext
+from pi_assistant.log import logger
+from pi_assistant.config import Configuration
+from pi_assistant.tracing.histogram import Histogram
+
+DEFAULT_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+# Correlation id of the command the current thread or task is working on
+_trace_id = contextvars.ContextVar("trace_id", default=None)
+# Returned by span() while tracing is disabled so a disabled span costs a single attribute check
+_NULL_SPAN = nullcontext()
+
+
+class Tracer:
+    """
+    Times each stage of a command (keyword spotting, speech to text, Wit.ai, dispatch, each plugin and the reply). Every
+    command gets a correlation id which is carried by a context variable so the spans of a command can be followed in
+    the logs across threads. Span durations are aggregated into fixed bucket histograms per stage which are exported in
+    the Prometheus text format.
+    """
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, enabled: bool = False, buckets: list = None, export_path: str = None,
+                 export_interval: float = 15.0):
+        """
+        :param enabled: True if spans should be recorded
+        :param buckets: List of the histogram bucket upper bounds in seconds
+        :param export_path: String path the Prometheus text is periodically written to or None to not write a file
+        :param export_interval: Float seconds between writes of the export file
+        """
+        self._enabled = enabled
+        self._buckets = buckets or DEFAULT_BUCKETS
+        self._export_path = export_path
+        self._export_interval = export_interval
+        self._histograms = {}  # (stage, plugin) -> Histogram
+        self._lock = threading.Lock()
+        self._exporter = None
+
+    @staticmethod
+    def from_config(config: Configuration):
+        return Tracer(enabled=config.get("tracing.enabled") is True, buckets=config.get("tracing.buckets"),
+                      export_path=config.get("tracing.export.path"),
+                      export_interval=config.get("tracing.export.interval_seconds"))
+
+    @staticmethod
+    def shared():
+        """
+        Returns the tracer shared by the running assistant.
+        :return: Tracer
+        """
+        if Tracer._shared is None:
+            with Tracer._shared_lock:
+                if Tracer._shared is None:
+                    Tracer._shared = Tracer.from_config(Configuration.shared())
+        return Tracer._shared
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def set_enabled(self, enabled: bool) -> None:
+        self._enabled = enabled
+
+    @staticmethod
+    def current_trace() -> str:
+        """
+        :return: String the correlation id of the command being handled or None
+        """
+        return _trace_id.get()
+
+    @staticmethod
+    def new_trace() -> str:
+        return uuid.uuid4().hex[:12]
+
+    @contextmanager
+    def trace(self, trace_id: str = None):
+        """
+        Makes a correlation id current for the duration of the block, spans started within it are attributed to it.
+        :param trace_id: String an existing correlation id or None to start a new one
+        :return: String the correlation id
+        """
+        token = _trace_id.set(trace_id or Tracer.new_trace())
+        try:
+            yield _trace_id.get()
+        finally:
+            _trace_id.reset(token)
+
+    def span(self, stage: str, plugin: str = ""):
+        """
+        Times a block of code as a stage of the current command:
+
+            with tracer.span("nlu"):
+                ...
+
+        :param stage: String the stage i.e "stt", "nlu" or "plugin"
+        :param plugin: String the plugin the span belongs to, if any
+        :return: Context manager
+        """
+        if not self._enabled:
+            return _NULL_SPAN
+        return self.__span(stage, plugin)
+
+    @contextmanager
+    def __span(self, stage: str, plugin: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe(stage, elapsed, plugin)
+            logger.debug(f"[{_trace_id.get()}] {stage}{' ' + plugin if plugin else ''} took {elapsed * 1000:.1f} ms")
+
+    def observe(self, stage: str, seconds: float, plugin: str = "") -> None:
+        histogram = self._histograms.get((stage, plugin))
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault((stage, plugin), Histogram(self._buckets))
+        histogram.observe(seconds)
+
+    def histogram(self, stage: str, plugin: str = "") -> Histogram:
+        return self._histograms.get((stage, plugin))
+
+    def stats(self) -> dict:
+        """
+        :return: Dictionary of stage (and plugin) -> count, sum and estimated p50/p95/p99 in seconds
+        """
+        stats = {}
+        for (stage, plugin), histogram in sorted(self._histograms.items()):
+            snapshot = histogram.snapshot()
+            stats[f"{stage}:{plugin}" if plugin else stage] = {
+                "count": snapshot["count"], "sum": snapshot["sum"], "p50": histogram.quantile(0.5),
+                "p95": histogram.quantile(0.95), "p99": histogram.quantile(0.99)}
+        return stats
+
+    def prometheus(self) -> str:
+        """
+        :return: String every histogram in the Prometheus text exposition format
+        """
+        lines = ["# HELP pi_assistant_stage_seconds Time spent in each stage of handling a command.",
+                 "# TYPE pi_assistant_stage_seconds histogram"]
+        for (stage, plugin), histogram in sorted(self._histograms.items()):
+            labels = f'stage="{stage}"' + (f',plugin="{plugin}"' if plugin else "")
+            snapshot = histogram.snapshot()
+            for bound, count in snapshot["buckets"]:
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'pi_assistant_stage_seconds_bucket{{{labels},le="{le}"}} {count}')
+            lines.append(f"pi_assistant_stage_seconds_sum{{{labels}}} {snapshot['sum']}")
+            lines.append(f"pi_assistant_stage_seconds_count{{{labels}}} {snapshot['count']}")
+        return "\n".join(lines) + "\n"
+
+    def export(self) -> None:
+        """
+        Atomically writes the Prometheus text to the export path i.e for the node_exporter textfile collector.
+        :return: None
+        """
+        directory = os.path.dirname(self._export_path) or "."
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as file:
+                file.write(self.prometheus())
+            os.replace(tmp_path, self._export_path)
+        except Exception as e:
+            logger.error(f"Failed to export the metrics to: {self._export_path}. Error = {str(e)}")
+
+    def start_exporting(self) -> None:
+        """
+        Starts a background thread which writes the export file every export interval while tracing is enabled.
+        :return: None
+        """
+        if self._exporter is not None or not self._export_path:
+            return
+
+        def run():
+            while not stop.wait(self._export_interval):
+                if self._enabled:
+                    self.export()
+
+        stop = threading.Event()
+        self._exporter = (threading.Thread(target=run, name="metrics-exporter", daemon=True), stop)
+        self._exporter[0].start()
+
+    def stop_exporting(self) -> None:
+        if self._exporter is not None:
+            self._exporter[1].set()
+            self._exporter = None
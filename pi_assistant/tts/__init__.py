@@ -0,0 +1,2 @@
+from pi_assistant.tts.audio_cache import AudioCache
+from pi_assistant.tts.streaming import StreamingSpeaker, split_sentences
@@ -0,0 +1,198 @@
+import os
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Callable
+from pi_assistant.log import logger
+
+
+class AudioCache:
+    """
+    A persistent, content addressed cache of synthesized speech. Each entry is an MP3 file named by the hash of the
+    text, language and voice it was synthesized from so repeated replies can be played back without a network round
+    trip to the TTS service. The cache is bounded by its total size on disk and evicts the least recently used entries
+    first.
+    """
+    EXTENSION = ".mp3"
+
+    def __init__(self, directory: str, max_bytes: int, synthesize: Callable[[str, str, str], bytes]):
+        """
+        :param directory: String path to the directory the audio files are stored in. It will be created if it doesn't exist.
+        :param max_bytes: Int the maximum total size of the cached audio files.
+        :param synthesize: Function (text, lang, voice) -> bytes which produces MP3 audio on a cache miss.
+        """
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._synthesize = synthesize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size in bytes, least recently used first
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self.__load_index()
+
+    @staticmethod
+    def key(text: str, lang: str, voice: str) -> str:
+        """
+        Computes the content address for a phrase.
+        :param text: String the text being spoken
+        :param lang: String the language the text is spoken in i.e "en"
+        :param voice: String the voice (gTTS top level domain / accent) used i.e "com"
+        :return: String hex digest uniquely identifying the synthesized audio
+        """
+        return hashlib.sha256("\0".join((lang, voice, text)).encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self._directory, key + AudioCache.EXTENSION)
+
+    def get(self, text: str, lang: str = "en", voice: str = "com") -> str:
+        """
+        Returns the path to the cached audio for the given phrase or None when it hasn't been synthesized yet.
+        :return: String path to an MP3 file or None
+        """
+        key = AudioCache.key(text, lang, voice)
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+        path = self.path_for(key)
+        try:
+            # The modification time doubles as the persisted recency so the LRU order survives restarts
+            os.utime(path)
+        except FileNotFoundError:
+            # The file was removed out from under the cache, treat it as a miss
+            with self._lock:
+                self._size -= self._entries.pop(key, 0)
+            return None
+        return path
+
+    def fetch(self, text: str, lang: str = "en", voice: str = "com") -> str:
+        """
+        Returns the path to the audio for the given phrase synthesizing (and caching) it if it is not already cached.
+        :return: String path to an MP3 file
+        """
+        path = self.get(text, lang, voice)
+        if path is not None:
+            with self._lock:
+                self._hits += 1
+            return path
+
+        with self._lock:
+            self._misses += 1
+        return self.put(text, lang, voice, self._synthesize(text, lang, voice))
+
+    def put(self, text: str, lang: str, voice: str, audio: bytes) -> str:
+        """
+        Stores synthesized audio for a phrase and evicts the least recently used entries if the cache is over capacity.
+        :return: String path to the stored MP3 file
+        """
+        key = AudioCache.key(text, lang, voice)
+        path = self.path_for(key)
+
+        # Write to a temporary file first so a crash (or a concurrent reader) never sees a partially written file
+        fd, tmp_path = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            file.write(audio)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._size -= self._entries.pop(key, 0)
+            self._entries[key] = len(audio)
+            self._size += len(audio)
+            evicted = self.__evict()
+
+        for evicted_key in evicted:
+            try:
+                os.unlink(self.path_for(evicted_key))
+            except FileNotFoundError:
+                pass
+        return path
+
+    def prewarm(self, phrases: list, lang: str = "en", voice: str = "com") -> int:
+        """
+        Synthesizes any of the given phrases which are not already cached. This is intended to be called at startup
+        with the fixed phrases the assistant is known to say.
+        :param phrases: List of strings to synthesize ahead of time
+        :return: Int the number of phrases which had to be synthesized
+        """
+        synthesized = 0
+        for phrase in phrases:
+            if self.get(phrase, lang, voice) is None:
+                try:
+                    self.put(phrase, lang, voice, self._synthesize(phrase, lang, voice))
+                    synthesized += 1
+                except Exception as e:
+                    logger.error(f"Failed to pre-warm the TTS cache with the phrase: \"{phrase}\". Error = {str(e)}")
+        logger.info(f"Pre-warmed the TTS cache with {synthesized} new phrases ({len(phrases)} requested).")
+        return synthesized
+
+    def clear(self) -> None:
+        with self._lock:
+            keys = list(self._entries.keys())
+            self._entries.clear()
+            self._size = 0
+        for key in keys:
+            try:
+                os.unlink(self.path_for(key))
+            except FileNotFoundError:
+                pass
+
+    def __evict(self) -> list:
+        """
+        Drops least recently used entries from the index until the cache fits within its size limit. Must be called
+        with the lock held. The most recently used entry is never evicted so an oversized phrase can still be played.
+        :return: List of evicted keys whose files should be removed
+        """
+        evicted = []
+        while self._size > self._max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            evicted.append(key)
+        return evicted
+
+    def __load_index(self) -> None:
+        """
+        Rebuilds the in memory LRU index from the files already on disk ordered by their modification time.
+        :return: None
+        """
+        entries = []
+        for file_name in os.listdir(self._directory):
+            path = os.path.join(self._directory, file_name)
+            if file_name.endswith(".tmp"):
+                # Left over from an interrupted write
+                os.unlink(path)
+                continue
+            if not file_name.endswith(AudioCache.EXTENSION):
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, file_name[:-len(AudioCache.EXTENSION)], stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._size += size
+
+        for key in self.__evict():
+            os.unlink(self.path_for(key))
+        logger.debug(f"Loaded {len(self._entries)} cached TTS phrases ({self._size} bytes) from {self._directory}")
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def stats(self) -> dict:
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "entries": len(self._entries),
+            "bytes": self._size,
+        }
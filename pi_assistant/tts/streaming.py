@@ -0,0 +1,90 @@
+import re
+import threading
+from typing import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pi_assistant.log import logger
+
+# Sentence boundaries are terminal punctuation followed by whitespace. Clause boundaries (commas, semicolons, colons)
+# are only used to break up sentences which are too long to wait on.
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+CLAUSE_BOUNDARY = re.compile(r"(?<=[,;:])\s+")
+
+
+def split_sentences(text: str, min_chars: int = 20, max_chars: int = 120) -> list:
+    """
+    Splits text into chunks which can be synthesized and spoken independently. Text is split into sentences, sentences
+    longer than max_chars are split into clauses, and chunks shorter than min_chars are merged into the following chunk
+    so the speech doesn't sound choppy.
+    :param text: String the text to split
+    :param min_chars: Int the minimum length of a chunk
+    :param max_chars: Int the length after which a sentence is split on clause boundaries
+    :return: List of string chunks
+    """
+    pieces = []
+    for sentence in SENTENCE_BOUNDARY.split(text.strip()):
+        if len(sentence) > max_chars:
+            pieces.extend(CLAUSE_BOUNDARY.split(sentence))
+        elif sentence:
+            pieces.append(sentence)
+
+    chunks = []
+    pending = ""
+    for piece in pieces:
+        pending = f"{pending} {piece}" if pending else piece
+        if len(pending) >= min_chars:
+            chunks.append(pending)
+            pending = ""
+    if pending:
+        if chunks and len(pending) < min_chars:
+            chunks[-1] = f"{chunks[-1]} {pending}"
+        else:
+            chunks.append(pending)
+    return chunks
+
+
+class StreamingSpeaker:
+    """
+    Speaks text as a pipeline of chunks: every chunk is submitted for synthesis up front and the first chunk starts
+    playing as soon as it is ready while later chunks are still being synthesized. Each chunk is synthesized to its own
+    file so overlapping replies never share a buffer, and playback is serialized so two replies don't talk over each
+    other.
+    """
+
+    def __init__(self, fetch: Callable[[str], str], play: Callable[[str], None], workers: int = 2,
+                 min_chars: int = 20, max_chars: int = 120):
+        """
+        :param fetch: Function text -> path to an audio file containing the spoken text
+        :param play: Function path -> None which blocks while the audio file is played
+        :param workers: Int the number of chunks which may be synthesized concurrently
+        """
+        self._fetch = fetch
+        self._play = play
+        self._min_chars = min_chars
+        self._max_chars = max_chars
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts")
+        self._playback_lock = threading.Lock()
+
+    def chunks(self, text: str) -> list:
+        """
+        :param text: String the text to speak
+        :return: List of the string chunks the text is synthesized and played in
+        """
+        return split_sentences(text, self._min_chars, self._max_chars)
+
+    def speak(self, text: str) -> None:
+        """
+        Synthesizes and plays the text blocking until the last chunk has finished playing.
+        :param text: String the text to speak
+        :return: None
+        """
+        chunks = self.chunks(text)
+        futures = [self._executor.submit(self._fetch, chunk) for chunk in chunks]
+        try:
+            with self._playback_lock:
+                for chunk, future in zip(chunks, futures):
+                    path = future.result()
+                    logger.debug(f"Playing TTS chunk: \"{chunk}\"")
+                    self._play(path)
+        finally:
+            for future in futures:
+                future.cancel()
@@ -1,20 +1,152 @@
-import os
+import io
+import threading
+import contextvars
+from contextlib import contextmanager
 from gtts import gTTS
 from playsound import playsound
+from pi_assistant.config import Configuration
+from pi_assistant.tracing import Tracer
+from pi_assistant.tts import AudioCache, StreamingSpeaker
+
+config = Configuration.shared()
+tracer = Tracer.shared()
+_tts_cache = None
+_speaker = None
+_reply_sink = None
+_tts_lock = threading.Lock()
+# Replies of the plugin invocation running on the current thread are collected here instead of being spoken
+_reply_collector = contextvars.ContextVar("reply_collector", default=None)
+
+
+def synthesize(text: str, lang: str = "en", voice: str = "com") -> bytes:
+    """
+    Converts text into spoken MP3 audio using Google's text to speech service.
+    :param: text: String the text to speak.
+    :param: lang: String the language to speak the text in.
+    :param: voice: String the gTTS top level domain which determines the accent of the voice i.e "com" or "co.uk"
+    :return: Bytes of MP3 audio
+    """
+    buffer = io.BytesIO()
+    gTTS(text=text, lang=lang, tld=voice).write_to_fp(buffer)
+    return buffer.getvalue()
+
+
+def get_tts_cache() -> AudioCache:
+    """
+    Returns the shared on disk cache of synthesized replies creating it from the application configuration on first use.
+    :return: AudioCache
+    """
+    global _tts_cache
+    if _tts_cache is None:
+        with _tts_lock:
+            if _tts_cache is None:
+                _tts_cache = AudioCache(directory=config.get("tts.cache.directory"),
+                                        max_bytes=int(config.get("tts.cache.max_size_mb") * 1024 * 1024),
+                                        synthesize=synthesize)
+    return _tts_cache
+
+
+def get_speaker() -> StreamingSpeaker:
+    """
+    Returns the shared streaming speaker which synthesizes (through the TTS cache) and plays replies chunk by chunk.
+    :return: StreamingSpeaker
+    """
+    global _speaker
+    if _speaker is None:
+        cache = get_tts_cache()
+        with _tts_lock:
+            if _speaker is None:
+                _speaker = StreamingSpeaker(
+                    fetch=lambda chunk: cache.fetch(chunk, lang=config.get("tts.language"), voice=config.get("tts.voice")),
+                    play=playsound,
+                    workers=config.get("tts.streaming.workers"),
+                    min_chars=config.get("tts.streaming.min_chunk_chars"),
+                    max_chars=config.get("tts.streaming.max_chunk_chars"))
+    return _speaker
+
+
+def prewarm_replies(phrases: list) -> int:
+    """
+    Synthesizes the fixed replies the assistant is known to say ahead of time. When streaming is enabled replies are
+    fetched from the TTS cache chunk by chunk so the chunks of each phrase are cached rather than the whole phrase.
+    :param: phrases: List of strings to synthesize ahead of time
+    :return: Int the number of phrases (or chunks) which had to be synthesized
+    """
+    if config.get("tts.streaming.enabled") is True:
+        speaker = get_speaker()
+        phrases = [chunk for phrase in phrases for chunk in speaker.chunks(phrase)]
+    return get_tts_cache().prewarm(phrases, lang=config.get("tts.language"), voice=config.get("tts.voice"))
+
+
+def set_reply_sink(sink) -> None:
+    """
+    Sends every reply to the given function instead of speaking it i.e to replay commands without a speaker.
+    :param: sink: Function (text) -> None or None to speak replies again
+    :return: None
+    """
+    global _reply_sink
+    _reply_sink = sink
+
+
+@contextmanager
+def collect_replies():
+    """
+    Collects the replies made within the block instead of speaking them so the replies of every plugin which handled a
+    command can be merged into a single spoken response:
+
+        with collect_replies() as replies:
+            plugin.on_intent_received(intent, entities)
+
+    :return: List the replies in the order they were made
+    """
+    replies = []
+    token = _reply_collector.set(replies)
+    try:
+        yield replies
+    finally:
+        _reply_collector.reset(token)
+
+
+def merge_replies(replies: list) -> str:
+    """
+    Joins replies into a single response dropping empty and repeated replies.
+    :param: replies: List of Strings
+    :return: String the merged response
+    """
+    return " ".join(dict.fromkeys(reply.strip() for reply in replies if reply and reply.strip()))
 
 
 def assistant_reply(text: str) -> None:
     """
-    A helper function which will convert a string text into an MP3 file which will be immediately played. The resulting
-    text will be spoken via the assistant's voice. This is used by the plugins to reply to the user's command.
+    A helper function which is used by the plugins to reply to the user's command. The reply is handed to the reply
+    sink when one is set i.e the voice pipeline which speaks it on its reply stage, otherwise it is spoken immediately
+    via the assistant's voice.
+    :param: text: String the text to speak.
+    :return: None
+    """
+    collector = _reply_collector.get()
+    if collector is not None:
+        collector.append(text)
+        return
+    if _reply_sink is not None:
+        _reply_sink(text)
+    else:
+        speak(text)
+
+
+def speak(text: str) -> None:
+    """
+    Converts a string text into an MP3 file which will be immediately played. The resulting text will be spoken via the
+    assistant's voice. Audio is served from the TTS cache when the same text has been spoken before and, when streaming
+    is enabled, long replies start playing their first sentence while the rest is still being synthesized.
     :param: text: String the text to speak.
     :return: None
     """
-    tts = gTTS(text=text, lang='en')
-    tts.save('voice.mp3')
-    playsound('voice.mp3')
-    # Remove the file when
-    os.unlink('voice.mp3')
+    with tracer.span("reply"):
+        if config.get("tts.streaming.enabled") is True:
+            get_speaker().speak(text)
+        else:
+            playsound(get_tts_cache().fetch(text, lang=config.get("tts.language"), voice=config.get("tts.voice")))
 
 
 def sanitize_plugin_class_name(plugin_name: str, config: bool = False) -> str:
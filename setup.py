@@ -66,7 +66,7 @@ setup(name='pi-assistant',
       long_description=long_description,
       long_description_content_type='text/markdown',
       packages=find_packages(exclude=['tests', '*.tests', '*.tests.*', 'tests.*', 'test',
-                                      'tests/*', 'test/*', '*.test.*', '*.test']),
+                                      'tests/*', 'test/*', '*.test.*', '*.test', 'benchmarks', 'benchmarks.*']),
       include_package_data=True,
       install_requires=get_install_requirements(),
       entry_points={
@@ -0,0 +1,126 @@
+import threading
+import numpy as np
+from pi_assistant.audio import AudioRingBuffer, PhraseSegmenter, AudioCapture
+
+SAMPLE_RATE = 16000
+CHUNK = 1024
+
+
+def test_ring_buffer_reads_absolute_positions():
+    ring = AudioRingBuffer(8)
+    assert ring.write(b"abcd") == 4
+    assert ring.read(0) == b"abcd"
+    assert ring.read(2, 4) == b"cd"
+
+
+def test_ring_buffer_wraps_and_drops_overwritten_audio():
+    ring = AudioRingBuffer(8)
+    ring.write(b"abcdef")
+    ring.write(b"ghij")
+    assert ring.position == 10
+    assert ring.read(0) == b"cdefghij"
+    assert ring.read(4, 9) == b"efghi"
+
+
+def test_ring_buffer_write_larger_than_capacity():
+    ring = AudioRingBuffer(4)
+    ring.write(b"abcdefghij")
+    assert ring.position == 10
+    assert ring.read(0) == b"ghij"
+
+
+def tone(seconds: float, amplitude: float) -> bytes:
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * 200 * t)).astype("<i2").tobytes()
+
+
+def chunks(data: bytes):
+    for i in range(0, len(data), CHUNK * 2):
+        yield data[i:i + CHUNK * 2]
+
+
+def test_phrase_segmenter_finds_phrase_with_preroll():
+    segmenter = PhraseSegmenter(SAMPLE_RATE, 2, ambient_energy=50, preroll_seconds=0.25, pause_seconds=0.5)
+    stream = tone(1.0, 50) + tone(1.0, 5000) + tone(1.0, 50)
+    position = 0
+    phrases = []
+    for chunk in chunks(stream):
+        position += len(chunk)
+        bounds = segmenter.feed(chunk, position)
+        if bounds is not None:
+            phrases.append(bounds)
+
+    assert len(phrases) == 1
+    start, end = phrases[0]
+    # The phrase starts a quarter second (the pre-roll) before the speech and ends once the pause is long enough
+    assert abs(start - (SAMPLE_RATE * 2 - SAMPLE_RATE // 2)) <= CHUNK * 2
+    assert SAMPLE_RATE * 2 * 2.5 <= end <= SAMPLE_RATE * 2 * 2.6
+
+
+class FakeStream:
+    def __init__(self, data: bytes):
+        self._data = data
+        self._offset = 0
+        self.exhausted = threading.Event()
+
+    def read(self, size: int) -> bytes:
+        if self._offset >= len(self._data):
+            self.exhausted.set()
+            threading.Event().wait(0.01)
+            return b"\0\0" * size
+        chunk = self._data[self._offset:self._offset + size * 2]
+        self._offset += size * 2
+        return chunk
+
+
+class FakeMicrophone:
+    SAMPLE_RATE = SAMPLE_RATE
+    SAMPLE_WIDTH = 2
+    CHUNK = CHUNK
+
+    def __init__(self, data: bytes):
+        self.stream = FakeStream(data)
+        self.opened = 0
+
+    def __enter__(self):
+        self.opened += 1
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+def test_audio_capture_cuts_consecutive_phrases_from_one_stream():
+    # "keyword", a short pause and then the command, all from a single open microphone
+    source = FakeMicrophone(tone(1.0, 50) + tone(0.6, 5000) + tone(1.0, 50) + tone(1.5, 4000) + tone(1.0, 50))
+    phrases = []
+    capture = AudioCapture(source, phrases.append, buffer_seconds=10, calibration_seconds=0.5,
+                           segmenter_options={"preroll_seconds": 0.25, "pause_seconds": 0.5})
+    capture.start()
+    assert source.stream.exhausted.wait(timeout=5)
+    capture.stop()
+
+    assert source.opened == 1
+    assert len(phrases) == 2
+    keyword, command = phrases
+    assert keyword.end <= command.start
+    assert 1.2 < command.duration() < 2.4
+    # The command's pre-roll means it starts before the speech itself
+    assert PhraseSegmenter.rms(command.audio.frame_data[:1000]) < 300
+
+
+def test_audio_capture_streams_phrase_audio_while_it_is_captured():
+    source = FakeMicrophone(tone(1.0, 50) + tone(1.5, 4000) + tone(1.0, 50))
+    phrases, streamed = [], []
+    capture = AudioCapture(source, phrases.append, buffer_seconds=10, calibration_seconds=0.5,
+                           segmenter_options={"preroll_seconds": 0.25, "pause_seconds": 0.5},
+                           on_phrase_audio=lambda start, end, audio: streamed.append((start, audio)))
+    capture.start()
+    assert source.stream.exhausted.wait(timeout=5)
+    capture.stop()
+
+    assert len(phrases) == 1
+    assert len(streamed) > 1
+    # Every chunk of the phrase, including the pre-roll, was streamed before the phrase was complete
+    assert {start for start, _ in streamed} == {phrases[0].start}
+    assert b"".join(audio for _, audio in streamed) == phrases[0].audio.frame_data
@@ -0,0 +1,59 @@
+import numpy as np
+import speech_recognition as sr
+from pi_assistant.audio import SpeechGate
+
+SAMPLE_RATE = 16000
+
+
+def to_audio(samples: np.ndarray) -> sr.AudioData:
+    return sr.AudioData(np.clip(samples, -32768, 32767).astype("<i2").tobytes(), SAMPLE_RATE, 2)
+
+
+def background(seconds: float, amplitude: float = 50) -> np.ndarray:
+    return np.random.default_rng(0).normal(0, amplitude, int(SAMPLE_RATE * seconds))
+
+
+def voiced(seconds: float, frequency: float = 180, amplitude: float = 6000) -> np.ndarray:
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    return amplitude * np.sin(2 * np.pi * frequency * t)
+
+
+def test_speech_gate_frame_features():
+    gate = SpeechGate(frame_ms=10)
+    energy, zcr = gate.frame_features(to_audio(voiced(0.1, frequency=400, amplitude=1000)).get_raw_data(), SAMPLE_RATE)
+    assert len(energy) == 10
+    assert np.allclose(energy, 1000 / np.sqrt(2), rtol=0.01)
+    # A 400Hz tone crosses zero 800 times a second, 8 times in a 160 sample frame
+    assert np.allclose(zcr, 8 / 159, atol=1 / 159)
+
+
+def test_speech_gate_passes_voiced_phrase():
+    gate = SpeechGate()
+    phrase = np.concatenate([background(0.5), voiced(1.0), background(0.5)])
+    assert gate.is_speech(to_audio(phrase))
+
+
+def test_speech_gate_rejects_silence_and_broadband_noise():
+    gate = SpeechGate()
+    assert not gate.is_speech(to_audio(background(2.0)))
+    # Loud static is well above the energy threshold but crosses zero far too often to be voiced speech
+    static = np.concatenate([background(0.5), np.random.default_rng(1).normal(0, 6000, SAMPLE_RATE), background(0.5)])
+    assert not gate.is_speech(to_audio(static))
+    assert gate.stats()["rejected"] == 2
+
+
+def test_speech_gate_rejects_short_clicks():
+    gate = SpeechGate(min_speech_frames=8)
+    click = np.concatenate([background(0.5), voiced(0.1), background(0.5)])
+    assert not gate.is_speech(to_audio(click))
+
+
+def test_speech_gate_adapts_to_noise_floor():
+    gate = SpeechGate(min_energy=0)
+    for _ in range(20):
+        gate.is_speech(to_audio(background(1.0, amplitude=2000)))
+    # A quiet voice which would pass in a silent room is now buried in the noise
+    quiet_voice = np.concatenate([background(0.5, amplitude=2000), voiced(1.0, amplitude=2000) +
+                                  background(1.0, amplitude=2000), background(0.5, amplitude=2000)])
+    assert gate.noise_floor > 1000
+    assert not gate.is_speech(to_audio(quiet_voice))
@@ -1,3 +1,4 @@
+import os
 import pytest
 from pi_assistant.config import Configuration
 
@@ -51,4 +52,54 @@ def test_configuration_get_throws_error_on_non_existent_key(test_input, expected
         config = Configuration(environment="prod")
         config.get(test_input)
     except Exception as e:
-        assert "The key part:" in str(e)
\ No newline at end of file
+        assert "The key part:" in str(e)
+
+
+def test_configuration_deep_merges_environment_overlay():
+    config = Configuration(environment="local")
+    # The local overlay only replaces the keywords, the rest of the voice_assistant section comes from application.yml
+    assert config.get("voice_assistant.keywords") == [{'text': 'noomis', 'sensitivity': 0.5}]
+    assert config.get("voice_assistant.reply_on_keyword_detection") is False
+
+
+def test_configuration_get_indexes_every_key_path():
+    config = Configuration(environment="prod")
+    assert config.get("plugins.weather.enabled") is False
+    assert config.get("plugins.weather")["enabled"] is False
+    assert config.get("plugins.weather.location_cache.ttl_seconds") == \
+        config.get("plugins.weather.location_cache")["ttl_seconds"]
+    assert "plugins.weather.enabled" in Configuration.flatten(config._yaml_config)
+
+
+def test_configuration_get_error_does_not_include_config():
+    config = Configuration(environment="prod")
+    with pytest.raises(KeyError) as e:
+        config.get("plugins.weather.missing")
+    assert "The key part: missing from the given key: plugins.weather.missing" in str(e.value)
+    assert "Config =" not in str(e.value)
+
+
+def write_yaml(path, text: str, mtime: float):
+    path.write_text(text)
+    os.utime(str(path), (mtime, mtime))
+
+
+def test_configuration_reloads_changed_files(tmp_path):
+    write_yaml(tmp_path / "application.yml", "wit:\n  intents: ['time']\n", 1000)
+    config = Configuration(environment="test", directory=str(tmp_path))
+    changes = []
+    config.on_change(changes.append)
+    assert config.reload_if_changed() is False
+
+    write_yaml(tmp_path / "application-test.yml", "wit:\n  intents: ['time', 'date']\n", 2000)
+    assert config.reload_if_changed() is True
+    assert config.get("wit.intents") == ['time', 'date']
+    assert changes == [config]
+
+
+def test_configuration_keeps_last_good_config_on_invalid_yaml(tmp_path):
+    write_yaml(tmp_path / "application.yml", "wit:\n  intents: ['time']\n", 1000)
+    config = Configuration(environment="test", directory=str(tmp_path))
+    write_yaml(tmp_path / "application.yml", "wit: [unclosed\n", 2000)
+    assert config.reload_if_changed() is False
+    assert config.get("wit.intents") == ['time']
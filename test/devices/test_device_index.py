@@ -0,0 +1,57 @@
+import pytest
+from pi_assistant.devices import DeviceIndex
+from pi_assistant.profile.Device import Device
+from pi_assistant.profile.profile_store import ProfileStore
+
+
+def device(name: str, plugin: str, device_id: str = None) -> Device:
+    return Device(name=name, bind_to=plugin, metadata={"id": device_id} if device_id else None)
+
+
+@pytest.fixture
+def index():
+    return DeviceIndex({"feit_electric_smart_lights": [device("Kitchen Lamp", "feit", "abc123"),
+                                                       device("Kitchen  Pendant", "feit", "def456"),
+                                                       device("Desk Lamp", "feit", "ghi789")],
+                        "hue_smart_lights": [device("Porch Light", "hue")]})
+
+
+def test_index_finds_devices_by_normalized_name_and_id(index):
+    assert [d.name for d in index.find(" kitchen LAMP ")] == ["Kitchen Lamp"]
+    assert [d.name for d in index.find("kitchen pendant")] == ["Kitchen  Pendant"]
+    assert [d.name for d in index.find("DEF456")] == ["Kitchen  Pendant"]
+    assert index.find("garage") == []
+
+
+def test_index_selects_globs_and_plugins_without_duplicates(index):
+    selected = index.select(["kitchen *", "Kitchen Lamp", "*lamp"], plugin="hue_smart_lights")
+    assert sorted(d.name for d in selected) == ["Desk Lamp", "Kitchen  Pendant", "Kitchen Lamp", "Porch Light"]
+
+
+def test_index_updates_incrementally(index):
+    index.add("feit_electric_smart_lights", device("Kitchen Lamp (renamed)", "feit", "abc123"))
+    index.remove("hue_smart_lights", "porch light")
+
+    assert index.find("kitchen lamp") == []
+    assert [d.name for d in index.find("abc123")] == ["Kitchen Lamp (renamed)"]
+    assert index.find("porch light") == []
+    assert len(index) == 3
+
+
+def test_index_reports_selectors_which_match_nothing(index):
+    with pytest.raises(Exception, match="garage, attic"):
+        index.select(["kitchen lamp", "garage", "attic*"])
+    with pytest.raises(Exception, match="No devices could be found for the plugin"):
+        index.select(plugin="roomba")
+
+
+def test_bulk_link_applies_every_device_in_one_transaction(tmp_path):
+    index = DeviceIndex({"feit": [device(f"Bulb {i}", "feit") for i in range(500)]})
+    store = ProfileStore(str(tmp_path / "profiles.db"), legacy_directories=[])
+    store.create_profile("home")
+    store.create_room("home", "kitchen")
+    store.link_device("home", "kitchen", device("Bulb 0", "feit").to_dict())
+
+    assert store.link_devices("home", "kitchen", [d.to_dict() for d in index.select(["bulb *"])]) == 499
+    assert len(store.load("home").devices_in_room("kitchen")) == 500
+    store.close()
@@ -0,0 +1,44 @@
+import json
+from pi_assistant.devices import DeviceRegistry
+from pi_assistant.profile.Device import Device
+
+
+def bulbs(count: int, brightness: int = 100) -> list:
+    return [Device(name=f"Bulb {i}", bind_to="feit", metadata={"id": f"id{i}", "brightness": brightness})
+            for i in range(count)]
+
+
+def test_registry_persists_only_the_devices_which_changed(tmp_path):
+    registry = DeviceRegistry(str(tmp_path / "devices.db"), legacy_path=None)
+    assert registry.update("feit", bulbs(200)) == 200
+    assert registry.update("feit", bulbs(200)) == 0
+
+    changed = bulbs(199)
+    changed[5] = Device(name="Bulb 5", bind_to="feit", metadata={"id": "id5", "brightness": 10})
+    assert registry.update("feit", changed) == 2
+    assert registry.writes == 202
+    registry.close()
+
+    reopened = DeviceRegistry(str(tmp_path / "devices.db"), legacy_path=None)
+    assert len(reopened.devices["feit"]) == 199
+    assert reopened.index.find("id5")[0].metadata["brightness"] == 10
+    assert reopened.index.find("bulb 199") == []
+    reopened.close()
+
+
+def test_registry_imports_the_legacy_devices_file(tmp_path):
+    legacy = tmp_path / "devices.json"
+    legacy.write_text(json.dumps({"feit": [{"name": "Lamp", "bind_to": "feit", "metadata": {"id": "abc"}}],
+                                  "hue_smart_lights": []}))
+
+    registry = DeviceRegistry(str(tmp_path / "devices.db"), legacy_path=str(legacy))
+    assert registry.index.find("abc") == [Device(name="Lamp", bind_to="feit", metadata={"id": "abc"})]
+    registry.close()
+
+
+def test_devices_do_not_share_metadata():
+    first, second = Device(name="a", bind_to="feit"), Device(name="b", bind_to="feit")
+    first.metadata["id"] = "abc"
+
+    assert second.metadata == {}
+    assert not hasattr(first, "__dict__")
@@ -0,0 +1,126 @@
+import time
+import threading
+from contextlib import ExitStack
+from pi_assistant.devices import DeviceFanOut, TuyaDiscovery
+from pi_assistant.plugins.feit_electric_smart_lights.feit_electric_smart_lights_plugin import \
+    FeitElectricSmartLightsPlugin
+from test.fakes.plugin_package import StaticConfiguration
+from test.fakes.tuya_server import FakeTuyaDevice, write_device_cache
+
+
+class FakeFeitConfig:
+    def __init__(self, cache_path: str, locate=None):
+        # Every cached device answers the startup revalidation so only failed commands trigger discovery
+        self.discovery = TuyaDiscovery(cache_path, probe=lambda device: True, locate=locate or (lambda ids: {}))
+        self.discovery.load()
+
+    @property
+    def devices(self):
+        return self.discovery.devices
+
+
+def build_plugin(devices: list, tmp_path, timeout: float = 1.0, stale: tuple = (),
+                 locate=None) -> FeitElectricSmartLightsPlugin:
+    write_device_cache(tmp_path / "devices.json", devices, stale)
+    config = StaticConfiguration({"devices.fan_out.max_concurrency": 8, "devices.fan_out.timeout_seconds": timeout})
+    plugin = FeitElectricSmartLightsPlugin(config, None)
+    plugin.init(FakeFeitConfig(str(tmp_path / "devices.json"), locate))
+    return plugin
+
+
+def test_fan_out_runs_commands_concurrently_within_the_concurrency_limit():
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def command(device):
+        with lock:
+            running.append(device)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(device)
+        return device
+
+    fan_out = DeviceFanOut(max_concurrency=3, timeout=1)
+    started = time.monotonic()
+    results = fan_out.run({f"bulb {i}": i for i in range(6)}, command)
+
+    assert time.monotonic() - started < 0.25
+    assert max(peak) == 3
+    assert [result.value for result in results] == list(range(6))
+    assert all(result.ok for result in results)
+
+
+def test_fan_out_reports_failed_and_timed_out_devices_without_waiting_on_them():
+    def command(device):
+        if device == "broken":
+            raise ConnectionError("Network Error: Unable to Connect")
+        if device == "stalled":
+            time.sleep(0.5)
+        return device
+
+    fan_out = DeviceFanOut(max_concurrency=4, timeout=0.1)
+    started = time.monotonic()
+    results = {result.name: result for result in fan_out.run({"a": "ok", "b": "broken", "c": "stalled"}, command)}
+
+    assert time.monotonic() - started < 0.3
+    assert results["a"].ok
+    assert results["b"].error == "Network Error: Unable to Connect"
+    assert not results["c"].ok and "Timed out" in results["c"].error
+
+
+def test_feit_plugin_switches_every_bulb_over_persistent_connections(tmp_path):
+    with ExitStack() as stack:
+        devices = [stack.enter_context(FakeTuyaDevice(device_id=f"bulb_{i}")) for i in range(5)]
+        plugin = build_plugin(devices, tmp_path)
+        on = {"light_state:light_state": [{"value": "on"}]}
+        off = {"light_state:light_state": [{"value": "off"}]}
+
+        results = plugin.on_intent_received({"name": "smart_lights"}, on)
+        assert all(result.ok for result in results)
+        assert all(device.is_on for device in devices)
+
+        results = plugin.on_intent_received({"name": "smart_lights"}, off)
+        assert all(result.ok for result in results)
+        assert not any(device.is_on for device in devices)
+        assert [device.connections for device in devices] == [1] * 5
+
+
+def test_feit_plugin_is_not_held_up_by_an_unresponsive_bulb(tmp_path):
+    with ExitStack() as stack:
+        devices = [stack.enter_context(FakeTuyaDevice(device_id=f"bulb_{i}")) for i in range(3)]
+        devices.append(stack.enter_context(FakeTuyaDevice(device_id="stalled", delay=1.0)))
+        plugin = build_plugin(devices, tmp_path, timeout=0.2)
+
+        started = time.monotonic()
+        results = plugin.on_intent_received({"name": "smart_lights"}, {"light_state:light_state": [{"value": "on"}]})
+
+        assert time.monotonic() - started < 0.8
+        assert [result.ok for result in results] == [True, True, True, False]
+        assert all(device.is_on for device in devices[:3])
+
+
+def test_feit_plugin_rediscovers_a_bulb_which_fails_a_command(tmp_path):
+    with ExitStack() as stack:
+        devices = [stack.enter_context(FakeTuyaDevice(device_id=f"bulb_{i}")) for i in range(2)]
+        located = threading.Event()
+
+        def locate(device_ids):
+            located.set()
+            return {device_id: "127.0.0.1" for device_id in device_ids}
+
+        plugin = build_plugin(devices, tmp_path, timeout=0.2, stale=("bulb_1",), locate=locate)
+        on = {"light_state:light_state": [{"value": "on"}]}
+
+        results = plugin.on_intent_received({"name": "smart_lights"}, on)
+        assert [result.ok for result in results] == [True, False]
+        assert located.wait(timeout=5)
+
+        for _ in range(50):
+            if not plugin._lights["bulb_1"].address.endswith(".2"):
+                break
+            time.sleep(0.02)
+        results = plugin.on_intent_received({"name": "smart_lights"}, on)
+        assert [result.ok for result in results] == [True, True]
+        assert all(device.is_on for device in devices)
@@ -0,0 +1,82 @@
+import json
+import threading
+from contextlib import ExitStack
+from pi_assistant.devices import TuyaDiscovery
+from test.fakes.tuya_server import FakeTuyaDevice, STALE_IP, write_device_cache
+
+class FakeLocator:
+    def __init__(self):
+        self.requests = []
+
+    def __call__(self, device_ids: list) -> dict:
+        self.requests.append(list(device_ids))
+        return {device_id: "127.0.0.1" for device_id in device_ids}
+
+
+def test_discovery_loads_the_cache_without_touching_the_network(tmp_path):
+    cache_path = tmp_path / "devices.json"
+    cache_path.write_text(json.dumps({"10.0.0.5": {"name": "Lamp", "key": "k", "gwId": "abc"}}))
+
+    def fail():
+        raise AssertionError("The network should not be scanned")
+
+    discovery = TuyaDiscovery(str(cache_path), scan=fail, locate=fail)
+    assert discovery.load()
+    assert discovery.devices == [{"name": "Lamp", "key": "k", "ip": "10.0.0.5", "id": "abc", "port": 6668}]
+
+
+def test_discovery_scans_in_the_background_when_there_is_no_cache(tmp_path):
+    cache_path = tmp_path / "devices.json"
+    discovery = TuyaDiscovery(str(cache_path), scan=lambda: {"10.0.0.5": {"name": "Lamp", "key": "k", "gwId": "abc"}})
+    changes = []
+    discovery.on_change(changes.append)
+
+    assert not discovery.load()
+    discovery.refresh_in_background().join(timeout=5)
+
+    assert [device["id"] for device in changes[0]] == ["abc"]
+    assert json.loads(cache_path.read_text())["10.0.0.5"]["gwId"] == "abc"
+
+
+def test_discovery_revalidate_only_locates_devices_which_stopped_answering(tmp_path):
+    with ExitStack() as stack:
+        devices = [stack.enter_context(FakeTuyaDevice(device_id=f"bulb_{i}")) for i in range(3)]
+        cache_path = tmp_path / "devices.json"
+        write_device_cache(cache_path, devices, stale=("bulb_1",))
+        locator = FakeLocator()
+        discovery = TuyaDiscovery(str(cache_path), locate=locator, probe_timeout=0.5)
+        changes = []
+        discovery.on_change(changes.append)
+        discovery.load()
+
+        assert discovery.revalidate() == ["bulb_1"]
+        assert locator.requests == [["bulb_1"]]
+        assert len(changes) == 1
+        assert all(device["ip"] == "127.0.0.1" for device in discovery.devices)
+        cached = json.loads(cache_path.read_text())
+        assert sorted(device["gwId"] for device in cached.values()) == ["bulb_0", "bulb_1", "bulb_2"]
+        assert all(device["ip"] == "127.0.0.1" for device in cached.values())
+        assert not any(name.endswith(".tmp") for name in [p.name for p in tmp_path.iterdir()])
+
+
+def test_discovery_rediscovers_a_single_device_once(tmp_path):
+    cache_path = tmp_path / "devices.json"
+    cache_path.write_text(json.dumps({STALE_IP: {"name": "Lamp", "key": "k", "gwId": "abc"}}))
+    release = threading.Event()
+    requests = []
+
+    def locate(device_ids):
+        requests.append(device_ids)
+        release.wait(5)
+        return {"abc": "10.0.0.9"}
+
+    discovery = TuyaDiscovery(str(cache_path), locate=locate)
+    discovery.load()
+    thread = discovery.rediscover("abc")
+    assert discovery.rediscover("abc") is None
+    assert discovery.rediscover("unknown") is None
+    release.set()
+    thread.join(timeout=5)
+
+    assert requests == [["abc"]]
+    assert discovery.devices[0]["ip"] == "10.0.0.9"
@@ -0,0 +1,90 @@
+import os
+import sys
+import itertools
+
+PLUGIN_SOURCE = '''{imports}
+from pi_assistant.plugins.plugin import Plugin
+
+
+class {class_name}Plugin(Plugin):
+    def enabled(self) -> bool:
+        return bool(self._app_config.get("plugins.{name}.enabled"))
+
+    def bind_to(self) -> str:
+        return "{intent}"
+
+    def init(self, config=None) -> None:
+        self.config = config
+        {init}
+
+    def on_intent_received(self, intent: dict, entities: dict) -> None:
+        pass
+
+    def on_plugin_end(self) -> None:
+        pass
+'''
+
+CONFIG_SOURCE = '''from pi_assistant.plugins.plugin_configuration import PluginConfiguration
+
+
+class {class_name}Config(PluginConfiguration):
+    pass
+'''
+
+_packages = itertools.count()
+
+
+class StaticConfiguration:
+    """
+    Minimal stand in for Configuration backed by a dictionary of dotted keys.
+    """
+    def __init__(self, values: dict):
+        self._values = values
+
+    def get(self, key: str):
+        return self._values[key]
+
+
+class FakePluginPackage:
+    """
+    A throwaway plugins package written to a directory and importable for the lifetime of the context manager.
+    """
+
+    def __init__(self, directory: str):
+        self.package = f"fake_plugins_{os.getpid()}_{next(_packages)}"
+        self._directory = str(directory)
+        self.path = os.path.join(self._directory, self.package)
+        os.makedirs(self.path)
+        open(os.path.join(self.path, "__init__.py"), "w").close()
+
+    def add(self, name: str, intent: str, imports: str = "", init: str = "pass", config: bool = False) -> None:
+        """
+        Writes a plugin to the package.
+        :param name: String the plugin (module) name
+        :param intent: String the intent the plugin binds to
+        :param imports: String module level source prepended to the plugin i.e an import which fails
+        :param init: String a single line of source run by the plugin's init method
+        :param config: True if the plugin has a configuration class
+        :return: None
+        """
+        class_name = "".join(part.capitalize() for part in name.split("_"))
+        os.makedirs(os.path.join(self.path, name))
+        open(os.path.join(self.path, name, "__init__.py"), "w").close()
+        with open(os.path.join(self.path, name, f"{name}_plugin.py"), "w") as file:
+            file.write(PLUGIN_SOURCE.format(imports=imports, class_name=class_name, name=name, intent=intent,
+                                            init=init))
+        if config:
+            with open(os.path.join(self.path, name, f"{name}_config.py"), "w") as file:
+                file.write(CONFIG_SOURCE.format(class_name=class_name))
+
+    def imported(self, name: str) -> bool:
+        return f"{self.package}.{name}.{name}_plugin" in sys.modules
+
+    def __enter__(self):
+        sys.path.insert(0, self._directory)
+        return self
+
+    def __exit__(self, *args):
+        sys.path.remove(self._directory)
+        for module in [m for m in sys.modules if m == self.package or m.startswith(self.package + ".")]:
+            del sys.modules[module]
@@ -0,0 +1,58 @@
+import speech_recognition as sr
+from typing import Callable
+from pi_assistant.stt import SttBackend, SttStream
+
+
+class FakeSttStream(SttStream):
+    def __init__(self, backend, on_partial: Callable[[str], None] = None):
+        super().__init__(on_partial)
+        self._backend = backend
+        self._text = ""
+
+    def feed(self, chunk: bytes) -> None:
+        self._text += chunk.decode("utf-8")
+        self._emit_partial(self._text)
+
+    def close(self) -> None:
+        self._backend.closed.append(self._text.strip())
+
+    def finish(self) -> str:
+        self._backend.finished.append(self._text)
+        return self._backend.transcribe(sr.AudioData(self._text.encode("utf-8"), 16000, 2))
+
+
+class FakeSttBackend(SttBackend):
+    """
+    Local stand in for a speech to text engine. The "audio" is UTF-8 text which is returned as the transcript, streams
+    report everything fed so far as the partial transcript.
+    """
+
+    def __init__(self, name: str = "fake", streaming: bool = True, reachable: bool = True):
+        self._name = name
+        self._streaming = streaming
+        self.reachable = reachable
+        self.transcribed = []
+        self.finished = []
+        self.closed = []
+
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def streaming(self) -> bool:
+        return self._streaming
+
+    def transcribe(self, audio: sr.AudioData) -> str:
+        if not self.reachable:
+            raise sr.RequestError(f"{self._name} is unreachable")
+        text = audio.frame_data.decode("utf-8").strip()
+        self.transcribed.append(text)
+        if len(text) == 0:
+            raise sr.UnknownValueError()
+        return text
+
+    def open_stream(self, sample_rate: int, sample_width: int,
+                    on_partial: Callable[[str], None] = None) -> SttStream:
+        if not self._streaming:
+            return super().open_stream(sample_rate, sample_width, on_partial)
+        return FakeSttStream(self, on_partial)
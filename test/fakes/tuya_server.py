@@ -0,0 +1,106 @@
+import json
+import time
+import struct
+import threading
+import tinytuya
+from socketserver import ThreadingTCPServer, BaseRequestHandler
+
+HEADER_SIZE = 16  # prefix, sequence number, command and length
+STALE_IP = "127.0.0.2"  # Nothing listens here, the fake devices only bind 127.0.0.1
+
+
+class FakeTuyaHandler(BaseRequestHandler):
+    """
+    Speaks just enough of the Tuya 3.3 local protocol for tinytuya to query and switch a bulb.
+    """
+
+    def setup(self):
+        with self.server.lock:
+            self.server.connections += 1
+
+    def handle(self):
+        cipher = tinytuya.AESCipher(self.server.key.encode("latin1"))
+        while True:
+            header = self.__read(HEADER_SIZE)
+            if header is None:
+                return
+            _, seqno, cmd, length = struct.unpack(">4I", header)
+            body = self.__read(length)
+            if body is None:
+                return
+
+            payload = body[:-8]  # CRC and suffix
+            if payload.startswith(b"3.3"):
+                payload = payload[15:]  # Version header
+            request = json.loads(cipher.decrypt(payload, False)) if payload else {}
+
+            with self.server.lock:
+                self.server.commands.append((cmd, request.get("dps", {})))
+                self.server.dps.update(request.get("dps", {}))
+                dps = dict(self.server.dps)
+
+            if self.server.delay > 0:
+                time.sleep(self.server.delay)
+            response = cipher.encrypt(json.dumps({"devId": self.server.device_id, "dps": dps}).encode(), False)
+            self.request.sendall(tinytuya.pack_message(tinytuya.TuyaMessage(
+                seqno, cmd, 0, struct.pack(">I", 0) + response, 0, True, tinytuya.PREFIX_55AA_VALUE, False)))
+
+    def __read(self, size: int):
+        data = b""
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+
+class FakeTuyaDevice(ThreadingTCPServer):
+    """
+    A local stand in for a Tuya (Feit) bulb. Each device listens on its own port on 127.0.0.1 so a bulb is created with
+    tinytuya.BulbDevice(device.device_id, "127.0.0.1", device.key, port=device.port, version=3.3).
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, device_id: str = "fake_bulb", key: str = "0123456789abcdef", delay: float = 0.0):
+        super().__init__(("127.0.0.1", 0), FakeTuyaHandler)
+        self.device_id = device_id
+        self.key = key
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.commands = []
+        self.dps = {"20": False, "21": "white", "22": 1000, "23": 1000}
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    @property
+    def is_on(self) -> bool:
+        return bool(self.dps.get("20"))
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+def write_device_cache(path, devices: list, stale: tuple = ()) -> None:
+    """
+    Writes a tinytuya.deviceScan() style cache of fake devices. Devices in stale are cached with an address nothing
+    listens on as if they were given a new address by the router.
+    """
+    cache = {}
+    for device in devices:
+        ip = STALE_IP if device.device_id in stale else "127.0.0.1"
+        cache[f"{ip}:{device.port}"] = {"name": device.device_id, "key": device.key, "gwId": device.device_id,
+                                        "version": "3.3", "ip": ip, "port": device.port}
+    with open(path, "w") as file:
+        file.write(json.dumps(cache))
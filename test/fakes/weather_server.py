@@ -0,0 +1,74 @@
+import json
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class FakeWeatherHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # Headers and body are written separately, Nagle would delay the body
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        with self.server.lock:
+            self.server.requests.append((url.path, parse_qs(url.query)))
+            fail = self.server.failures > 0
+            if fail:
+                self.server.failures -= 1
+
+        if fail:
+            self.__respond(503, {"error": "Service unavailable"})
+        elif url.path == "/json":
+            self.__respond(200, {"ip": "127.0.0.1", "city": self.server.city, "region": self.server.region})
+        elif url.path == "/data/2.5/weather":
+            self.__respond(200, {"weather": [{"main": self.server.forecast}],
+                                 "main": {"temp": self.server.temperature, "feels_like": self.server.temperature - 2}})
+        else:
+            self.__respond(404, {"error": "Not found"})
+
+    def __respond(self, status: int, body: dict):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeWeatherServer(ThreadingHTTPServer):
+    """
+    A local stand in for both ipinfo (/json) and the OpenWeatherMap current weather endpoint (/data/2.5/weather). The
+    reported weather can be changed while the server runs and it can be told to fail a number of requests.
+    """
+    daemon_threads = True
+
+    def __init__(self, city: str = "Boston", region: str = "Massachusetts", forecast: str = "Clouds",
+                 temperature: float = 50.0, failures: int = 0):
+        super().__init__(("127.0.0.1", 0), FakeWeatherHandler)
+        self.city = city
+        self.region = region
+        self.forecast = forecast
+        self.temperature = temperature
+        self.failures = failures
+        self.requests = []
+        self.lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def requests_to(self, path: str) -> int:
+        with self.lock:
+            return sum(1 for request_path, _ in self.requests if request_path == path)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,82 @@
+import json
+import time
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class FakeWitHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive so connection pooling can be observed
+    disable_nagle_algorithm = True  # Headers and body are written separately, Nagle would delay the body
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        with self.server.lock:
+            self.server.requests.append({"path": url.path, "query": query,
+                                         "authorization": self.headers.get("Authorization")})
+            fail = self.server.failures > 0
+            if fail:
+                self.server.failures -= 1
+
+        if self.server.delay:
+            time.sleep(self.server.delay)
+
+        if fail:
+            self.__respond(503, {"error": "Service unavailable"})
+            return
+
+        text = query.get("q", [""])[0]
+        self.__respond(200, self.server.responses.get(text, {"text": text, "intents": [], "entities": {},
+                                                             "traits": {}}))
+
+    def __respond(self, status: int, body: dict):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeWitServer(ThreadingHTTPServer):
+    """
+    A local stand in for the Wit.ai /message endpoint. Responses are looked up by the utterance text, the server can be
+    told to respond slowly or to fail a number of requests and it counts the TCP connections it accepts.
+    """
+    daemon_threads = True
+
+    def __init__(self, responses: dict = None, delay: float = 0.0, failures: int = 0):
+        super().__init__(("127.0.0.1", 0), FakeWitHandler)
+        self.responses = responses or {}
+        self.delay = delay
+        self.failures = failures
+        self.connections = 0
+        self.requests = []
+        self.lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
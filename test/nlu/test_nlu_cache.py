@@ -0,0 +1,87 @@
+import os
+import time
+from unittest import mock
+from pi_assistant.nlu import NluCache
+
+RESPONSE = {
+    'text': 'turn on the lights',
+    'intents': [{'id': '1', 'name': 'smart_lights', 'confidence': 0.99}],
+    'entities': {'light_state:light_state': [{'value': 'on'}]},
+    'traits': {}
+}
+
+
+def build_cache(tmp_path, **kwargs) -> NluCache:
+    options = {"ttl": 60, "max_entries": 10, "fingerprint": "v1", "filler_words": ["please", "um"]}
+    options.update(kwargs)
+    return NluCache(os.path.join(str(tmp_path), "nlu.json"), **options)
+
+
+def test_nlu_cache_normalizes_utterances(tmp_path):
+    cache = build_cache(tmp_path)
+    assert cache.normalize("Um, turn ON the lights please!") == "turn on the lights"
+    assert cache.normalize("what's the weather?") == "what's the weather"
+
+
+def test_nlu_cache_returns_copy_of_cached_response(tmp_path):
+    cache = build_cache(tmp_path)
+    assert cache.get("turn on the lights") is None
+
+    cache.put("Turn on the lights.", RESPONSE)
+    cached = cache.get("please turn on the lights")
+    assert cached == RESPONSE
+    cached['intents'].clear()
+    assert cache.get("turn on the lights") == RESPONSE
+    assert cache.stats() == {"hits": 2, "misses": 1, "hit_rate": 2 / 3, "entries": 1}
+
+
+def test_nlu_cache_does_not_cache_responses_without_intents(tmp_path):
+    cache = build_cache(tmp_path)
+    cache.put("blah blah", {'text': 'blah blah', 'intents': [], 'entities': {}})
+    assert cache.get("blah blah") is None
+
+
+def test_nlu_cache_expires_entries(tmp_path):
+    cache = build_cache(tmp_path, ttl=10)
+    cache.put("turn on the lights", RESPONSE)
+    with mock.patch("pi_assistant.nlu.nlu_cache.time.time", return_value=time.time() + 11):
+        assert cache.get("turn on the lights") is None
+
+
+def test_nlu_cache_evicts_least_recently_used(tmp_path):
+    cache = build_cache(tmp_path, max_entries=2)
+    cache.put("one", RESPONSE)
+    cache.put("two", RESPONSE)
+    cache.get("one")
+    cache.put("three", RESPONSE)
+    assert cache.get("two") is None
+    assert cache.get("one") is not None
+    assert cache.get("three") is not None
+
+
+def test_nlu_cache_persists_across_restarts(tmp_path):
+    build_cache(tmp_path).put("turn on the lights", RESPONSE)
+    assert build_cache(tmp_path).get("turn on the lights") == RESPONSE
+
+
+def test_nlu_cache_discarded_when_intents_change(tmp_path):
+    build_cache(tmp_path, fingerprint=NluCache.fingerprint_of(["time"])).put("turn on the lights", RESPONSE)
+    cache = build_cache(tmp_path, fingerprint=NluCache.fingerprint_of(["time", "smart_lights"]))
+    assert cache.get("turn on the lights") is None
+
+
+def test_nlu_cache_invalidate(tmp_path):
+    cache = build_cache(tmp_path)
+    cache.put("turn on the lights", RESPONSE)
+    cache.invalidate()
+    assert cache.get("turn on the lights") is None
+    assert build_cache(tmp_path).get("turn on the lights") is None
+
+
+def test_nlu_cache_set_fingerprint_invalidates_on_change(tmp_path):
+    cache = build_cache(tmp_path)
+    cache.put("turn on the lights", RESPONSE)
+    cache.set_fingerprint("v1")
+    assert cache.get("turn on the lights") == RESPONSE
+    cache.set_fingerprint("v2")
+    assert cache.get("turn on the lights") is None
@@ -0,0 +1,57 @@
+import time
+import pytest
+import requests
+from pi_assistant.nlu import WitClient
+from test.fakes.wit_server import FakeWitServer
+
+RESPONSE = {'text': 'what time is it', 'intents': [{'id': '1', 'name': 'time', 'confidence': 0.99}],
+            'entities': {}, 'traits': {}}
+
+
+def build_client(server: FakeWitServer, **kwargs) -> WitClient:
+    options = {"connect_timeout": 1, "read_timeout": 1, "retries": 2, "backoff": 0.01}
+    options.update(kwargs)
+    return WitClient("token", base_url=server.url, **options)
+
+
+def test_wit_client_sends_message():
+    with FakeWitServer(responses={"what time is it": RESPONSE}) as server:
+        client = build_client(server)
+        assert client.message("what time is it") == RESPONSE
+        request = server.requests[0]
+        assert request["path"] == "/message"
+        assert request["query"]["q"] == ["what time is it"]
+        assert request["authorization"] == "Bearer token"
+
+
+def test_wit_client_reuses_pooled_connection():
+    with FakeWitServer(responses={"what time is it": RESPONSE}) as server:
+        client = build_client(server)
+        client.connect()
+        for _ in range(5):
+            client.message("what time is it")
+        assert len(server.requests) == 5
+        assert server.connections == 1
+
+
+def test_wit_client_retries_transient_failures():
+    with FakeWitServer(responses={"what time is it": RESPONSE}, failures=2) as server:
+        assert build_client(server).message("what time is it") == RESPONSE
+        assert len(server.requests) == 3
+
+
+def test_wit_client_gives_up_after_retries():
+    with FakeWitServer(failures=5) as server:
+        with pytest.raises(Exception) as e:
+            build_client(server, retries=1).message("what time is it")
+        assert "503" in str(e.value)
+        assert len(server.requests) == 2
+
+
+def test_wit_client_read_timeout():
+    with FakeWitServer(delay=0.5) as server:
+        client = build_client(server, read_timeout=0.1, retries=1)
+        start = time.monotonic()
+        with pytest.raises(requests.exceptions.Timeout):
+            client.message("what time is it")
+        assert time.monotonic() - start < 0.5 * 2
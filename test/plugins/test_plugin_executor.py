@@ -0,0 +1,99 @@
+import time
+import threading
+import contextvars
+from pi_assistant.plugins.plugin_executor import PluginExecutor, PluginCancelled, current_token
+
+
+def test_plugin_executor_returns_the_value():
+    executor = PluginExecutor(workers=2)
+    assert executor.run("fast", lambda: "done", timeout=1) == (True, "done")
+    executor.close()
+
+
+def test_plugin_executor_contains_plugin_exceptions():
+    def broken():
+        raise Exception("boom")
+
+    executor = PluginExecutor(workers=2)
+    assert executor.run("broken", broken, timeout=1) == (False, "boom")
+    assert executor.run("fast", lambda: 1, timeout=1) == (True, 1)
+    executor.close()
+
+
+def test_plugin_executor_cancels_invocations_past_their_deadline():
+    tokens = []
+
+    def hung():
+        tokens.append(current_token())
+        current_token().wait(5)
+        current_token().raise_if_cancelled()
+
+    executor = PluginExecutor(workers=2)
+    start = time.perf_counter()
+    ok, error = executor.run("hung", hung, timeout=0.1)
+    assert time.perf_counter() - start < 1
+    assert not ok and error == "Timed out after 0.1 seconds"
+    assert tokens[0].cancelled
+    executor.close()
+
+
+def test_plugin_executor_cancel_all_wakes_running_invocations():
+    started = threading.Event()
+    callbacks = []
+
+    def hung():
+        current_token().on_cancel(lambda: callbacks.append("closed"))
+        started.set()
+        current_token().wait(5)
+        current_token().raise_if_cancelled()
+
+    executor = PluginExecutor(workers=2)
+    results = []
+    caller = threading.Thread(target=lambda: results.append(executor.run("hung", hung, timeout=10)))
+    caller.start()
+    assert started.wait(1)
+    assert executor.in_flight == 1
+
+    assert executor.cancel_all() == 1
+    caller.join(1)
+    assert results == [(False, "Cancelled")]
+    assert callbacks == ["closed"]
+    assert executor.in_flight == 0
+    executor.close()
+
+
+def test_plugin_executor_carries_the_callers_context():
+    request = contextvars.ContextVar("request", default=None)
+    request.set("abc")
+    executor = PluginExecutor(workers=1)
+    assert executor.run("context", request.get, timeout=1) == (True, "abc")
+    assert not current_token().cancelled
+    try:
+        current_token().raise_if_cancelled()
+    except PluginCancelled:
+        assert False
+    executor.close()
+
+
+def test_plugin_executor_replaces_workers_stuck_in_a_hung_plugin():
+    release = threading.Event()
+
+    def hung():
+        release.wait(5)  # i.e. a socket read without a timeout which ignores cancellation
+
+    executor = PluginExecutor(workers=2, max_in_flight_per_plugin=2)
+    try:
+        results = [executor.run("hung", hung, timeout=0.05) for _ in range(4)]
+        assert results[:2] == [(False, "Timed out after 0.05 seconds")] * 2
+        assert results[2:] == [(False, "2 earlier invocations of the plugin are still running")] * 2
+
+        # Both of the original workers are stuck but the other plugins still run
+        assert executor.run_all([("time", lambda: 1, 1), ("date", lambda: 2, 1)]) == [(True, 1), (True, 2)]
+    finally:
+        release.set()
+
+    deadline = time.monotonic() + 1
+    while executor.in_flight > 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert executor.run("hung", lambda: "recovered", timeout=1) == (True, "recovered")
+    executor.close()
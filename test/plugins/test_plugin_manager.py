@@ -1,7 +1,14 @@
+import time
+import pytest
+import threading
 from unittest import mock
-from pi_assistant.plugins.plugin_manager import PluginManager
+from pi_assistant.plugins.plugin_manager import PluginManager, PluginState
+from pi_assistant import util
+from pi_assistant.plugins.plugin_executor import current_token
 from pi_assistant.plugins.date_handler.date_handler_plugin import DateHandlerPlugin
 from pi_assistant.plugins.temporal_handler.temporal_handler_plugin import TemporalHandlerPlugin
+from pi_assistant.profile.Device import Device
+from test.fakes.plugin_package import FakePluginPackage, StaticConfiguration
 
 
 def test_plugin_manager_loads_plugins_success():
@@ -50,11 +57,23 @@ def test_plugin_manager_gets_bound_plugin_for_intent(mocked_init, mock_feit):
     plugin_manger.init_plugins()
     assert len(plugin_manger._initialized_plugins) == len(plugin_manger.plugins) - 2
 
-    time_plugin = plugin_manger.get_bound_plugin_for("time")
-    date_plugin = plugin_manger.get_bound_plugin_for("date")
+    time_plugins = plugin_manger.get_bound_plugin_for("time")
+    date_plugins = plugin_manger.get_bound_plugin_for("date")
 
-    assert type(time_plugin) == TemporalHandlerPlugin
-    assert type(date_plugin) == DateHandlerPlugin
+    assert [type(p) for p in time_plugins] == [TemporalHandlerPlugin]
+    assert [type(p) for p in date_plugins] == [DateHandlerPlugin]
+
+
+@mock.patch('pi_assistant.plugins.weather.weather_plugin.WeatherPlugin.init', side_effect=lambda config: config)
+@mock.patch('pi_assistant.plugins.feit_electric_smart_lights.feit_electric_smart_lights_plugin.FeitElectricSmartLightsPlugin.enabled', side_effect=lambda: False)
+def test_plugin_manager_dispatch_table_is_rebuilt_on_init(mocked_init, mock_feit):
+    plugin_manger = PluginManager()
+    assert plugin_manger.get_bound_plugin_for("time") == ()
+
+    plugin_manger.init_plugins()
+    assert len(plugin_manger.get_bound_plugin_for("TIME")) == 1
+    with pytest.raises(TypeError):
+        plugin_manger._dispatch_table["time"] = ()
 
 
 def test_plugin_manager_gets_bound_plugin_for_throws_error_invalid_intent():
@@ -67,7 +86,7 @@ def test_plugin_manager_gets_bound_plugin_for_throws_error_invalid_intent():
 
 
 # Must mock the assistant reply function so that it doesn't inadvertently speak a reply during tests
-@mock.patch('pi_assistant.main.assistant_reply', side_effect=lambda text: text)
+@mock.patch('pi_assistant.plugins.temporal_handler.temporal_handler_plugin.assistant_reply', side_effect=lambda text: text)
 @mock.patch('pi_assistant.plugins.weather.weather_plugin.WeatherPlugin.init', side_effect=lambda config: config)
 @mock.patch('pi_assistant.plugins.feit_electric_smart_lights.feit_electric_smart_lights_plugin.FeitElectricSmartLightsPlugin.enabled', side_effect=lambda: False)
 def test_plugin_manager_handle_intent_success(side_effect, assistant_reply, mock_feit):
@@ -76,15 +95,148 @@ def test_plugin_manager_handle_intent_success(side_effect, assistant_reply, mock
 
     intents = {
         'intents': [
-            # It will execute the time intent because it has the highest confidence
+            # It will only execute the time intent because the date intent is below the secondary intent confidence
             {'id': '5013819665334140', 'name': 'time', 'confidence': 0.9933},
-            {'id': '5013819665334140', 'name': 'date', 'confidence': 0.9831}
+            {'id': '5013819665334140', 'name': 'date', 'confidence': 0.6131}
         ],
         'entities': []
     }
 
-    plugin = plugin_manger.handle_intent(intents)
-    assert type(plugin) == TemporalHandlerPlugin
+    plugins = plugin_manger.handle_intent(intents)
+    assert [type(p) for p in plugins] == [TemporalHandlerPlugin]
+
+
+@mock.patch('pi_assistant.plugins.weather.weather_plugin.WeatherPlugin.init', side_effect=lambda config: config)
+@mock.patch('pi_assistant.plugins.feit_electric_smart_lights.feit_electric_smart_lights_plugin.FeitElectricSmartLightsPlugin.enabled', side_effect=lambda: False)
+def test_plugin_manager_handle_intent_runs_every_bound_plugin(side_effect, mock_feit):
+    plugin_manger = PluginManager()
+    plugin_manger.init_plugins()
+    first, second = mock.MagicMock(), mock.MagicMock()
+    first.bind_to.return_value = second.bind_to.return_value = "smart_lights"
+    plugin_manger._initialized_plugins = [first, second]
+    plugin_manger.rebuild_dispatch_table()
+
+    intents = {
+        'intents': [{'id': '5013819665334140', 'name': 'smart_lights', 'confidence': 0.9933}],
+        'entities': {}
+    }
+
+    assert plugin_manger.handle_intent(intents) == [first, second]
+    first.on_intent_received.assert_called_once_with(intents['intents'][0], {})
+    second.on_intent_received.assert_called_once_with(intents['intents'][0], {})
+
+
+@mock.patch('pi_assistant.plugins.plugin_manager.assistant_reply')
+@mock.patch('pi_assistant.plugins.weather.weather_plugin.WeatherPlugin.init', side_effect=lambda config: config)
+@mock.patch('pi_assistant.plugins.feit_electric_smart_lights.feit_electric_smart_lights_plugin.FeitElectricSmartLightsPlugin.enabled', side_effect=lambda: False)
+def test_plugin_manager_handle_intent_merges_replies_of_secondary_intents(mock_feit, mocked_init, assistant_reply):
+    plugin_manger = PluginManager()
+    plugin_manger.init_plugins()
+    intents = {
+        'intents': [
+            {'id': '1', 'name': 'time', 'confidence': 0.9933},
+            {'id': '2', 'name': 'date', 'confidence': 0.9831},
+            {'id': '3', 'name': 'wit$cancel', 'confidence': 0.9122},
+            {'id': '4', 'name': 'not_a_real_wit_intent', 'confidence': 0.9011}
+        ],
+        'entities': {}
+    }
+
+    plugins = plugin_manger.handle_intent(intents)
+    assert [type(p) for p in plugins] == [TemporalHandlerPlugin, DateHandlerPlugin]
+    assistant_reply.assert_called_once()
+    reply = assistant_reply.call_args[0][0]
+    assert reply.startswith("The current time is ") and "The current date_helper is " in reply
+
+
+@mock.patch('pi_assistant.plugins.plugin_manager.assistant_reply')
+def test_plugin_manager_handle_intent_runs_bound_plugins_concurrently(assistant_reply):
+    plugin_manger = PluginManager()
+    lights = []
+    for name in ["hue_smart_lights", "feit_electric_smart_lights"]:
+        plugin = mock.MagicMock()
+        plugin.name.return_value = name
+        plugin.bind_to.return_value = "smart_lights"
+        plugin.timeout.return_value = None
+        plugin.on_intent_received.side_effect = lambda intent, entities, n=name: (time.sleep(0.3), util.assistant_reply(
+            f"Turned on the {n} lights."))
+        lights.append(plugin)
+    plugin_manger._initialized_plugins = lights
+    plugin_manger.rebuild_dispatch_table()
+
+    start = time.perf_counter()
+    handled = plugin_manger.handle_intent({'intents': [{'name': 'smart_lights', 'confidence': 0.99}], 'entities': {}})
+    assert time.perf_counter() - start < 0.5
+    assert handled == lights
+    assistant_reply.assert_called_once_with("Turned on the hue_smart_lights lights. "
+                                            "Turned on the feit_electric_smart_lights lights.")
+
+
+def test_plugin_manager_warm_up_prepares_bound_plugins_without_handling_the_intent():
+    plugin_manger = PluginManager()
+    light = mock.MagicMock()
+    light.name.return_value = "lights"
+    light.bind_to.return_value = "smart_lights"
+    light.timeout.return_value = None
+    plugin_manger._initialized_plugins = [light]
+    plugin_manger.rebuild_dispatch_table()
+
+    intents = {'intents': [{'name': 'smart_lights', 'confidence': 0.99}], 'entities': {}}
+    assert plugin_manger.warm_up(intents) == 1
+    light.warm_up.assert_called_once_with(intents['intents'][0], {})
+    light.on_intent_received.assert_not_called()
+    assert plugin_manger.warm_up({'intents': [{'name': 'not_a_real_wit_intent', 'confidence': 0.99}],
+                                  'entities': {}}) == 0
+
+
+def build_hung_plugin(name: str, timeout: float, started: threading.Event = None) -> mock.MagicMock:
+    plugin = mock.MagicMock()
+    plugin.name.return_value = name
+    plugin.bind_to.return_value = "smart_lights"
+    plugin.timeout.return_value = timeout
+
+    def hang(intent, entities):
+        if started is not None:
+            started.set()
+        token = current_token()
+        token.wait(5)
+        token.raise_if_cancelled()
+
+    plugin.on_intent_received.side_effect = hang
+    return plugin
+
+
+def test_plugin_manager_handle_intent_isolates_hung_plugins():
+    plugin_manger = PluginManager()
+    hung, working = build_hung_plugin("hung", 0.1), mock.MagicMock()
+    working.bind_to.return_value = "smart_lights"
+    working.timeout.return_value = None
+    plugin_manger._initialized_plugins = [hung, working]
+    plugin_manger.rebuild_dispatch_table()
+
+    start = time.perf_counter()
+    handled = plugin_manger.handle_intent({'intents': [{'name': 'smart_lights', 'confidence': 0.99}], 'entities': {}})
+    assert time.perf_counter() - start < 1
+    assert handled == [working]
+    working.on_intent_received.assert_called_once()
+
+
+def test_plugin_manager_cancel_intent_cancels_running_plugins():
+    plugin_manger = PluginManager()
+    started = threading.Event()
+    plugin_manger._initialized_plugins = [build_hung_plugin("hung", 10, started)]
+    plugin_manger.rebuild_dispatch_table()
+
+    results = []
+    caller = threading.Thread(target=lambda: results.append(plugin_manger.handle_intent(
+        {'intents': [{'name': 'smart_lights', 'confidence': 0.99}], 'entities': {}})))
+    caller.start()
+    assert started.wait(1)
+
+    assert plugin_manger.preempt({'intents': [{'name': 'time', 'confidence': 0.99}], 'entities': {}}) == 0
+    assert plugin_manger.preempt({'intents': [{'name': 'wit$cancel', 'confidence': 0.99}], 'entities': {}}) == 1
+    caller.join(1)
+    assert results == [[]]
 
 
 @mock.patch('pi_assistant.plugins.weather.weather_plugin.WeatherPlugin.init', side_effect=lambda config: config)
@@ -102,3 +254,86 @@ def test_plugin_manager_handle_intent_no_intents_error(side_effect, mock_feit):
     except Exception as e:
         assert "Uncategorizable utterance did not match any intents." in str(e)
 
+
+def build_fake_plugin_manager(package: FakePluginPackage, tmp_path, values: dict) -> PluginManager:
+    config = StaticConfiguration({"wit.intents": ["fast", "slow", "broken"], **values})
+    return PluginManager(config=config, plugins_path=package.path, plugins_package=package.package,
+                         manifest_path=str(tmp_path / "manifest.json"))
+
+
+def test_plugin_manager_init_isolates_failed_and_slow_plugins(tmp_path):
+    with FakePluginPackage(tmp_path) as package:
+        package.add("fast", "fast")
+        package.add("slow", "slow", imports="import time", init="time.sleep(0.6)")
+        package.add("broken", "broken", init="raise ValueError('no network')")
+        plugin_manager = build_fake_plugin_manager(package, tmp_path, {
+            "plugins.fast.enabled": True,
+            "plugins.slow.enabled": True,
+            "plugins.slow.init_timeout_seconds": 0.1,
+            "plugins.broken.enabled": True,
+        })
+
+        started = time.monotonic()
+        plugin_manager.init_plugins()
+
+        assert time.monotonic() - started < 0.5
+        assert plugin_manager.states == {"fast": PluginState.READY, "slow": PluginState.FAILED,
+                                         "broken": PluginState.FAILED}
+        assert [p.name() for p in plugin_manager.get_bound_plugin_for("fast")] == ["fast"]
+        assert plugin_manager.get_bound_plugin_for("slow") == ()
+
+        # The slow plugin is still running, let it finish so it doesn't outlive the test
+        time.sleep(max(0.0, 0.7 - (time.monotonic() - started)))
+        assert plugin_manager.get_bound_plugin_for("slow") == ()
+
+
+def test_plugin_manager_init_finishes_non_core_plugins_in_the_background(tmp_path):
+    with FakePluginPackage(tmp_path) as package:
+        package.add("fast", "fast")
+        package.add("slow", "slow", imports="import time", init="time.sleep(0.3)")
+        plugin_manager = build_fake_plugin_manager(package, tmp_path, {
+            "plugins.fast.enabled": True,
+            "plugins.fast.core": True,
+            "plugins.slow.enabled": True,
+        })
+
+        plugin_manager.init_plugins(wait_for_all=False)
+
+        assert plugin_manager.states == {"fast": PluginState.READY, "slow": PluginState.INITIALIZING}
+        assert plugin_manager.get_bound_plugin_for("slow") == ()
+        assert plugin_manager.wait_until_initialized(timeout=5)
+        assert plugin_manager.states["slow"] == PluginState.READY
+        assert [p.name() for p in plugin_manager.get_bound_plugin_for("slow")] == ["slow"]
+
+
+@mock.patch("pi_assistant.plugins.plugin_manager.logger")
+def test_plugin_manager_warns_when_the_plugins_for_an_intent_are_still_initializing(mock_logger, tmp_path):
+    with FakePluginPackage(tmp_path) as package:
+        package.add("slow", "Slow", imports="import time", init="time.sleep(0.3)")
+        plugin_manager = build_fake_plugin_manager(package, tmp_path, {"plugins.slow.enabled": True})
+
+        plugin_manager.init_plugins(wait_for_all=False)
+
+        assert plugin_manager.handle_intent({'intents': [{'name': 'slow', 'confidence': 0.99}], 'entities': {}}) == []
+        mock_logger.warning.assert_called_with("The plugins: ['slow'] bound to the intent: slow are still "
+                                               "initializing")
+        assert plugin_manager.wait_until_initialized(timeout=5)
+
+
+def test_plugin_manager_updates_the_registry_when_a_plugin_reports_new_devices(tmp_path):
+    with FakePluginPackage(tmp_path) as package:
+        package.add("bulbs", "fast", config=True, init="self.found = []; self.get_devices = lambda: list(self.found)")
+        registry = mock.MagicMock()
+        config = StaticConfiguration({"wit.intents": ["fast"], "plugins.bulbs.enabled": True,
+                                      "plugins.bulbs.physical_device": True})
+        plugin_manager = PluginManager(config=config, plugins_path=package.path, plugins_package=package.package,
+                                       manifest_path=str(tmp_path / "manifest.json"), registry=registry)
+        plugin_manager.init_plugins()
+        registry.update.assert_called_once_with("bulbs", [])
+
+        # i.e. background discovery found a bulb after the plugin was initialized
+        plugin = plugin_manager.get_bound_plugin_for("fast")[0]
+        plugin.found.append(Device("Lamp", "bulbs", {"id": "abc"}))
+        plugin.devices_changed()
+
+        registry.update.assert_called_with("bulbs", [Device("Lamp", "bulbs", {"id": "abc"})])
@@ -0,0 +1,129 @@
+import os
+import sys
+import json
+import time
+import pytest
+import threading
+from pi_assistant.plugins.plugin_manager import PluginManager, PluginState
+from pi_assistant.plugins.plugin_manifest import PluginManifest
+from test.fakes.plugin_package import FakePluginPackage, StaticConfiguration
+
+
+@pytest.fixture
+def plugins(tmp_path):
+    """
+    A plugins package with an importable plugin, a plugin with a configuration class and a plugin whose import always
+    fails.
+    """
+    with FakePluginPackage(tmp_path) as package:
+        package.add("lights", "smart_lights", config=True)
+        package.add("clock", "time")
+        package.add("broken", "broken", imports="import a_dependency_which_is_not_installed")
+        yield package
+
+
+def test_manifest_build_reads_plugins_without_importing_them(plugins):
+    specs = {spec.name: spec for spec in PluginManifest.build(plugins.path, plugins.package).specs}
+
+    assert sorted(specs.keys()) == ["broken", "clock", "lights"]
+    assert specs["lights"].intent == "smart_lights"
+    assert specs["lights"].enabled_key == "plugins.lights.enabled"
+    assert specs["lights"].config_class_name == "LightsConfig"
+    assert specs["clock"].config_module is None
+    assert not any(module.startswith(plugins.package + ".") for module in sys.modules)
+
+
+def test_manifest_load_reuses_the_cache_until_a_plugin_changes(plugins, tmp_path):
+    cache_path = str(tmp_path / "cache" / "manifest.json")
+    PluginManifest.load(plugins.path, plugins.package, cache_path)
+
+    with open(cache_path, "r") as file:
+        data = json.loads(file.read())
+    data["plugins"][0]["intent"] = "from_cache"
+    with open(cache_path, "w") as file:
+        file.write(json.dumps(data))
+    assert PluginManifest.load(plugins.path, plugins.package, cache_path).specs[0].intent == "from_cache"
+
+    plugin_file = os.path.join(plugins.path, "broken", "broken_plugin.py")
+    os.utime(plugin_file, (0, os.path.getmtime(plugin_file) + 10))
+    assert PluginManifest.load(plugins.path, plugins.package, cache_path).specs[0].intent == "broken"
+
+
+def test_plugin_manager_does_not_import_disabled_plugins(plugins, tmp_path):
+    config = StaticConfiguration({
+        "wit.intents": ["smart_lights", "time", "broken"],
+        "plugins.lights.enabled": True,
+        "plugins.lights.physical_device": False,
+        "plugins.clock.enabled": True,
+        "plugins.broken.enabled": False,
+    })
+    manager = PluginManager(config=config, plugins_path=plugins.path, plugins_package=plugins.package,
+                            manifest_path=str(tmp_path / "manifest.json"))
+    manager.init_plugins()
+
+    assert sorted(p.name() for p in manager._initialized_plugins) == ["clock", "lights"]
+    assert not plugins.imported("broken")
+    assert type(manager.get_bound_plugin_for("smart_lights")[0].config).__name__ == "LightsConfig"
+
+
+def test_plugin_manager_initializes_lazy_plugins_on_first_intent(plugins, tmp_path):
+    config = StaticConfiguration({
+        "wit.intents": ["smart_lights", "time", "broken"],
+        "plugins.lights.enabled": True,
+        "plugins.lights.physical_device": False,
+        "plugins.clock.enabled": True,
+        "plugins.clock.lazy": True,
+        "plugins.broken.enabled": False,
+    })
+    manager = PluginManager(config=config, plugins_path=plugins.path, plugins_package=plugins.package,
+                            manifest_path=str(tmp_path / "manifest.json"))
+    manager.init_plugins()
+
+    assert [p.name() for p in manager._initialized_plugins] == ["lights"]
+    assert not plugins.imported("clock")
+
+    bound = manager.get_bound_plugin_for("time")
+    assert [p.name() for p in bound] == ["clock"]
+    assert manager.get_bound_plugin_for("time") == bound
+    assert sorted(p.name() for p in manager._initialized_plugins) == ["clock", "lights"]
+
+
+def test_plugin_manager_initializes_lazy_plugins_under_their_deadline_without_blocking_dispatch(tmp_path):
+    with FakePluginPackage(tmp_path) as package:
+        package.add("slow", "slow", imports="import time", init="time.sleep(0.6)")
+        package.add("clock", "time")
+        config = StaticConfiguration({
+            "wit.intents": ["slow", "time"],
+            "plugins.slow.enabled": True,
+            "plugins.slow.lazy": True,
+            "plugins.slow.init_timeout_seconds": 0.2,
+            "plugins.clock.enabled": True,
+            "plugins.clock.lazy": True,
+        })
+        manager = PluginManager(config=config, plugins_path=package.path, plugins_package=package.package,
+                                manifest_path=str(tmp_path / "manifest.json"))
+        manager.init_plugins()
+
+        slow = {}
+
+        def dispatch_slow():
+            started = time.monotonic()
+            slow["bound"] = manager.get_bound_plugin_for("slow")
+            slow["elapsed"] = time.monotonic() - started
+
+        thread = threading.Thread(target=dispatch_slow)
+        thread.start()
+        while manager.states.get("slow") != PluginState.INITIALIZING:
+            time.sleep(0.01)
+
+        # Another lazy plugin is initialized and dispatched while the slow one is still initializing
+        started = time.monotonic()
+        assert [p.name() for p in manager.get_bound_plugin_for("time")] == ["clock"]
+        assert time.monotonic() - started < 0.2
+
+        thread.join(timeout=5)
+        assert slow["bound"] == () and slow["elapsed"] < 0.5
+        assert manager.states["slow"] == PluginState.FAILED
+        # The slow plugin is still running, let it finish so it doesn't outlive the test
+        time.sleep(0.6)
+        assert manager.get_bound_plugin_for("slow") == ()
@@ -0,0 +1,82 @@
+import json
+import time
+from unittest import mock
+from pi_assistant.http_session import build_session
+from pi_assistant.plugins.weather.weather_service import WeatherService
+from pi_assistant.plugins.weather.weather_plugin import WeatherPlugin
+from test.fakes.weather_server import FakeWeatherServer
+
+
+def build_service(server: FakeWeatherServer, tmp_path, report_ttl: float = 60, refresh_ahead: float = 10,
+                  location_ttl: float = 3600) -> WeatherService:
+    return WeatherService(session=build_session(), api_key="key", weather_url=f"{server.url}/data/2.5/weather",
+                          location_url=f"{server.url}/json", location_cache_path=str(tmp_path / "location.json"),
+                          report_ttl=report_ttl, refresh_ahead=refresh_ahead, location_ttl=location_ttl,
+                          timeout=(1, 1), retries=2, backoff=0.01)
+
+
+def test_weather_service_caches_the_location_on_disk(tmp_path):
+    with FakeWeatherServer() as server:
+        service = build_service(server, tmp_path)
+        service.start()
+        service.stop()
+        assert service.location == ("Boston", "Massachusetts")
+        assert json.loads((tmp_path / "location.json").read_text())["city"] == "Boston"
+
+        server.city = "Denver"
+        restarted = build_service(server, tmp_path)
+        restarted.start()
+        restarted.stop()
+        assert restarted.location == ("Boston", "Massachusetts")
+        assert server.requests_to("/json") == 1
+
+
+def test_weather_service_looks_up_an_expired_location_again(tmp_path):
+    with FakeWeatherServer() as server:
+        (tmp_path / "location.json").write_text(json.dumps({"city": "Denver", "region": "Colorado",
+                                                            "fetched_at": time.time() - 7200}))
+        service = build_service(server, tmp_path, location_ttl=3600)
+        service.start()
+        service.stop()
+        assert service.location == ("Boston", "Massachusetts")
+
+
+def test_weather_service_refreshes_the_report_before_it_expires(tmp_path):
+    with FakeWeatherServer(forecast="Clouds") as server:
+        service = build_service(server, tmp_path, report_ttl=0.4, refresh_ahead=0.2)
+        service.start()
+        assert service.report().forecast == "Clouds"
+
+        server.forecast = "Rain"
+        time.sleep(0.5)
+        service.stop()
+        assert service.report().forecast == "Rain"
+        assert server.requests_to("/data/2.5/weather") >= 2
+
+
+def test_weather_service_retries_and_keeps_the_last_report_when_a_refresh_fails(tmp_path):
+    with FakeWeatherServer(failures=1) as server:
+        service = build_service(server, tmp_path)
+        service.start()
+        assert service.report().forecast == "Clouds"
+
+        server.failures = 10
+        server.forecast = "Rain"
+        service.refresh()
+        service.stop()
+        assert service.report().forecast == "Clouds"
+
+
+@mock.patch('pi_assistant.plugins.weather.weather_plugin.assistant_reply')
+def test_weather_plugin_answers_from_memory(mock_reply, tmp_path):
+    with FakeWeatherServer() as server:
+        plugin = WeatherPlugin(None, None)
+        plugin._weather = build_service(server, tmp_path)
+        plugin._weather.start()
+        plugin._weather.stop()
+        requests = len(server.requests)
+
+        plugin.on_intent_received({"name": "wit$get_weather"}, {})
+
+        assert len(server.requests) == requests
+        assert "Clouds in Boston Massachusetts" in mock_reply.call_args[0][0]
@@ -0,0 +1,124 @@
+import json
+import pytest
+from pi_assistant.profile.Device import Device
+from pi_assistant.profile.Profile import Profile
+from pi_assistant.profile.profile_store import ProfileStore
+
+
+def lamp(name: str) -> dict:
+    return {"name": name, "key": "k", "ip": "10.0.0.5", "id": name.lower()}
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = ProfileStore(str(tmp_path / "profiles" / "profiles.db"), legacy_directories=[str(tmp_path)])
+    yield s
+    s.close()
+
+
+def test_store_indexes_rooms_groups_and_devices(store):
+    store.create_profile("home")
+    store.create_room("home", "Kitchen")
+    store.create_room("home", "office")
+    store.create_group("home", "downstairs")
+    store.link_device("home", "kitchen", lamp("Lamp"))
+    store.link_device("home", "office", lamp("Lamp"))
+    store.add_group_device("home", "downstairs", lamp("Lamp"))
+
+    profile = store.load("home")
+    assert set(profile.devices_in_room("KITCHEN")) == {"lamp"}
+    assert set(profile.devices_in_group("downstairs")) == {"lamp"}
+    assert profile.rooms_for_device("Lamp") == {"kitchen", "office"}
+    assert profile.devices_in_room("garage") == {}
+
+
+def test_store_applies_incremental_updates(store):
+    store.create_profile("home")
+    store.create_room("home", "kitchen")
+    for i in range(300):
+        store.link_device("home", "kitchen", lamp(f"Lamp {i}"))
+    store.unlink_device("home", "kitchen", "lamp 7")
+
+    profile = store.load("home")
+    assert len(profile.devices_in_room("kitchen")) == 299
+    assert profile.rooms_for_device("lamp 7") == set()
+
+    store.delete_room("home", "kitchen")
+    assert store.load("home").rooms_for_device("lamp 1") == set()
+
+
+def test_store_rejects_invalid_changes(store):
+    store.create_profile("home")
+    store.create_room("home", "kitchen")
+    store.link_device("home", "kitchen", lamp("Lamp"))
+
+    with pytest.raises(Exception, match="already exists"):
+        store.create_profile("home")
+    with pytest.raises(Exception, match="already exists"):
+        store.create_room("home", "Kitchen")
+    with pytest.raises(Exception, match="already belongs"):
+        store.link_device("home", "kitchen", lamp("lamp"))
+    with pytest.raises(Exception, match="No room"):
+        store.link_device("home", "garage", lamp("Fan"))
+    with pytest.raises(Exception, match="No profile"):
+        store.load("cabin")
+
+
+def test_failed_transaction_leaves_the_profile_unchanged(store):
+    store.create_profile("home")
+    store.create_room("home", "kitchen")
+
+    with pytest.raises(RuntimeError):
+        with store.transaction() as db:
+            db.execute("INSERT INTO rooms (profile, name) VALUES (?, ?)", ("home", "office"))
+            raise RuntimeError("crashed mid-write")
+
+    assert set(store.load("home").rooms) == {"kitchen"}
+
+
+def test_store_imports_legacy_json_profiles(store, tmp_path):
+    (tmp_path / "home.json").write_text(json.dumps({"name": "home", "groups": {"Upstairs": {}},
+                                                    "rooms": {"Kitchen": {"lamp": lamp("Lamp")}}}))
+
+    profile = store.load("home")
+    assert store.exists("home")
+    assert profile.rooms_for_device("lamp") == {"kitchen"}
+    assert "upstairs" in profile.groups
+
+
+def test_store_reports_legacy_json_profiles_which_cannot_be_imported(store, tmp_path):
+    (tmp_path / "home.json").write_text("{\"name\": \"home\", \"rooms\": ")
+
+    with pytest.raises(Exception, match="home.json could not be imported"):
+        store.load("home")
+    assert not store.exists("home")
+
+
+def test_profile_keeps_the_device_index_in_sync():
+    profile = Profile("home")
+    profile.add_room_device("Kitchen", "Lamp", lamp("Lamp"))
+    profile.add_room_device("Office", "Lamp", lamp("Lamp"))
+    profile.remove_room("kitchen")
+
+    assert profile.rooms_for_device("lamp") == {"office"}
+    profile.remove_room_device("office", "lamp")
+    assert "lamp" not in profile.device_rooms
+
+
+def test_store_links_devices_by_plugin_and_id_and_reports_name_conflicts(store):
+    store.create_profile("home")
+    store.create_room("home", "kitchen")
+    store.create_room("home", "office")
+    feit = Device("Lamp", "feit_electric_smart_lights", {"id": "abc"}).to_dict()
+    hue = Device("Lamp", "hue_smart_lights", {"id": "abc"}).to_dict()
+
+    assert store.link_devices("home", "kitchen", [feit]) == 1
+    assert store.link_devices("home", "kitchen", [feit]) == 0
+    with pytest.raises(Exception, match=r"lamp \(hue_smart_lights/abc\)"):
+        store.link_devices("home", "kitchen", [hue])
+    with pytest.raises(Exception, match="same name"):
+        store.link_devices("home", "office", [feit, hue])
+
+    profile = store.load("home")
+    assert profile.devices_in_room("kitchen")["lamp"]["bind_to"] == "feit_electric_smart_lights"
+    assert profile.devices_in_room("office") == {}
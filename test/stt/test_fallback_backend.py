@@ -0,0 +1,76 @@
+import pytest
+import speech_recognition as sr
+from unittest import mock
+from pi_assistant.stt import FallbackSttBackend, GoogleSttBackend, VoskSttBackend
+from test.fakes.stt_backend import FakeSttBackend
+
+
+def audio(text: str) -> sr.AudioData:
+    return sr.AudioData(text.encode("utf-8"), 16000, 2)
+
+
+def test_fallback_backend_uses_the_first_reachable_backend():
+    online, offline = FakeSttBackend("online"), FakeSttBackend("offline")
+    backend = FallbackSttBackend([online, offline])
+    assert backend.transcribe(audio("turn on the lights")) == "turn on the lights"
+    assert online.transcribed == ["turn on the lights"]
+    assert offline.transcribed == []
+
+
+def test_fallback_backend_skips_unreachable_backends_until_the_retry():
+    online, offline = FakeSttBackend("online", reachable=False), FakeSttBackend("offline")
+    backend = FallbackSttBackend([online, offline], retry_seconds=60)
+
+    assert backend.transcribe(audio("what time is it")) == "what time is it"
+    assert backend.transcribe(audio("what is the date")) == "what is the date"
+    # The unreachable backend was only tried once, the second command went straight to the offline backend
+    assert offline.transcribed == ["what time is it", "what is the date"]
+
+    with mock.patch("pi_assistant.stt.fallback_backend.time.monotonic", return_value=10 ** 9):
+        online.reachable = True
+        assert backend.transcribe(audio("hello")) == "hello"
+        assert online.transcribed == ["hello"]
+
+
+def test_fallback_backend_does_not_fall_back_when_there_is_no_speech():
+    online, offline = FakeSttBackend("online"), FakeSttBackend("offline")
+    with pytest.raises(sr.UnknownValueError):
+        FallbackSttBackend([online, offline]).transcribe(audio("   "))
+    assert offline.transcribed == []
+
+
+def test_fallback_backend_raises_when_every_backend_is_unreachable():
+    backend = FallbackSttBackend([FakeSttBackend("a", reachable=False), FakeSttBackend("b", reachable=False)])
+    with pytest.raises(sr.RequestError):
+        backend.transcribe(audio("hello"))
+
+
+def test_fallback_backend_streams_through_the_fallback_chain():
+    online, offline = FakeSttBackend("online", streaming=False, reachable=False), FakeSttBackend("offline")
+    backend = FallbackSttBackend([online, offline])
+    assert not backend.streaming
+
+    stream = backend.open_stream(16000, 2)
+    stream.feed(b"turn off ")
+    stream.feed(b"the lights")
+    assert stream.finish() == "turn off the lights"
+    # The offline backend streams once the online one is known to be unreachable
+    assert backend.streaming
+
+    partials = []
+    stream = backend.open_stream(16000, 2, on_partial=partials.append)
+    stream.feed(b"what ")
+    stream.feed(b"time")
+    assert stream.finish() == "what time"
+    assert partials == ["what", "what time"]
+
+
+def test_google_backend_passes_the_language():
+    recognizer = mock.MagicMock()
+    recognizer.recognize_google.return_value = "hello"
+    assert GoogleSttBackend(recognizer, language="en-GB").transcribe(audio("x")) == "hello"
+    assert recognizer.recognize_google.call_args.kwargs["language"] == "en-GB"
+
+
+def test_vosk_backend_is_unavailable_without_a_model(tmp_path):
+    assert not VoskSttBackend(str(tmp_path / "missing")).available()
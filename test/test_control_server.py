@@ -0,0 +1,129 @@
+import json
+import asyncio
+from unittest import mock
+from pi_assistant.config import Configuration
+from pi_assistant.tracing import Tracer
+from pi_assistant.control_server import ControlServer
+from test.test_pipeline import build_pipeline
+
+TIME_RESPONSE = {'intents': [{'name': 'time', 'confidence': 0.99}], 'entities': {}}
+
+
+def time_plugin():
+    plugin = mock.MagicMock()
+    plugin.name.return_value = "temporal"
+    return plugin
+
+
+async def request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, body) -> dict:
+    writer.write((body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")) + b"\n")
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+
+def run_server(script, understand=None, plugin_manager=None, **kwargs):
+    """
+    Runs the pipeline and a control server on a free port and runs the async script against them.
+    """
+    if plugin_manager is None:
+        plugin_manager = mock.MagicMock()
+        plugin_manager.handle_intent.return_value = [time_plugin()]
+        plugin_manager.states = {"temporal": "ready"}
+    pipeline = build_pipeline(understand or (lambda text: TIME_RESPONSE), plugin_manager)
+
+    async def main():
+        pipeline_task = asyncio.create_task(pipeline.run())
+        await asyncio.get_running_loop().run_in_executor(None, pipeline.wait_until_started)
+        try:
+            async with ControlServer(pipeline, plugin_manager, Configuration(environment="test"), port=0,
+                                     **kwargs) as server:
+                await script(server)
+        finally:
+            pipeline.stop()
+            await pipeline_task
+
+    asyncio.run(main())
+    return plugin_manager
+
+
+def test_text_commands_skip_stt_and_are_dispatched():
+    understand = mock.MagicMock(return_value=TIME_RESPONSE)
+
+    async def script(server):
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        response = await request(reader, writer, {"type": "command", "text": " what time is it ", "id": 7})
+        assert len(response.pop("trace_id")) == 12
+        assert response == {"id": 7, "ok": True, "intent": "time", "plugins": ["temporal"]}
+        writer.close()
+
+    plugin_manager = run_server(script, understand=understand)
+    understand.assert_called_once_with("what time is it")
+    plugin_manager.handle_intent.assert_called_once_with(TIME_RESPONSE)
+
+
+def test_many_clients_are_served_concurrently():
+    async def client(server, n: int):
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        responses = [await request(reader, writer, {"type": "command", "text": f"command {n} {i}", "id": i})
+                     for i in range(5)]
+        writer.close()
+        return responses
+
+    async def script(server):
+        results = await asyncio.gather(*(client(server, n) for n in range(10)))
+        assert all(r["ok"] and [x["id"] for x in responses] == list(range(5))
+                   for responses in results for r in responses)
+        metrics = server.metrics()["control_server"]
+        assert metrics["clients_total"] == 10
+        assert metrics["requests"]["command"] == 50
+
+    run_server(script)
+
+
+def test_status_metrics_and_reload_requests():
+    async def script(server):
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        status = await request(reader, writer, {"type": "status"})
+        assert status["ok"] and status["listening"] and status["clients"] == 1
+        assert status["plugins"] == {"temporal": "ready"}
+
+        metrics = await request(reader, writer, {"type": "metrics"})
+        assert metrics["nlu_cache"] == {"hits": 3}
+
+        prometheus = await request(reader, writer, {"type": "metrics", "format": "prometheus"})
+        assert prometheus["text"].startswith("# HELP pi_assistant_stage_seconds")
+
+        reload = await request(reader, writer, {"type": "reload"})
+        assert reload == {"id": None, "ok": True, "changed": False}
+        writer.close()
+
+    run_server(script, metrics={"nlu_cache": lambda: {"hits": 3}}, tracer=Tracer(enabled=True))
+
+
+def test_bad_requests_are_answered_with_errors_without_closing_the_connection():
+    async def script(server):
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        assert "Unknown request type" in (await request(reader, writer, {"type": "dance"}))["error"]
+        assert not (await request(reader, writer, b"{not json"))["ok"]
+        assert not (await request(reader, writer, {"type": "command", "text": ""}))["ok"]
+        assert "shorter than" in (await request(reader, writer, b"x" * 4096))["error"]
+        assert (await request(reader, writer, {"type": "status"}))["ok"]
+        writer.close()
+
+    run_server(script, max_line_bytes=1024)
+
+
+def test_requests_which_are_too_long_are_answered_once_and_skipped():
+    async def script(server):
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        # The request arrives in pieces so the server only sees its end after the limit was exceeded
+        for _ in range(4):
+            writer.write(b"x" * 1024)
+            await writer.drain()
+            await asyncio.sleep(0.05)
+        assert "shorter than" in (await request(reader, writer, b"x" * 1024))["error"]
+        response = await request(reader, writer, {"id": 8, "type": "status"})
+        assert response["ok"] and response["id"] == 8
+        writer.close()
+
+    run_server(script, max_line_bytes=1024)
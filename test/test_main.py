@@ -1,7 +1,22 @@
+from unittest import mock
 from pi_assistant.config import Configuration
-from pi_assistant.main import get_keywords
+from pi_assistant.main import get_keywords, understand, understand_partial
+from test.fakes.plugin_package import StaticConfiguration
 
 
 def test_get_keywords_success():
     config = Configuration(environment="test")
     assert get_keywords(config) == [('noomis', 0.5)]
+
+
+@mock.patch("pi_assistant.main.config", StaticConfiguration({"nlu.cache.enabled": True}))
+@mock.patch("pi_assistant.main.wit_client")
+@mock.patch("pi_assistant.main.nlu_cache")
+def test_understand_partial_does_not_cache_the_response(nlu_cache, wit_client):
+    nlu_cache.get.return_value = None
+    wit_client.message.return_value = {'intents': [], 'entities': {}}
+
+    understand_partial("turn on the")
+    nlu_cache.put.assert_not_called()
+    understand("turn on the lights")
+    nlu_cache.put.assert_called_once_with("turn on the lights", {'intents': [], 'entities': {}})
@@ -0,0 +1,289 @@
+import time
+import asyncio
+import threading
+import speech_recognition as sr
+from unittest import mock
+from pi_assistant import util
+from pi_assistant.config import Configuration
+from pi_assistant.pipeline import VoicePipeline, UNKNOWN_INTENT_REPLY
+from test.fakes.stt_backend import FakeSttBackend
+
+
+class FakeRecognizer:
+    """
+    Treats each submitted "audio" item as its own transcript so tests can script what was heard.
+    """
+    def recognize_sphinx(self, audio, keyword_entries=None):
+        if "noomis" not in audio:
+            raise sr.UnknownValueError()
+        return "noomis"
+
+    def recognize_google(self, audio_data=None):
+        return audio_data
+
+
+class FakePhrase:
+    def __init__(self, audio: str, duration: float = 1.0, start: int = None):
+        self.audio = audio
+        self.start = start
+        self._duration = duration
+
+    def duration(self) -> float:
+        return self._duration
+
+
+class FakeCapture:
+    """
+    Stands in for the capture ring buffer, the bytes of the stream are read back by absolute position.
+    """
+    def __init__(self, data: bytes):
+        self._data = data
+
+    def cut(self, start: int, end: int = None) -> sr.AudioData:
+        return sr.AudioData(self._data[start:end], 16000, 2)
+
+    def stop(self) -> None:
+        pass
+
+
+def wait_until(condition, timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def run_pipeline(pipeline: VoicePipeline, script):
+    """
+    Runs the pipeline on a background event loop, runs the script against it and then stops the pipeline.
+    """
+    thread = threading.Thread(target=lambda: asyncio.run(pipeline.run()))
+    thread.start()
+    try:
+        assert pipeline.wait_until_started(timeout=5)
+        script()
+    finally:
+        pipeline.stop()
+        thread.join(timeout=5)
+
+
+def build_pipeline(understand, plugin_manager=None, reply=None, tracer=None, stt=None) -> VoicePipeline:
+    return VoicePipeline(config=Configuration(environment="test"), recognizer=FakeRecognizer(), source=None,
+                         plugin_manager=plugin_manager or mock.MagicMock(), understand=understand,
+                         reply=reply or mock.MagicMock(), keywords=[("noomis", 0.5)], tracer=tracer, stt=stt)
+
+
+def test_pipeline_dispatches_command_following_keyword():
+    response = {'intents': [{'name': 'time', 'confidence': 0.99}], 'entities': {}}
+    dispatched = threading.Event()
+    plugin_manager = mock.MagicMock()
+    plugin_manager.handle_intent.side_effect = lambda r: dispatched.set()
+    understand = mock.MagicMock(return_value=response)
+    pipeline = build_pipeline(understand, plugin_manager)
+
+    def script():
+        pipeline.submit_phrase(FakePhrase("what time is it"))  # Not preceded by the keyword, ignored
+        pipeline.submit_phrase(FakePhrase("noomis"))
+        pipeline.submit_phrase(FakePhrase("what time is it"))
+        assert dispatched.wait(timeout=5)
+
+    run_pipeline(pipeline, script)
+    understand.assert_called_once_with("what time is it")
+    plugin_manager.handle_intent.assert_called_once_with(response)
+
+
+def test_pipeline_replies_when_no_intent_matches():
+    replied = threading.Event()
+    reply = mock.MagicMock(side_effect=lambda text: replied.set())
+    pipeline = build_pipeline(lambda text: {'intents': [], 'entities': {}}, reply=reply)
+
+    def script():
+        pipeline.submit_phrase(FakePhrase("noomis"))
+        pipeline.submit_phrase(FakePhrase("blah blah"))
+        assert replied.wait(timeout=5)
+
+    run_pipeline(pipeline, script)
+    reply.assert_called_once_with(UNKNOWN_INTENT_REPLY)
+
+
+def test_pipeline_keeps_dispatching_while_a_plugin_reply_is_playing():
+    release_reply = threading.Event()
+    dispatched = []
+    replies = []
+    plugin_manager = mock.MagicMock()
+    plugin_manager.handle_intent.side_effect = lambda r: dispatched.append(r) or util.assistant_reply("Done.")
+
+    def reply(text):
+        replies.append(text)
+        release_reply.wait(timeout=5)
+
+    pipeline = build_pipeline(lambda text: {'intents': [{'name': text, 'confidence': 0.99}], 'entities': {}},
+                              plugin_manager, reply=reply)
+
+    def script():
+        util.set_reply_sink(pipeline.submit_reply)
+        try:
+            pipeline.submit_phrase(FakePhrase("noomis"))
+            pipeline.submit_phrase(FakePhrase("first command"))
+            assert wait_until(lambda: len(replies) == 1)
+            # The first reply is still playing but the next command is dispatched without waiting for it
+            pipeline.submit_phrase(FakePhrase("noomis"))
+            pipeline.submit_phrase(FakePhrase("second command"))
+            assert wait_until(lambda: len(dispatched) == 2)
+            assert len(replies) == 1
+            release_reply.set()
+            assert wait_until(lambda: len(replies) == 2)
+        finally:
+            release_reply.set()
+            util.set_reply_sink(None)
+
+    run_pipeline(pipeline, script)
+    assert replies == ["Done.", "Done."]
+
+
+def test_pipeline_handles_command_spoken_in_the_same_phrase_as_keyword():
+    understood = threading.Event()
+    understand = mock.MagicMock(side_effect=lambda text: understood.set() or {'intents': [], 'entities': {}})
+    pipeline = build_pipeline(understand)
+
+    def script():
+        pipeline.submit_phrase(FakePhrase("noomis what time is it", duration=3.0))
+        assert understood.wait(timeout=5)
+
+    run_pipeline(pipeline, script)
+    understand.assert_called_once_with("what time is it")
+
+
+def test_pipeline_keeps_listening_while_nlu_is_slow():
+    release_nlu = threading.Event()
+    second_command = threading.Event()
+
+    def understand(text):
+        if text == "first command":
+            release_nlu.wait(timeout=5)
+        else:
+            second_command.set()
+        return {'intents': [], 'entities': {}}
+
+    pipeline = build_pipeline(understand)
+
+    def script():
+        pipeline.submit_phrase(FakePhrase("noomis"))
+        pipeline.submit_phrase(FakePhrase("first command"))
+        # The first command is stuck in NLU but the keyword and second command are still heard and transcribed
+        pipeline.submit_phrase(FakePhrase("noomis"))
+        pipeline.submit_phrase(FakePhrase("second command"))
+        assert not second_command.wait(timeout=0.2)
+        release_nlu.set()
+        assert second_command.wait(timeout=5)
+
+    run_pipeline(pipeline, script)
+
+
+def test_pipeline_transcribes_commands_while_they_are_spoken():
+    response = {'intents': [{'name': 'smart_lights', 'confidence': 0.99}], 'entities': {}}
+    dispatched = threading.Event()
+    plugin_manager = mock.MagicMock()
+    plugin_manager.handle_intent.side_effect = lambda r: dispatched.set()
+    understand = mock.MagicMock(return_value=response)
+    stt = FakeSttBackend()
+    pipeline = build_pipeline(understand, plugin_manager, stt=stt)
+
+    def script():
+        pipeline._on_phrase_audio(0, 8, b"turn on ")  # Not preceded by the keyword, not streamed
+        pipeline.submit_phrase(FakePhrase("noomis"))
+        deadline = time.monotonic() + 5
+        while pipeline._armed_until == 0.0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        pipeline._on_phrase_audio(100, 108, b"turn on ")
+        pipeline._on_phrase_audio(100, 118, b"the lights")
+        pipeline.submit_phrase(FakePhrase("the complete phrase", start=100))
+        assert dispatched.wait(timeout=5)
+
+    run_pipeline(pipeline, script)
+    # The command came from the stream rather than transcribing the complete phrase again
+    assert stt.finished == ["turn on the lights"]
+    understand.assert_called_once_with("turn on the lights")
+
+
+def test_pipeline_speculates_on_a_stable_partial_transcript():
+    response = {'intents': [{'name': 'smart_lights', 'confidence': 0.99}], 'entities': {}}
+    dispatched = threading.Event()
+    plugin_manager = mock.MagicMock()
+    plugin_manager.handle_intent.side_effect = lambda r: dispatched.set()
+    plugin_manager.warm_up.return_value = 1
+    understand = mock.MagicMock(return_value=response)
+    pipeline = build_pipeline(understand, plugin_manager, stt=FakeSttBackend())
+
+    def script():
+        pipeline.submit_phrase(FakePhrase("noomis"))
+        deadline = time.monotonic() + 5
+        while pipeline._armed_until == 0.0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        pipeline._on_phrase_audio(100, 108, b"turn on ")
+        pipeline._on_phrase_audio(100, 118, b"the lights")
+        # The user pauses, the partial transcript is stable and is understood before the phrase ends
+        deadline = time.monotonic() + 5
+        while not plugin_manager.warm_up.called and time.monotonic() < deadline:
+            time.sleep(0.01)
+        pipeline.submit_phrase(FakePhrase("the complete phrase", start=100))
+        assert dispatched.wait(timeout=5)
+
+    run_pipeline(pipeline, script)
+    understand.assert_called_once_with("turn on the lights")
+    plugin_manager.warm_up.assert_called_once_with(response)
+    plugin_manager.handle_intent.assert_called_once_with(response)
+    assert pipeline.speculation_stats()["hits"] == 1
+
+
+def test_pipeline_streams_commands_which_started_before_the_keyword_was_recognized():
+    response = {'intents': [{'name': 'smart_lights', 'confidence': 0.99}], 'entities': {}}
+    dispatched = threading.Event()
+    plugin_manager = mock.MagicMock()
+    plugin_manager.handle_intent.side_effect = lambda r: dispatched.set()
+    understand = mock.MagicMock(return_value=response)
+    stt = FakeSttBackend()
+    pipeline = build_pipeline(understand, plugin_manager, stt=stt)
+    pipeline._capture = FakeCapture(b"turn on the lights")
+
+    def script():
+        # The command is already underway while the keyword is still being recognized
+        pipeline._on_phrase_audio(0, 8, b"turn on ")
+        pipeline.submit_phrase(FakePhrase("noomis"))
+        assert wait_until(lambda: pipeline._armed_until > 0.0)
+
+        pipeline._on_phrase_audio(0, 12, b"the ")
+        pipeline._on_phrase_audio(0, 18, b"lights")
+        pipeline.submit_phrase(FakePhrase("the complete phrase", start=0))
+        assert dispatched.wait(timeout=5)
+
+    run_pipeline(pipeline, script)
+    # The stream was seeded with the start of the phrase so no words were lost
+    assert stt.finished == ["turn on the lights"]
+    understand.assert_called_once_with("turn on the lights")
+
+
+def test_pipeline_closes_streams_which_never_become_commands():
+    understand = mock.MagicMock()
+    stt = FakeSttBackend()
+    pipeline = build_pipeline(understand, stt=stt)
+
+    def script():
+        pipeline.submit_phrase(FakePhrase("noomis"))
+        assert wait_until(lambda: pipeline._armed_until > 0.0)
+
+        pipeline._on_phrase_audio(100, 108, b"turn on ")
+        # A new phrase replaces the stream of the first one which never completed
+        pipeline._on_phrase_audio(200, 205, b"hello")
+        assert wait_until(lambda: stt.closed == ["turn on"])
+
+        # The arm window runs out before the second phrase ends
+        pipeline._armed_until = 0.0
+        pipeline.submit_phrase(FakePhrase("hello", start=200))
+        assert wait_until(lambda: stt.closed == ["turn on", "hello"])
+
+    run_pipeline(pipeline, script)
+    assert stt.finished == []
+    understand.assert_not_called()
@@ -0,0 +1,85 @@
+import json
+import time
+import pytest
+from unittest import mock
+from pi_assistant import util
+from pi_assistant.config import Configuration
+from pi_assistant.devices import SimulatedFanOut
+from pi_assistant.replay import Replay, ReplayReport, NullReplySink
+from pi_assistant.plugins.plugin_environment import SimulatedEnvironment
+from pi_assistant.plugins.weather.weather_config import WeatherConfig
+from pi_assistant.plugins.weather.weather_plugin import WeatherPlugin
+from pi_assistant.plugins.feit_electric_smart_lights.feit_electric_smart_lights_plugin import \
+    FeitElectricSmartLightsPlugin
+
+
+def response(intent: str) -> dict:
+    return {'intents': [{'name': intent, 'confidence': 0.9}, {'name': 'other', 'confidence': 0.1}], 'entities': {}}
+
+
+def test_replay_loads_utterances_and_nlu_responses(tmp_path):
+    path = tmp_path / "commands.txt"
+    path.write_text(f"# comment\nwhat time is it\n\n{json.dumps(response('date'))}\n")
+
+    assert Replay.load(str(path)) == ["what time is it", response("date")]
+
+
+def test_replay_reports_latency_per_intent():
+    def handle_intent(r):
+        time.sleep(0.01 if r['intents'][0]['name'] == "time" else 0.0)
+        if r['intents'][0]['name'] == "date":
+            raise Exception("Plugin failed")
+
+    understand = mock.MagicMock(side_effect=lambda text: response("time") if "time" in text else
+                                {'intents': [], 'entities': {}})
+    commands = ["what time is it"] * 8 + [response("date")] * 4 + ["gibberish"] * 2
+    report = Replay(handle_intent, understand=understand, concurrency=4).run(commands)
+
+    summary = report.to_dict()
+    assert report.commands == 14 and report.commands_per_second > 0
+    assert summary["intents"]["time"]["count"] == 8 and summary["intents"]["time"]["p50_ms"] >= 10
+    assert summary["intents"]["date"]["failures"] == 4
+    assert summary["intents"]["unknown"]["count"] == 2
+    assert understand.call_count == 10
+    assert "commands/sec" in report.format()
+
+
+def test_percentiles_use_the_nearest_rank():
+    latencies = [i / 1000 for i in range(1, 101)]
+    assert ReplayReport.percentile(latencies, 50) == 0.05
+    assert ReplayReport.percentile(latencies, 99) == 0.099
+    assert ReplayReport.percentile([0.5], 95) == 0.5
+
+
+def test_null_sink_and_simulated_devices_stub_out_io():
+    sink = NullReplySink()
+    util.set_reply_sink(sink)
+    fan_out = SimulatedFanOut(latency=0.0, max_concurrency=2, timeout=1.0)
+    try:
+        util.assistant_reply("Turning on the lights")
+        results = fan_out.run({"lamp": object()}, lambda device: pytest.fail("The device should not be commanded"))
+        assert sink.replies == 1
+        assert [result.ok for result in results] == [True]
+    finally:
+        util.set_reply_sink(None)
+        fan_out.close()
+
+
+@mock.patch('pi_assistant.plugins.weather.weather_plugin.assistant_reply')
+def test_simulated_environment_keeps_plugins_off_the_network(mock_reply):
+    environment = SimulatedEnvironment()
+    config = Configuration(environment="test")
+    discovery = mock.MagicMock(devices=[{'name': 'Lamp', 'key': 'key', 'ip': '10.0.0.2', 'id': 'lamp', 'port': 6668}])
+    lights = FeitElectricSmartLightsPlugin(config, None, environment)
+    weather = WeatherPlugin(config, None, environment)
+
+    with mock.patch('requests.Session.request', side_effect=AssertionError("The network should not be used")):
+        lights.init(config=mock.MagicMock(discovery=discovery, devices=discovery.devices))
+        weather.init(config=WeatherConfig())
+        results = lights.on_intent_received({}, {'light_state:light_state': [{'value': 'off'}]})
+        weather.on_intent_received({"name": "wit$get_weather"}, {})
+
+    assert [result.ok for result in results] == [True]
+    discovery.refresh_in_background.assert_not_called()
+    discovery.rediscover.assert_not_called()
+    assert "It is currently Clear" in mock_reply.call_args[0][0]
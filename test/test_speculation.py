@@ -0,0 +1,92 @@
+import time
+import asyncio
+from unittest import mock
+from pi_assistant.speculation import Speculator
+
+LIGHTS_ON = {'intents': [{'name': 'smart_lights', 'confidence': 0.98}], 'entities': {}}
+
+
+async def offload(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+
+def build_speculator(response: dict = None):
+    understand = mock.MagicMock(return_value=response or LIGHTS_ON)
+    warm_up = mock.MagicMock(return_value=1)
+    return Speculator(understand, warm_up, offload, stable_seconds=0.05, min_confidence=0.9), understand, warm_up
+
+
+def test_speculator_commits_a_stable_partial_matching_the_final_transcript():
+    speculator, understand, warm_up = build_speculator()
+
+    async def speak():
+        speculator.on_partial("abc", "turn on")
+        speculator.on_partial("abc", "Turn on the lights")
+        await asyncio.sleep(0.2)
+        return await speculator.resolve("abc", "turn on the lights.")
+
+    assert asyncio.run(speak()) == LIGHTS_ON
+    understand.assert_called_once_with("turn on the lights")
+    warm_up.assert_called_once_with(LIGHTS_ON)
+    stats = speculator.stats()
+    assert (stats["speculations"], stats["hits"], stats["misses"], stats["warm_ups"]) == (1, 1, 0, 1)
+
+
+def test_speculator_discards_a_speculation_the_final_transcript_does_not_match():
+    speculator, understand, warm_up = build_speculator()
+
+    async def speak():
+        speculator.on_partial("abc", "turn on the")
+        await asyncio.sleep(0.2)
+        response = await speculator.resolve("abc", "turn on the fan")
+        await asyncio.sleep(0)
+        return response
+
+    assert asyncio.run(speak()) is None
+    stats = speculator.stats()
+    assert (stats["hits"], stats["misses"], stats["wasted_nlu_calls"], stats["wasted_warm_ups"]) == (0, 1, 1, 1)
+
+
+def test_speculator_waits_for_partials_to_stop_changing():
+    speculator, understand, warm_up = build_speculator()
+
+    async def speak():
+        for partial in ["turn", "turn on", "turn on the", "turn on the lights"]:
+            speculator.on_partial("abc", partial)
+            await asyncio.sleep(0.01)
+        return await speculator.resolve("abc", "turn on the lights")
+
+    assert asyncio.run(speak()) is None
+    understand.assert_not_called()
+    assert speculator.stats()["speculations"] == 0
+
+
+def test_speculator_only_warms_up_confident_intents():
+    speculator, understand, warm_up = build_speculator({'intents': [{'name': 'time', 'confidence': 0.5}],
+                                                        'entities': {}})
+
+    async def speak():
+        speculator.on_partial("abc", "what time")
+        await asyncio.sleep(0.2)
+        return await speculator.resolve("abc", "what time")
+
+    assert asyncio.run(speak())['intents'][0]['name'] == "time"
+    warm_up.assert_not_called()
+    assert speculator.stats()["low_confidence"] == 1
+
+
+def test_speculator_commits_without_waiting_for_the_warm_up():
+    speculator, understand, warm_up = build_speculator()
+    warm_up.side_effect = lambda response: time.sleep(0.5) or 1
+
+    async def speak():
+        speculator.on_partial("abc", "turn on the lights")
+        await asyncio.sleep(0.2)
+        started = time.monotonic()
+        response = await speculator.resolve("abc", "turn on the lights")
+        return response, time.monotonic() - started
+
+    response, elapsed = asyncio.run(speak())
+    assert response == LIGHTS_ON
+    assert elapsed < 0.2
+    warm_up.assert_called_once_with(LIGHTS_ON)
@@ -1,4 +1,9 @@
-from pi_assistant.util import sanitize_plugin_class_name
+import pytest
+from unittest import mock
+from pi_assistant import util
+from pi_assistant.tts import AudioCache
+from pi_assistant.util import sanitize_plugin_class_name, assistant_reply, collect_replies, merge_replies
+from test.fakes.plugin_package import StaticConfiguration
 
 
 def test_sanitize_plugin_class_name_success():
@@ -14,4 +19,42 @@ def test_sanitize_plugin_class_name_with_null_value():
 
 
 def test_sanitize_plugin_class_name_with_config_value():
-    assert sanitize_plugin_class_name("more_complex_plugin", True) == "MoreComplexPluginConfig"
\ No newline at end of file
+    assert sanitize_plugin_class_name("more_complex_plugin", True) == "MoreComplexPluginConfig"
+
+
+def test_collect_replies_collects_instead_of_speaking():
+    with collect_replies() as replies:
+        assistant_reply("The lights are on.")
+        with collect_replies() as inner:
+            assistant_reply("It is 5 PM.")
+    assert replies == ["The lights are on."]
+    assert inner == ["It is 5 PM."]
+
+
+def test_merge_replies_drops_empty_and_repeated_replies():
+    assert merge_replies(["The lights are on.", "", "  ", "The lights are on.", "It is 5 PM."]) == \
+           "The lights are on. It is 5 PM."
+    assert merge_replies([]) == ""
+
+
+@pytest.mark.parametrize("streaming", [True, False])
+def test_prewarmed_replies_are_spoken_from_the_cache(streaming, tmp_path):
+    reply = "Sorry I am not sure what you meant by that. Can you rephrase it?"
+    synthesized = []
+    cache = AudioCache(str(tmp_path), max_bytes=1024 * 1024,
+                       synthesize=lambda text, lang, voice: synthesized.append(text) or text.encode())
+    config = StaticConfiguration({"tts.language": "en", "tts.voice": "com", "tts.streaming.enabled": streaming,
+                                  "tts.streaming.workers": 2, "tts.streaming.min_chunk_chars": 20,
+                                  "tts.streaming.max_chunk_chars": 120})
+
+    with mock.patch.object(util, "config", config), mock.patch.object(util, "_tts_cache", cache), \
+            mock.patch.object(util, "_speaker", None), mock.patch("pi_assistant.util.playsound") as play:
+        util.prewarm_replies([reply])
+        prewarmed = list(synthesized)
+        util.speak(reply)
+
+    # Streamed replies are synthesized and played a sentence at a time so each sentence is pre-warmed on its own
+    assert prewarmed == (["Sorry I am not sure what you meant by that.", "Can you rephrase it?"] if streaming else
+                         [reply])
+    assert synthesized == prewarmed
+    assert play.call_count == len(prewarmed)
@@ -0,0 +1,76 @@
+import threading
+from unittest import mock
+from pi_assistant.tracing import Tracer, Histogram
+from test.test_pipeline import build_pipeline, run_pipeline, FakePhrase
+
+
+def test_histogram_counts_into_cumulative_buckets():
+    histogram = Histogram([0.1, 0.5, 1])
+    for value in (0.05, 0.1, 0.3, 0.7, 5):
+        histogram.observe(value)
+
+    snapshot = histogram.snapshot()
+    assert snapshot["buckets"] == [(0.1, 2), (0.5, 3), (1.0, 4), (float("inf"), 5)]
+    assert snapshot["count"] == 5 and abs(snapshot["sum"] - 6.15) < 1e-9
+    assert 0.1 < histogram.quantile(0.5) <= 0.5
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer(enabled=False)
+    with tracer.span("nlu"):
+        pass
+
+    assert tracer.span("nlu") is tracer.span("stt")
+    assert tracer.stats() == {}
+
+
+def test_spans_are_aggregated_per_stage_and_plugin():
+    tracer = Tracer(enabled=True, buckets=[0.5, 1])
+    with tracer.trace() as trace_id:
+        assert Tracer.current_trace() == trace_id
+        with tracer.span("nlu"):
+            pass
+        with tracer.span("plugin", "temporal_handler"):
+            pass
+    assert Tracer.current_trace() is None
+
+    assert tracer.stats()["nlu"]["count"] == 1
+    text = tracer.prometheus()
+    assert '# TYPE pi_assistant_stage_seconds histogram' in text
+    assert 'pi_assistant_stage_seconds_bucket{stage="plugin",plugin="temporal_handler",le="+Inf"} 1' in text
+    assert 'pi_assistant_stage_seconds_count{stage="nlu"} 1' in text
+
+
+def test_export_writes_the_prometheus_text(tmp_path):
+    path = tmp_path / "metrics" / "assistant.prom"
+    tracer = Tracer(enabled=True, export_path=str(path))
+    tracer.observe("stt", 0.2)
+    tracer.export()
+
+    assert path.read_text() == tracer.prometheus()
+
+
+def test_correlation_id_follows_a_command_through_the_pipeline():
+    tracer = Tracer(enabled=True)
+    traces = []
+    dispatched = threading.Event()
+    plugin_manager = mock.MagicMock()
+
+    def understand(text):
+        traces.append(Tracer.current_trace())
+        return {'intents': [{'name': 'time', 'confidence': 0.9}], 'entities': {}}
+
+    def handle_intent(response):
+        traces.append(Tracer.current_trace())
+        dispatched.set()
+
+    plugin_manager.handle_intent.side_effect = handle_intent
+    pipeline = build_pipeline(understand, plugin_manager, tracer=tracer)
+
+    def script():
+        pipeline.submit_phrase(FakePhrase("noomis what time is it", duration=3.0))
+        assert dispatched.wait(timeout=5)
+
+    run_pipeline(pipeline, script)
+    assert len(traces) == 2 and traces[0] is not None and traces[0] == traces[1]
+    assert {"hotword", "stt", "nlu", "dispatch"} <= set(tracer.stats())
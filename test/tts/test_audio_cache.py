@@ -0,0 +1,60 @@
+import os
+from unittest import mock
+from pi_assistant.tts import AudioCache
+
+
+def fake_synthesize(text: str, lang: str, voice: str) -> bytes:
+    return f"{lang}:{voice}:{text}".encode("utf-8")
+
+
+def test_audio_cache_miss_then_hit(tmp_path):
+    synthesize = mock.MagicMock(side_effect=fake_synthesize)
+    cache = AudioCache(str(tmp_path), max_bytes=1024, synthesize=synthesize)
+
+    first = cache.fetch("I am ready to help!")
+    second = cache.fetch("I am ready to help!")
+
+    assert first == second
+    assert synthesize.call_count == 1
+    assert cache.hits == 1
+    assert cache.misses == 1
+    with open(first, "rb") as file:
+        assert file.read() == b"en:com:I am ready to help!"
+
+
+def test_audio_cache_key_includes_language_and_voice(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=1024, synthesize=fake_synthesize)
+    assert cache.fetch("hello", "en", "com") != cache.fetch("hello", "en", "co.uk")
+    assert cache.fetch("hello", "en", "com") != cache.fetch("hello", "fr", "com")
+    assert cache.misses == 3
+
+
+def test_audio_cache_evicts_least_recently_used(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=30, synthesize=lambda text, lang, voice: b"x" * 10)
+    oldest = cache.fetch("one")
+    cache.fetch("two")
+    cache.fetch("three")
+    cache.fetch("one")  # "two" is now the least recently used entry
+    cache.fetch("four")
+
+    assert cache.size == 30
+    assert os.path.exists(oldest)
+    assert cache.get("two") is None
+    assert cache.get("three") is not None
+
+
+def test_audio_cache_persists_across_instances(tmp_path):
+    AudioCache(str(tmp_path), max_bytes=1024, synthesize=fake_synthesize).fetch("im listening")
+
+    synthesize = mock.MagicMock(side_effect=fake_synthesize)
+    cache = AudioCache(str(tmp_path), max_bytes=1024, synthesize=synthesize)
+    cache.fetch("im listening")
+    synthesize.assert_not_called()
+    assert cache.stats() == {"hits": 1, "misses": 0, "entries": 1, "bytes": len(b"en:com:im listening")}
+
+
+def test_audio_cache_prewarm_only_synthesizes_missing_phrases(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=1024, synthesize=fake_synthesize)
+    cache.fetch("im listening")
+    assert cache.prewarm(["im listening", "I am ready to help!"]) == 1
+    assert cache.get("I am ready to help!") is not None
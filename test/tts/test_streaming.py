@@ -0,0 +1,47 @@
+import threading
+from pi_assistant.tts import StreamingSpeaker, split_sentences
+
+
+def test_split_sentences_splits_on_terminal_punctuation():
+    text = "It is currently Clouds in Richmond Virginia. The temperature is 70 and it feels like 72"
+    assert split_sentences(text) == ["It is currently Clouds in Richmond Virginia.",
+                                     "The temperature is 70 and it feels like 72"]
+
+
+def test_split_sentences_merges_short_chunks():
+    assert split_sentences("Okay. I will be here if you need anything.") == \
+        ["Okay. I will be here if you need anything."]
+    assert split_sentences("im listening") == ["im listening"]
+
+
+def test_split_sentences_splits_long_sentences_on_clauses():
+    text = "first clause is fairly long, second clause is also long; third clause ends it"
+    assert split_sentences(text, min_chars=10, max_chars=40) == ["first clause is fairly long,",
+                                                                 "second clause is also long;",
+                                                                 "third clause ends it"]
+
+
+def test_streaming_speaker_plays_first_chunk_before_the_rest_is_synthesized():
+    second_chunk_started = threading.Event()
+    release_second_chunk = threading.Event()
+    events = []
+
+    def fetch(chunk: str) -> str:
+        if chunk.startswith("Second"):
+            second_chunk_started.set()
+            release_second_chunk.wait(timeout=5)
+        events.append(f"synthesized {chunk}")
+        return f"/tmp/{chunk}.mp3"
+
+    def play(path: str) -> None:
+        events.append(f"played {path}")
+        if path.startswith("/tmp/First"):
+            # The second chunk is still blocked in synthesis while the first one plays
+            assert second_chunk_started.wait(timeout=5)
+            release_second_chunk.set()
+
+    speaker = StreamingSpeaker(fetch=fetch, play=play, min_chars=5)
+    speaker.speak("First sentence here. Second sentence here.")
+
+    assert events.index("played /tmp/First sentence here..mp3") < events.index("synthesized Second sentence here.")
+    assert events[-1] == "played /tmp/Second sentence here..mp3"